@@ -0,0 +1,43 @@
+import os
+
+import pandas as pd
+import streamlit as st
+
+from audit.utils.internal._csv_helpers import read_datasets_from_dict
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _read_dataset_versions(versions: tuple, col_name: str, columns: tuple) -> pd.DataFrame:
+    """Reads and concatenates the given versions of the datasets. The modification times and sizes in versions are
+    only there to key the cache, so that a file is parsed again once it changes."""
+    name_path_dict = {name: path for name, path, _, _ in versions}
+    return read_datasets_from_dict(
+        name_path_dict, col_name=col_name, columns=None if columns is None else list(columns)
+    )
+
+
+def read_cached_datasets(name_path_dict: dict, col_name: str = "set", columns: list = None) -> pd.DataFrame:
+    """
+    Reads multiple datasets like read_datasets_from_dict, but parses each version of the files only once.
+
+    Streamlit reruns the whole page on every widget interaction. The concatenated datasets are cached across reruns
+    and pages, keyed by the path, modification time and size of each file, so they are only read again when a file
+    changes. Each call returns its own copy, which pages can modify freely.
+
+    Args:
+        name_path_dict: A dictionary where keys are dataset names and values are file paths to CSV, Parquet or
+                        Feather files.
+        col_name: The name of the column to add that will contain the dataset name. Defaults to "set".
+        columns: The columns to read from each file. Defaults to all of them.
+
+    Returns:
+        pd.DataFrame: A concatenated DataFrame containing all the datasets, with an additional column specifying
+                      the dataset name.
+    """
+    versions = []
+    for name, path in name_path_dict.items():
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        versions.append((name, path, stat.st_mtime_ns, stat.st_size))
+
+    return _read_dataset_versions(tuple(versions), col_name, None if columns is None else tuple(columns))
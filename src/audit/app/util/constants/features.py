@@ -1,3 +1,7 @@
+from audit.features.statistical import DEFAULT_PERCENTILES
+from audit.features.statistical import StatisticalFeatures
+
+
 class Features:
     def __init__(self, config):
         self.sequences = (
@@ -5,7 +9,9 @@ class Features:
             if config is None
             else [s[1:] if s.startswith("_") else s for s in config.get("sequences")]
         )
-        self.lesion_regions = list(config.get("labels").keys())
+        self.labels = config.get("labels")
+        self.lesion_regions = list(self.labels.keys())
+        self.percentiles = config.get("percentiles", DEFAULT_PERCENTILES)
         self.planes = ["Axial", "Coronal", "Sagittal"]
         self.categories = ["Statistical", "Texture", "Spatial", "Tumor"]
         self.metadata_cols = config.get("metadata_cols", [])
@@ -24,26 +30,51 @@ class Features:
 
     def _generate_statistical_features(self):
         """
-        Generate statistical features dynamically based on MRI sequences.
+        Generate statistical features dynamically based on MRI sequences, percentiles and tumor regions.
         """
-        metrics = [
-            "Max. intensity",
-            "Min. intensity",
-            "Mean intensity",
-            "Median intensity",
-            "Std. intensity",
-            "10th-Percentile intensity",
-            "90th-Percentile intensity",
-            "Range intensity",
-            "Skewness",
-            "Kurtosis",
-        ]
-        return {
-            f"{metric} ({sequence})": f"{sequence.lower()}_{metric.lower().replace('.', '').replace(' ', '_').replace('-', '_')}"
-            for metric in metrics
+        percentiles = [StatisticalFeatures.get_percentile_name(q) for q in self.percentiles]
+        percentile_metrics = {f"{name.split('_')[0]}-Percentile intensity": name for name in percentiles}
+
+        metrics = {
+            "Max. intensity": "max_intensity",
+            "Min. intensity": "min_intensity",
+            "Mean intensity": "mean_intensity",
+            "Median intensity": "median_intensity",
+            "Std. intensity": "std_intensity",
+            **percentile_metrics,
+            "Range intensity": "range_intensity",
+            "Skewness": "skewness",
+            "Kurtosis": "kurtosis",
+        }
+        features = {
+            f"{metric} ({sequence})": f"{sequence.lower()}_{name}"
+            for metric, name in metrics.items()
             for sequence in self.sequences
         }
 
+        # intensity statistics within each tumor region (the background label describes the whole tumor)
+        regions = [
+            ("WHOLE", "whole") if value == 0 else (region, region.lower()) for region, value in self.labels.items()
+        ]
+        regional_metrics = {
+            "Mean intensity": "mean_intensity",
+            "Median intensity": "median_intensity",
+            "Std. intensity": "std_intensity",
+            **percentile_metrics,
+            "Skewness": "skewness",
+            "Kurtosis": "kurtosis",
+        }
+        features.update(
+            {
+                f"{metric} ({sequence}, {region})": f"{sequence.lower()}_{region_name}_{name}"
+                for region, region_name in regions
+                for metric, name in regional_metrics.items()
+                for sequence in self.sequences
+            }
+        )
+
+        return features
+
     def _generate_spatial_features(self):
         """
         Generate spatial features dynamically based on planes
@@ -4,6 +4,8 @@ class Metrics:
             # AUDIT backend
             "Dice": "DICE",
             "Hausdorff distance": "HAUS",
+            "Hausdorff distance 95": "HD95",
+            "Average surface distance": "ASSD",
             "Jaccard": "JACC",
             "Accuracy": "ACCU",
             "Precision": "PREC",
@@ -3,16 +3,23 @@ import streamlit as st
 from streamlit_theme import st_theme
 
 from audit.app.util.commons.checks import none_check
+from audit.app.util.commons.data_loading import read_cached_datasets
 from audit.app.util.commons.data_preprocessing import processing_data
 from audit.app.util.commons.utils import download_longitudinal_plot
 from audit.app.util.constants.descriptions import LongitudinalAnalysisPage
 from audit.app.util.pages.base_page import BasePage
-from audit.utils.internal._csv_helpers import read_datasets_from_dict
 from audit.visualization.commons import update_longitudinal_plot
 from audit.visualization.time_series import plot_longitudinal_lesions
 
 
 class Longitudinal(BasePage):
+    # column with the predicted lesion size in the metrics of each backend
+    PREDICTED_SIZE_COLUMNS = {
+        "SIZE": "audit",
+        "numb_pred": "metrics_reloaded",
+        "pred_vol": "pymia",
+    }
+
     def __init__(self, config):
         super().__init__(config)
         self.descriptions = LongitudinalAnalysisPage()
@@ -31,9 +38,13 @@ class Longitudinal(BasePage):
 
         proceed = none_check(metrics_paths=metrics_paths, features_paths=features_paths)
         if proceed[0]:
-            # Reading feature data
-            features_df = read_datasets_from_dict(features_paths)
-            metrics_df = read_datasets_from_dict(metrics_paths)
+            # Reading feature data (only the columns of the tumor sizes over time)
+            features_df = read_cached_datasets(
+                features_paths, columns=["ID", "longitudinal_id", "time_point", "lesion_size_whole"]
+            )
+            metrics_df = read_cached_datasets(
+                metrics_paths, columns=["ID", "model", "lesion_size_pred"] + list(self.PREDICTED_SIZE_COLUMNS)
+            )
             merged = self.merge_features_metrics(features_df, metrics_df)
 
             if not merged.empty:
@@ -71,13 +82,8 @@ class Longitudinal(BasePage):
     @staticmethod
     def merge_features_metrics(features_df, metrics_df):
         features_df = features_df.loc[~features_df["longitudinal_id"].isna(), :]
-        col_map = {
-            "SIZE": "audit",
-            "numb_pred": "metrics_reloaded",
-            "pred_vol": "pymia",
-        }
 
-        col = next((c for c in col_map if c in metrics_df.columns), None)
+        col = next((c for c in Longitudinal.PREDICTED_SIZE_COLUMNS if c in metrics_df.columns), None)
         if col:
             metrics_df = (
                 metrics_df.groupby(["ID", "model", "set"])[col]
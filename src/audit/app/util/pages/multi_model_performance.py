@@ -3,12 +3,12 @@ import streamlit as st
 from streamlit_theme import st_theme
 
 from audit.app.util.commons.checks import none_check
+from audit.app.util.commons.data_loading import read_cached_datasets
 from audit.app.util.commons.data_preprocessing import processing_data
 from audit.app.util.commons.utils import download_plot
 from audit.app.util.constants.descriptions import MultiModelPerformanceComparisonsPage
 from audit.app.util.constants.metrics import Metrics
 from audit.app.util.pages.base_page import BasePage
-from audit.utils.internal._csv_helpers import read_datasets_from_dict
 from audit.visualization.boxplot import models_performance_boxplot
 from audit.visualization.commons import update_multimodel_plot
 
@@ -35,7 +35,7 @@ class MultiModelPerformance(BasePage):
         proceed = none_check(metrics_paths=metrics_paths, labels_dict=labels_dict)
         if proceed[0]:
             # Load the data
-            raw_metrics = read_datasets_from_dict(metrics_paths)
+            raw_metrics = read_cached_datasets(metrics_paths)
             agg = self.sidebar.setup_aggregation_button()
 
             # calling main function
@@ -3,12 +3,12 @@ from streamlit_plotly_events import plotly_events
 from streamlit_theme import st_theme
 
 from audit.app.util.commons.checks import health_checks
+from audit.app.util.commons.data_loading import read_cached_datasets
 from audit.app.util.commons.data_preprocessing import processing_data
 from audit.app.util.commons.utils import download_plot
 from audit.app.util.constants.descriptions import MultivariatePage
 from audit.app.util.pages.base_page import BasePage
 from audit.utils.external_tools.itk_snap import run_itk_snap
-from audit.utils.internal._csv_helpers import read_datasets_from_dict
 from audit.visualization.commons import update_plot_customization
 from audit.visualization.scatter_plots import multivariate_features_highlighter
 
@@ -30,7 +30,7 @@ class MultivariateFeature(BasePage):
         st.header(self.descriptions.header)
         st.markdown(self.descriptions.sub_header)
 
-        df = read_datasets_from_dict(features_information)
+        df = read_cached_datasets(features_information)
 
         selected_sets, selected_feature = self.setup_sidebar(df, features_information)
         proceed = health_checks(selected_sets, selected_feature)
@@ -5,6 +5,7 @@ from streamlit_theme import st_theme
 
 from audit.app.util.commons.checks import models_sanity_check
 from audit.app.util.commons.checks import none_check
+from audit.app.util.commons.data_loading import read_cached_datasets
 from audit.app.util.commons.data_preprocessing import processing_data
 from audit.app.util.commons.utils import download_plot
 from audit.app.util.constants.descriptions import PairwiseModelPerformanceComparisonPage
@@ -15,7 +16,6 @@ from audit.metrics.statistical_tests import homoscedasticity_test
 from audit.metrics.statistical_tests import normality_test
 from audit.metrics.statistical_tests import paired_ttest
 from audit.metrics.statistical_tests import wilcoxon_test
-from audit.utils.internal._csv_helpers import read_datasets_from_dict
 from audit.visualization.barplots import aggregated_pairwise_model_performance
 from audit.visualization.barplots import individual_pairwise_model_performance
 from audit.visualization.histograms import plot_histogram
@@ -53,8 +53,8 @@ class PairwiseModelPerformance(BasePage):
         proceed = none_check(metrics_paths=metrics_paths, features_paths=features_paths)
         if proceed[0]:
             # Load datasets
-            raw_metrics = read_datasets_from_dict(metrics_paths)
-            raw_features = read_datasets_from_dict(features_paths)
+            raw_metrics = read_cached_datasets(metrics_paths)
+            raw_features = read_cached_datasets(features_paths)
             df_stats = raw_metrics.drop(columns="region").groupby(["ID", "model", "set"]).mean().reset_index()
 
             # Setup sidebar
@@ -8,14 +8,44 @@ from streamlit_theme import st_theme
 from audit.app.util.commons.checks import none_check
 from audit.app.util.constants.descriptions import SegmentationErrorMatrixPage
 from audit.app.util.pages.base_page import BasePage
+from audit.metrics.backends.commons import get_subject_file
 from audit.metrics.error_matrix import errors_per_class
 from audit.metrics.error_matrix import normalize_matrix_per_row
+from audit.utils.commons.manifest import fingerprint_files
 from audit.utils.external_tools.itk_snap import run_comparison_segmentation_itk_snap
 from audit.utils.sequences.sequences import load_nii_by_subject_id
 from audit.visualization.commons import update_segmentation_matrix_plot
 from audit.visualization.confusion_matrices import plt_confusion_matrix
 
 
+@st.cache_data(show_spinner=False, persist="disk")
+def _subject_confusion_matrix(gt_path, predictions_path, subject_id, fingerprint, labels):
+    """Computes the confusion matrix of a subject, persisted across sessions. The fingerprint of its ground truth and
+    prediction files is only there to key the cache, so that the matrix is computed again once they change."""
+    seg = load_nii_by_subject_id(root_dir=gt_path, subject_id=subject_id, seq="_seg", as_array=True)
+    pred = load_nii_by_subject_id(root_dir=predictions_path, subject_id=subject_id, seq="_pred", as_array=True)
+    return errors_per_class(seg, pred, list(labels))
+
+
+@st.cache_resource
+def _get_computed_subjects():
+    """Keys of the subject confusion matrices computed (hence cached) by this process."""
+    return set()
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _stack_confusion_matrices(gt_path, predictions_path, versions, labels):
+    """Stacks the confusion matrices of the given (subject, fingerprint) versions in a (subjects, K, K) array."""
+    if not versions:
+        return np.zeros((0, len(labels), len(labels)), dtype=np.int64)
+    return np.stack(
+        [
+            _subject_confusion_matrix(gt_path, predictions_path, subject_id, fingerprint, labels)
+            for subject_id, fingerprint in versions
+        ]
+    )
+
+
 class SegmentationErrorMatrix(BasePage):
     def __init__(self, config):
         super().__init__(config)
@@ -120,28 +150,52 @@ class SegmentationErrorMatrix(BasePage):
         return selected_dataset, selected_model, selected_id, ground_truth_path, predictions_path, subjects_in_path
 
     @staticmethod
-    def compute_confusion_matrix(seg, pred, labels, normalized):
+    def get_subject_fingerprint(gt_path, predictions_path, subject_id):
+        """Fingerprint (size and modification time) of the ground truth and prediction files of a subject."""
+        return fingerprint_files(
+            [get_subject_file(gt_path, subject_id, "_seg"), get_subject_file(predictions_path, subject_id, "_pred")]
+        )
+
+    @staticmethod
+    def compute_subject_confusion_matrices(gt_path, predictions_path, subjects_in_path, labels):
         """
-        Compute the confusion matrix for a single subject.
+        Compute the confusion matrices of all subjects, cached by the fingerprints of their files.
+
+        The matrix of each subject is persisted on disk, and the stack of matrices is kept in memory, so that
+        toggling the visualization options never decodes the segmentations again, and new or modified subjects are
+        the only ones computed.
 
         Args:
-            seg (np.array): Ground truth segmentation.
-            pred (np.array): Predicted segmentation.
+            gt_path (str): Path to ground truth data.
+            predictions_path (str): Path to predictions data.
+            subjects_in_path (list): List of subject IDs.
             labels (list): List of label values.
-            normalized (bool): Whether to normalize the confusion matrix.
 
         Returns:
-            np.array: Confusion matrix.
+            np.array: Confusion matrices of the subjects, of shape (subjects, labels, labels).
         """
-        cm = errors_per_class(seg, pred, list(labels))
-        if normalized:
-            cm = normalize_matrix_per_row(cm)
-        return cm
+        gt_path, predictions_path, labels = str(gt_path), str(predictions_path), tuple(labels)
+        versions = tuple(
+            (subject_id, SegmentationErrorMatrix.get_subject_fingerprint(gt_path, predictions_path, subject_id))
+            for subject_id in subjects_in_path
+        )
+
+        # compute the matrices missing from the cache first, showing their progress
+        computed = _get_computed_subjects()
+        pending = [v for v in versions if (gt_path, predictions_path, *v, labels) not in computed]
+        if pending:
+            for subject_id, fingerprint in stqdm(
+                pending, desc=f"Calculating confusion matrix for {len(pending)} subjects"
+            ):
+                _subject_confusion_matrix(gt_path, predictions_path, subject_id, fingerprint, labels)
+                computed.add((gt_path, predictions_path, subject_id, fingerprint, labels))
+
+        return _stack_confusion_matrices(gt_path, predictions_path, versions, labels)
 
     @staticmethod
     def compute_accumulated_confusion_matrix(gt_path, predictions_path, subjects_in_path, labels):
         """
-        Compute the accumulated confusion matrix for all subjects.
+        Compute the accumulated confusion matrix for all subjects, as the sum of their cached confusion matrices.
 
         Args:
             gt_path (str): Path to ground truth data.
@@ -152,17 +206,10 @@ class SegmentationErrorMatrix(BasePage):
         Returns:
             np.array: Accumulated confusion matrix.
         """
-        accumulated = None
-        for subject_id in stqdm(
-            subjects_in_path, desc=f"Calculating confusion matrix for {len(subjects_in_path)} subjects"
-        ):
-            seg = load_nii_by_subject_id(root_dir=gt_path, subject_id=subject_id, seq="_seg", as_array=True)
-            pred = load_nii_by_subject_id(root_dir=predictions_path, subject_id=subject_id, seq="_pred", as_array=True)
-            cm = errors_per_class(seg, pred, list(labels))
-            if accumulated is None:
-                accumulated = np.zeros_like(cm)
-            accumulated += cm
-        return accumulated
+        matrices = SegmentationErrorMatrix.compute_subject_confusion_matrices(
+            gt_path, predictions_path, subjects_in_path, labels
+        )
+        return matrices.sum(axis=0, dtype=np.int64)
 
     def visualize_subject_level(self, gt_path, predictions_path, selected_id, labels_dict, normalized):
         """
@@ -176,10 +223,10 @@ class SegmentationErrorMatrix(BasePage):
             normalized (bool): Whether to normalize the confusion matrix.
         """
         classes, labels = list(labels_dict.keys()), list(labels_dict.values())
-        seg = load_nii_by_subject_id(root_dir=gt_path, subject_id=selected_id, seq="_seg", as_array=True)
-        pred = load_nii_by_subject_id(root_dir=predictions_path, subject_id=selected_id, seq="_pred", as_array=True)
-
-        cm = self.compute_confusion_matrix(seg, pred, labels, normalized)
+        fingerprint = self.get_subject_fingerprint(gt_path, predictions_path, selected_id)
+        cm = _subject_confusion_matrix(str(gt_path), str(predictions_path), selected_id, fingerprint, tuple(labels))
+        if normalized:
+            cm = normalize_matrix_per_row(cm)
         fig = plt_confusion_matrix(cm, classes, theme=self.template, normalized=normalized)
 
         return fig
@@ -200,7 +247,7 @@ class SegmentationErrorMatrix(BasePage):
 
         accumulated = self.compute_accumulated_confusion_matrix(gt_path, predictions_path, subjects_in_path, labels)
 
-        if averaged:
+        if averaged and subjects_in_path:
             accumulated = (accumulated / len(subjects_in_path)).astype(int)
         if normalized:
             accumulated = normalize_matrix_per_row(accumulated)
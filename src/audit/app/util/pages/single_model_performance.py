@@ -5,13 +5,13 @@ from streamlit_theme import st_theme
 
 from audit.app.util.commons.checks import dataset_sanity_check
 from audit.app.util.commons.checks import none_check
+from audit.app.util.commons.data_loading import read_cached_datasets
 from audit.app.util.commons.data_preprocessing import processing_data
 from audit.app.util.commons.utils import download_plot
 from audit.app.util.constants.descriptions import ModelPerformanceAnalysisPage
 from audit.app.util.constants.metrics import Metrics
 from audit.app.util.pages.base_page import BasePage
 from audit.utils.commons.strings import pretty_string
-from audit.utils.internal._csv_helpers import read_datasets_from_dict
 from audit.visualization.commons import update_plot_customization
 from audit.visualization.scatter_plots import multivariate_metric_feature
 
@@ -38,8 +38,8 @@ class SingleModelPerformance(BasePage):
         proceed = none_check(metrics_paths=metrics_paths, features_paths=features_paths)
         if proceed[0]:
             # Load the data
-            features_df = read_datasets_from_dict(features_paths)
-            metrics_df = read_datasets_from_dict(metrics_paths)
+            features_df = read_cached_datasets(features_paths)
+            metrics_df = read_cached_datasets(metrics_paths)
 
             col1, col2 = st.columns([2, 2], gap="small")
             with col1:
@@ -5,11 +5,11 @@ import streamlit as st
 
 warnings.filterwarnings("ignore", category=RuntimeWarning)
 
+from audit.app.util.commons.data_loading import read_cached_datasets
 from audit.app.util.commons.data_preprocessing import processing_data
 from audit.app.util.constants.descriptions import SubjectsExplorationPage
 from audit.app.util.pages.base_page import BasePage
 from audit.utils.commons.strings import pretty_string
-from audit.utils.internal._csv_helpers import read_datasets_from_dict
 
 
 class SubjectsExploration(BasePage):
@@ -26,7 +26,7 @@ class SubjectsExploration(BasePage):
         st.markdown(self.descriptions.sub_header)
 
         # Load datasets
-        df = read_datasets_from_dict(features)
+        df = read_cached_datasets(features)
 
         # Set up sidebar options
         selected_set, selected_subject = self.setup_sidebar(df)
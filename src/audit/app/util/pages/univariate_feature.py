@@ -4,12 +4,12 @@ from streamlit_plotly_events import plotly_events
 from streamlit_theme import st_theme
 
 from audit.app.util.commons.checks import health_checks
+from audit.app.util.commons.data_loading import read_cached_datasets
 from audit.app.util.commons.data_preprocessing import processing_data
 from audit.app.util.commons.utils import download_plot
 from audit.app.util.constants.descriptions import UnivariatePage
 from audit.app.util.pages.base_page import BasePage
 from audit.utils.external_tools.itk_snap import run_itk_snap
-from audit.utils.internal._csv_helpers import read_datasets_from_dict
 from audit.visualization.boxplot import boxplot_highlighter
 from audit.visualization.commons import update_plot_customization
 from audit.visualization.histograms import custom_distplot
@@ -36,7 +36,7 @@ class UnivariateFeature(BasePage):
         st.markdown(self.descriptions.sub_header)
 
         # Load datasets
-        df = read_datasets_from_dict(features_paths)
+        df = read_cached_datasets(features_paths)
 
         # Set up sidebar and plot options
         selected_sets, selected_feature = self.setup_sidebar(df, features_paths)
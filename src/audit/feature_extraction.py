@@ -16,6 +16,7 @@ from audit.utils.commons.strings import fancy_print
 from audit.utils.internal._config_helpers import check_feature_extraction_config
 from audit.utils.internal._config_helpers import configure_logging
 from audit.utils.internal._config_helpers import load_config_file
+from audit.utils.internal._csv_helpers import write_dataset
 
 
 def run_feature_extraction(config_path):
@@ -49,12 +50,20 @@ def run_feature_extraction(config_path):
         logger.info(f"Starting feature extraction for {dataset_name}")
 
         # features extraction
-        extracted_feats = extract_features(path_images=src_path, config_file=config, dataset_name=dataset_name)
+        extracted_feats, checkpoint = extract_features(
+            path_images=src_path, config_file=config, dataset_name=dataset_name
+        )
         logger.info(f"Finishing feature extraction for {dataset_name}")
 
         # TODO: Should it have nan values or they must be 0? When NAN value, they do not appear in plots.
-        extracted_feats.to_csv(f"{output_path}/extracted_information_{dataset_name}.csv", index=False)
-        logger.info(f"Results exported to CSV for {dataset_name}")
+        file_path = write_dataset(
+            extracted_feats, f"{output_path}/extracted_information_{dataset_name}", config.get("output_format", "csv")
+        )
+        logger.info(f"Results exported to {file_path} for {dataset_name}")
+
+        # the checkpoint is kept until the results are safely stored
+        if checkpoint is not None:
+            checkpoint.remove()
 
 
 def main():
@@ -1,21 +1,25 @@
 import os
-from multiprocessing import Lock
-from multiprocessing import Manager
 from multiprocessing import Pool
+from typing import Optional
 
 import pandas as pd
 from colorama import Fore
 from loguru import logger
 
 from audit.features.spatial import SpatialFeatures
+from audit.features.statistical import RegionalStatisticalFeatures
 from audit.features.statistical import StatisticalFeatures
 from audit.features.texture import TextureFeatures
 from audit.features.tumor import TumorFeatures
+from audit.utils.commons.checkpoint import ExtractionCheckpoint
+from audit.utils.commons.checkpoint import open_checkpoint
 from audit.utils.commons.file_manager import list_dirs
+from audit.utils.commons.file_manager import list_files
+from audit.utils.commons.manifest import open_manifest
 from audit.utils.commons.strings import fancy_tqdm
 from audit.utils.sequences.sequences import get_spacing
-from audit.utils.sequences.sequences import load_nii_by_subject_id
-from audit.utils.sequences.sequences import read_sequences_dict
+from audit.utils.sequences.sequences import read_subject_volumes
+from audit.utils.sequences.volume_cache import configure_volume_cache
 
 
 @logger.catch
@@ -36,15 +40,23 @@ def check_multiprocessing(config_file):
     return cpu_cores
 
 
-def initializer(shared_df, lock):
-    """Initialize shared variables for multiprocessing"""
-    global shared_dataframe, dataframe_lock
-    shared_dataframe = shared_df
-    dataframe_lock = lock
+def initializer(volume_cache=None):
+    """Initialize the worker processes"""
+    configure_volume_cache(volume_cache)
 
 
-def process_subject(data: pd.DataFrame, params: dict, cpu_cores: int) -> pd.DataFrame:
-    """Process a single subject to extract features"""
+def process_subject(params: dict) -> Optional[dict]:
+    """Process a single subject to extract features, returning them as a single row (None if the subject fails)"""
+    try:
+        return extract_subject_features(params)
+    except Exception:
+        # a single unreadable subject must not abort the extraction of the whole dataset
+        logger.exception(f"Could not extract the features of subject {params.get('subject_id')}, skipping it")
+        return None
+
+
+def extract_subject_features(params: dict) -> dict:
+    """Extract all the requested features of a single subject, returning them as a single row"""
     path_images = params.get("path_images")
     subject_id = params.get("subject_id")
     available_sequences = params.get("available_sequences")
@@ -52,35 +64,66 @@ def process_subject(data: pd.DataFrame, params: dict, cpu_cores: int) -> pd.Data
     features_to_extract = params.get("features_to_extract")
     numeric_label = params.get("numeric_label")
     label_names = params.get("label_names")
-    spatial_features, tumor_features, stats_features, texture_feats = {}, {}, {}, {}
-
-    # read sequences and segmentation
-    sequences = read_sequences_dict(root_dir=path_images, subject_id=subject_id, sequences=available_sequences)
-    seg = load_nii_by_subject_id(root_dir=path_images, subject_id=subject_id, as_array=True)
+    statistical_settings = params.get("feature_settings", {}).get("statistical", {})
+    texture_settings = params.get("feature_settings", {}).get("texture", {})
+    spatial_features, tumor_features, stats_features, texture_feats, regional_feats = {}, {}, {}, {}, {}
+
+    # read sequences and segmentation (each file is decoded only once). Volumes that no requested feature family
+    # needs are not decoded at all, only their headers are read
+    volumes = read_subject_volumes(
+        root_dir=path_images,
+        subject_id=subject_id,
+        sequences=available_sequences,
+        seg="_seg",
+        header_only=not any(f in features_to_extract for f in ["statistical", "texture", "spatial", "regional"]),
+        seg_header_only=not any(f in features_to_extract for f in ["tumor", "regional"]),
+    )
+    seg_volume = volumes.pop("seg")
+    sequences = {key: volume.get("array") if volume else None for key, volume in volumes.items()}
+    seg = seg_volume.get("array") if seg_volume else None
 
     # calculating spacing
-    sequences_spacing = get_spacing(img=load_nii_by_subject_id(path_images, subject_id, seq_reference))
-    seg_spacing = get_spacing(img=load_nii_by_subject_id(path_images, subject_id, "_seg"))
+    sequences_spacing = get_spacing(img=volumes[seq_reference.replace("_", "")])
+    seg_spacing = get_spacing(img=seg_volume)
+
+    # brain (non-zero) voxels of each sequence, computed once and shared by the texture and spatial features
+    brain_masks = {}
+    if any(f in features_to_extract for f in ["texture", "spatial"]):
+        brain_masks = {key: seq != 0 for key, seq in sequences.items() if seq is not None}
 
     # extract first order (statistical) information from sequences
     if "statistical" in features_to_extract:
         stats_features = {
-            key: StatisticalFeatures(seq[seq > 0]).extract_features()
+            key: StatisticalFeatures(seq, foreground_only=True, **statistical_settings).extract_features()
             for key, seq in sequences.items()
             if seq is not None
         }
 
+    # extract first order information from sequences within each tumor region (all the regions at once)
+    if "regional" in features_to_extract:
+        rf = RegionalStatisticalFeatures(
+            segmentation=seg,
+            mapping_names=dict(zip(numeric_label, label_names)),
+            percentiles=statistical_settings.get("percentiles"),
+        )
+        regional_feats = {key: rf.extract_features(seq) for key, seq in sequences.items() if seq is not None}
+
     # extract second order (texture) information from sequences
     if "texture" in features_to_extract:
         texture_feats = {
-            key: TextureFeatures(seq, remove_empty_planes=True).extract_features()
+            key: TextureFeatures(
+                seq, remove_empty_planes=True, brain_mask=brain_masks.get(key), **texture_settings
+            ).extract_features()
             for key, seq in sequences.items()
             if seq is not None
         }
 
     # calculate spatial features (dimensions and center mass)
     if "spatial" in features_to_extract:
-        sf = SpatialFeatures(sequence=sequences.get(seq_reference.replace("_", "")), spacing=sequences_spacing)
+        reference = seq_reference.replace("_", "")
+        sf = SpatialFeatures(
+            sequence=sequences.get(reference), spacing=sequences_spacing, brain_mask=brain_masks.get(reference)
+        )
         spatial_features = sf.extract_features()
 
     # calculate tumor features
@@ -88,22 +131,16 @@ def process_subject(data: pd.DataFrame, params: dict, cpu_cores: int) -> pd.Data
         tf = TumorFeatures(segmentation=seg, spacing=seg_spacing, mapping_names=dict(zip(numeric_label, label_names)))
         tumor_features = tf.extract_features(sf.center_mass.values() if "spatial" in features_to_extract else {})
 
-    # Add info to the main df
-    subject_info_df = store_subject_information(
-        subject_id, spatial_features, tumor_features, stats_features, texture_feats
+    # Gather all the subject information in a single row
+    return store_subject_information(
+        subject_id, spatial_features, tumor_features, stats_features, texture_feats, regional_feats
     )
 
-    if cpu_cores == 1:
-        return subject_info_df
-
-    with dataframe_lock:
-        data[subject_id] = subject_info_df
-
-    return data
-
 
 @logger.catch
-def extract_features(path_images: str, config_file: dict, dataset_name: str) -> pd.DataFrame:
+def extract_features(
+    path_images: str, config_file: dict, dataset_name: str
+) -> tuple[pd.DataFrame, Optional[ExtractionCheckpoint]]:
     """
     Extracts features from all the MRIs located in the specified directory and compiles them into a DataFrame.
 
@@ -115,81 +152,126 @@ def extract_features(path_images: str, config_file: dict, dataset_name: str) ->
     Returns:
         pd.DataFrame: A DataFrame containing extracted features for each subject, including spatial, tumor, and
                       statistical features.
+        ExtractionCheckpoint: The checkpoint of the run (None if disabled). The caller removes it once the features
+                              are stored.
     """
     # get configuration
     label_names, numeric_label = list(config_file["labels"].keys()), list(config_file["labels"].values())
     features_to_extract = [key for key, value in config_file["features"].items() if value]
+    feature_settings = {key: value for key, value in config_file["features"].items() if isinstance(value, dict)}
     available_sequences = config_file.get("sequences")
     seq_reference = available_sequences[0]
     subjects_list = list_dirs(path_images)
     cpu_cores = check_multiprocessing(config_file)
+    volume_cache = config_file.get("volume_cache")
+    if configure_volume_cache(volume_cache) is not None:
+        logger.info(f"Using volume cache at {volume_cache['path']}")
+
+    params_list = [
+        {
+            "path_images": path_images,
+            "subject_id": subject_id,
+            "label_names": label_names,
+            "numeric_label": numeric_label,
+            "seq_reference": seq_reference,
+            "features_to_extract": features_to_extract,
+            "feature_settings": feature_settings,
+            "available_sequences": available_sequences,
+        }
+        for subject_id in subjects_list
+    ]
+
+    # each subject yields a plain dict row; the DataFrame is only built once all of them are available
+    rows = []
+
+    # in incremental runs, reuse the rows of the subjects whose files did not change since the previous run
+    settings = {key: config_file.get(key) for key in ["labels", "features", "sequences"]}
+    manifest = open_manifest(config_file, f"features_{dataset_name}", settings)
+    if manifest is not None:
+        pending = []
+        for params in params_list:
+            subject_files = list_files(os.path.join(path_images, params["subject_id"]), full_path=True)
+            cached = manifest.get(params["subject_id"], subject_files)
+            if cached is not None:
+                rows.extend(cached)
+            else:
+                pending.append(params)
+        logger.info(f"Reusing the features of {len(rows)} unchanged subjects, processing {len(pending)} subjects")
+        params_list = pending
+
+    # the rows of the completed subjects are checkpointed as the run goes, so that an interrupted run resumes from
+    # the remaining subjects
+    checkpoint = open_checkpoint(config_file, f"features_{dataset_name}", {**settings, "path_images": path_images})
+    if checkpoint is not None and checkpoint.completed:
+        pending = []
+        for params in params_list:
+            resumed = checkpoint.completed.get(params["subject_id"])
+            if resumed is not None:
+                rows.extend(resumed)
+                if manifest is not None:
+                    manifest.put(params["subject_id"], resumed)
+            else:
+                pending.append(params)
+        params_list = pending
 
-    data = pd.DataFrame()
-    if cpu_cores == 1:
-        with fancy_tqdm(total=len(subjects_list), desc=f"{Fore.CYAN}Progress", leave=True) as pbar:
-            for subject_id in subjects_list:
+    with fancy_tqdm(total=len(params_list), desc=f"{Fore.CYAN}Progress", leave=True) as pbar:
+        if cpu_cores == 1:
+            for params in params_list:
+                subject_id = params["subject_id"]
                 logger.info(f"Processing subject: {subject_id}")
 
                 # updating progress bar
                 pbar.set_postfix_str(f"{Fore.CYAN}Current subject: {Fore.LIGHTBLUE_EX}{subject_id}{Fore.CYAN}")
                 pbar.update(1)
 
-                params = {
-                    "path_images": path_images,
-                    "subject_id": subject_id,
-                    "label_names": label_names,
-                    "numeric_label": numeric_label,
-                    "seq_reference": seq_reference,
-                    "features_to_extract": features_to_extract,
-                    "available_sequences": available_sequences,
-                }
-
-                subject_info_df = process_subject(data, params, cpu_cores)
-                data = pd.concat([data, subject_info_df], ignore_index=True)
-
-        data = extract_longitudinal_info(config_file, data, dataset_name)
-
-    if cpu_cores > 1:
-        manager = Manager()
-        shared_data = manager.dict()
-        lock = Lock()
-
-        with Pool(processes=cpu_cores, initializer=initializer, initargs=(shared_data, lock)) as pool:
-            with fancy_tqdm(total=len(subjects_list), desc=f"{Fore.CYAN}Progress", leave=True) as pbar:
-                results = []
-
-                for subject_id in subjects_list:
-                    params = {
-                        "path_images": path_images,
-                        "subject_id": subject_id,
-                        "label_names": label_names,
-                        "numeric_label": numeric_label,
-                        "seq_reference": seq_reference,
-                        "features_to_extract": features_to_extract,
-                        "available_sequences": available_sequences,
-                    }
-                    results.append(pool.apply_async(process_subject, args=(shared_data, params, cpu_cores)))
-
-                for result in results:
-                    result.wait()
+                row = process_subject(params)
+                if row is None:
+                    continue
+                rows.append(row)
+                if manifest is not None:
+                    manifest.put(row["ID"], [row])
+                if checkpoint is not None:
+                    checkpoint.append(row["ID"], [row])
+        else:
+            with Pool(processes=cpu_cores, initializer=initializer, initargs=(volume_cache,)) as pool:
+                # rows are consumed as soon as each worker finishes, whatever the submission order
+                for row in pool.imap_unordered(process_subject, params_list):
                     pbar.update(1)
-
-        for subject_id, subject_info_df in shared_data.items():
-            data = pd.concat([data, subject_info_df], ignore_index=True)
-
-        data = data.sort_values(by=data.columns[0]).reset_index(drop=True)
-        data = extract_longitudinal_info(config_file, data, dataset_name)
+                    if row is None:
+                        continue
+                    rows.append(row)
+                    if manifest is not None:
+                        manifest.put(row["ID"], [row])
+                    if checkpoint is not None:
+                        checkpoint.append(row["ID"], [row])
+
+    if manifest is not None:
+        manifest.prune(subjects_list)
+        manifest.save()
+
+    data = pd.DataFrame(rows)
+    data = data.sort_values(by="ID").reset_index(drop=True)
+    data = extract_longitudinal_info(config_file, data, dataset_name)
 
     data = load_and_merge_metadata(data, config_file, dataset_name)
 
-    return data.sort_values(by="ID")
+    # the checkpoint is only removed by the caller, once the features are stored
+    if checkpoint is not None:
+        checkpoint.close()
+
+    return data.sort_values(by="ID"), checkpoint
 
 
 def store_subject_information(
-    subject_id: str, spatial_features: dict, tumor_features: dict, stats_features: dict, texture_feats: dict
-) -> pd.DataFrame:
+    subject_id: str,
+    spatial_features: dict,
+    tumor_features: dict,
+    stats_features: dict,
+    texture_feats: dict,
+    regional_feats: dict = None,
+) -> dict:
     """
-    Stores the extracted features for a single subject in a DataFrame.
+    Stores the extracted features for a single subject in a flat dictionary (one row of the output DataFrame).
 
     Args:
         subject_id (str): The ID of the subject.
@@ -197,9 +279,11 @@ def store_subject_information(
         tumor_features (dict): A dictionary containing tumor features extracted from the subject's segmentation.
         stats_features (dict): A dictionary containing statistical features extracted from the subject's images.
         texture_feats (dict): A dictionary containing texture features extracted from the subject's images.
+        regional_feats (dict): A dictionary containing statistical features extracted from the subject's images
+                               within each tumor region.
 
     Returns:
-        pd.DataFrame: A DataFrame with the subject's ID and all extracted features, structured as a single row.
+        dict: A dictionary with the subject's ID and all extracted features, structured as a single row.
     """
 
     # storing information about subject
@@ -221,10 +305,12 @@ def store_subject_information(
         prefixed_textures = {f"{seq}_{k}": v for k, v in dict_stats.items()}
         subject_info.update(prefixed_textures)
 
-    # from dict to dataframe
-    subject_info_df = pd.DataFrame(subject_info, index=[0])
+    # including regional stats information
+    for seq, dict_stats in (regional_feats or {}).items():
+        prefixed_stats = {f"{seq}_{k}": v for k, v in dict_stats.items()}
+        subject_info.update(prefixed_stats)
 
-    return subject_info_df
+    return subject_info
 
 
 def extract_longitudinal_info(config: dict, df: pd.DataFrame, dataset_name: str) -> pd.DataFrame:
@@ -12,6 +12,8 @@ class SpatialFeatures:
         A numpy array representing the sequence associated with the medical image.
     spacing : np.ndarray
         A numpy array representing the spacing of the medical image voxels.
+    brain_mask : np.ndarray
+        A boolean array of the brain (non-zero) voxels of the sequence, computed on demand if not given.
 
     Methods:
     -------
@@ -21,7 +23,7 @@ class SpatialFeatures:
         Gets the dimensions of the sequence in axial, coronal, and sagittal planes.
     """
 
-    def __init__(self, sequence, spacing=None):
+    def __init__(self, sequence, spacing=None, brain_mask=None):
         """
         Constructs all the necessary attributes for the SpatialFeatures object.
 
@@ -33,11 +35,14 @@ class SpatialFeatures:
             A numpy array representing the segmentation of the medical image.
         spacing : np.ndarray
             A numpy array representing the spacing of the medical image voxels.
+        brain_mask : np.ndarray
+            A boolean array of the brain (non-zero) voxels of the sequence, if already computed.
         """
         self.center_mass = None
         self.dimensions = None
         self.sequence = sequence
         self.spacing = spacing if spacing is not None else (1, 1, 1)
+        self.brain_mask = brain_mask
 
     def calculate_anatomical_center_mass(self):
         """
@@ -56,11 +61,18 @@ class SpatialFeatures:
                 "sagittal_plane_center_of_mass": np.nan,
             }
 
-        # Get the indices of the non-zero voxels
-        coordinates = np.argwhere(self.sequence != 0)
-
-        # Calculate the center of mass
-        center_of_mass_mean = np.mean(coordinates, axis=0)
+        if self.brain_mask is None:
+            self.brain_mask = self.sequence != 0
+
+        # Calculate the center of mass from the number of brain voxels of each slice along each axis
+        counts = np.count_nonzero(self.brain_mask, axis=2)
+        marginals = [counts.sum(axis=1), counts.sum(axis=0), np.count_nonzero(self.brain_mask, axis=(0, 1))]
+        total = marginals[0].sum()
+        if total == 0:
+            logger.warning("Empty sequence. Assigning center of mass (nan, nan, nan)")
+            center_of_mass_mean = np.full(3, np.nan)
+        else:
+            center_of_mass_mean = np.array([np.dot(np.arange(m.size), m) / total for m in marginals])
         return dict(
             zip(
                 ["axial_plane_center_of_mass", "coronal_plane_center_of_mass", "sagittal_plane_center_of_mass"],
@@ -1,16 +1,38 @@
 import numpy as np
+from loguru import logger
 from scipy.stats import kurtosis
 from scipy.stats import skew
 
+DEFAULT_PERCENTILES = [10, 90]
+
+ENGINES = ["auto", "sort", "histogram"]
+
+# the histogram engine is only used (in "auto" mode) for integer intensities spanning at most this many values
+MAX_HISTOGRAM_BINS = 2**20
+
+# number of voxels binned at once, to bound the memory of the histogram engine
+HISTOGRAM_CHUNK_SIZE = 2**20
+
 
 class StatisticalFeatures:
     """
     A class to compute statistical features from a given sequence.
 
+    Two engines are available. The "sort" engine selects the order statistics with a partial sort of the
+    intensities. The "histogram" engine, for integer intensities, builds a histogram of the sequence with
+    ``np.bincount`` and derives every statistic exactly from it, in O(n) time and O(range) memory, without sorting
+    or copying the voxels.
+
     Attributes:
     ----------
     sequence : np.ndarray
         A numpy array representing the sequence from which statistical features are to be computed.
+    percentiles : list
+        The percentiles to extract, besides the median.
+    foreground_only : bool
+        Whether only the positive intensities (the brain) are described.
+    engine : str
+        Either "auto", "sort" or "histogram".
 
     Methods:
     -------
@@ -38,11 +60,26 @@ class StatisticalFeatures:
     get_kurtosis():
         Computes the kurtosis of the intensity values in the sequence.
 
-    get_stats_from_sequence():
+    compute_order_statistics(percentiles):
+        Computes the minimum, maximum and percentiles of the sequence from a single partial sort.
+
+    compute_moments():
+        Computes the mean, standard deviation, skewness and kurtosis of the sequence from one pass.
+
+    compute_histogram():
+        Computes the histogram of the integer intensities of the sequence.
+
+    compute_histogram_order_statistics(histogram, percentiles):
+        Computes the minimum, maximum and percentiles of the sequence from its histogram.
+
+    compute_histogram_moments(histogram):
+        Computes the mean, standard deviation, skewness and kurtosis of the sequence from its histogram.
+
+    extract_features():
         Computes and returns all statistical metrics as a dictionary.
     """
 
-    def __init__(self, sequence):
+    def __init__(self, sequence, percentiles: list = None, foreground_only: bool = False, engine: str = "auto"):
         """
         Constructs all the necessary attributes for the StatisticalFeatures object.
 
@@ -50,8 +87,26 @@ class StatisticalFeatures:
         ----------
         sequence : np.ndarray
             A numpy array representing the sequence from which statistical features are to be computed.
+        percentiles : list
+            The percentiles to extract, besides the median (default is [10, 90]).
+        foreground_only : bool
+            Whether to describe only the positive intensities, i.e. sequence[sequence > 0] (default is False).
+        engine : str
+            "sort", "histogram" (integer sequences only) or "auto" (default), which uses the histogram engine for
+            integer sequences with a small enough range of intensities and the sort engine otherwise.
         """
+        percentiles = list(DEFAULT_PERCENTILES if percentiles is None else percentiles)
+        if any(not 0 <= q <= 100 for q in percentiles):
+            raise ValueError(f"Invalid percentiles: {percentiles}. They must be between 0 and 100")
+        if engine not in ENGINES:
+            raise ValueError(f"Invalid statistical engine: {engine}. Available engines are {ENGINES}")
+        if engine == "histogram" and not np.issubdtype(np.asarray(sequence).dtype, np.integer):
+            raise ValueError(f"The histogram engine requires integer intensities, got {np.asarray(sequence).dtype}")
+
         self.sequence = sequence
+        self.percentiles = percentiles
+        self.foreground_only = foreground_only
+        self.engine = engine
 
     def get_max_intensity(self):
         """Computes the maximum intensity value in the sequence."""
@@ -89,10 +144,200 @@ class StatisticalFeatures:
         """Computes the kurtosis of the intensity values in the sequence."""
         return kurtosis(self.sequence.flatten())
 
+    def get_values(self) -> np.ndarray:
+        """Returns the intensities described by the features, as a flat array."""
+        if self.foreground_only:
+            return self.sequence[self.sequence > 0]
+        return np.ravel(self.sequence)
+
+    def compute_order_statistics(self, percentiles: list, values: np.ndarray = None) -> dict:
+        """
+        Computes the minimum, maximum and percentiles of the sequence from a single partial sort.
+
+        All the order statistics needed are selected by one ``np.partition`` call, and the percentiles are
+        then linearly interpolated as in ``np.percentile``.
+
+        Parameters:
+        ----------
+        percentiles : list
+            The percentiles to compute.
+        values : np.ndarray
+            The flat intensities to describe (default is the sequence).
+
+        Returns:
+        -------
+        dict
+            The "min" and "max" values, and the value of each percentile.
+        """
+        if values is None:
+            values = self.get_values()
+        n = values.size
+
+        positions = {q: (n - 1) * q / 100 for q in percentiles}
+        kth = (
+            {0, n - 1} | {int(np.floor(h)) for h in positions.values()} | {int(np.ceil(h)) for h in positions.values()}
+        )
+        ordered = np.partition(values, sorted(kth))
+
+        statistics = {"min": ordered[0], "max": ordered[n - 1]}
+        for q, h in positions.items():
+            a, b, t = ordered[int(np.floor(h))], ordered[int(np.ceil(h))], h - np.floor(h)
+            # same interpolation as np.percentile
+            statistics[q] = b - (b - a) * (1 - t) if t >= 0.5 else a + (b - a) * t
+
+        return statistics
+
+    def compute_moments(self, values: np.ndarray = None) -> dict:
+        """
+        Computes the mean, standard deviation, skewness and kurtosis of the sequence from one pass of central moments.
+
+        Parameters:
+        ----------
+        values : np.ndarray
+            The flat intensities to describe (default is the sequence).
+
+        Returns:
+        -------
+        dict
+            The "mean", "std", "skewness" and (Fisher) "kurtosis" values, as scipy.stats (biased) estimators.
+        """
+        if values is None:
+            values = self.get_values()
+        mean = values.mean(dtype=np.float64)
+
+        # accumulate in double precision, whatever the type of the intensities
+        deviations = values - mean
+        squared = deviations * deviations
+        m2 = squared.mean()
+        m3 = np.dot(squared, deviations) / values.size
+        m4 = np.dot(squared, squared) / values.size
+
+        return self.standardize_moments(mean, m2, m3, m4)
+
+    @staticmethod
+    def standardize_moments(mean: float, m2: float, m3: float, m4: float) -> dict:
+        """Builds the mean, standard deviation, skewness and kurtosis from the central moments of a sequence."""
+        # constant sequences have undefined skewness and kurtosis
+        if m2 <= (np.finfo(np.float64).eps * mean) ** 2:
+            return {"mean": mean, "std": np.sqrt(m2), "skewness": np.nan, "kurtosis": np.nan}
+
+        return {"mean": mean, "std": np.sqrt(m2), "skewness": m3 / m2**1.5, "kurtosis": m4 / m2**2 - 3}
+
+    def compute_histogram(self) -> tuple:
+        """
+        Computes the histogram of the integer intensities of the sequence.
+
+        The voxels are binned in chunks with ``np.bincount``, so that no copy of the whole sequence is made. When
+        only the foreground is described, the bins of the non-positive intensities are simply dropped.
+
+        Returns:
+        -------
+        tuple
+            The intensities (int64) and the number of voxels of each of them. Intensities absent from the sequence
+            may have empty bins.
+        """
+        values = np.ravel(self.sequence, order="K")
+        low, high = (int(values.min()), int(values.max())) if values.size else (0, -1)
+
+        counts = np.zeros(max(high - low + 1, 0), dtype=np.int64)
+        for start in range(0, values.size, HISTOGRAM_CHUNK_SIZE):
+            chunk = values[start : start + HISTOGRAM_CHUNK_SIZE].astype(np.int64) - low
+            counts += np.bincount(chunk, minlength=counts.size)
+
+        intensities = np.arange(low, high + 1, dtype=np.int64)
+        if self.foreground_only:
+            positive = intensities > 0
+            intensities, counts = intensities[positive], counts[positive]
+
+        return intensities, counts
+
+    @staticmethod
+    def compute_histogram_order_statistics(histogram: tuple, percentiles: list) -> dict:
+        """
+        Computes the minimum, maximum and percentiles of the sequence from its histogram.
+
+        Each order statistic is located in the cumulative histogram, and the percentiles are then linearly
+        interpolated as in ``np.percentile``.
+
+        Parameters:
+        ----------
+        histogram : tuple
+            The intensities and their number of voxels, as returned by compute_histogram.
+        percentiles : list
+            The percentiles to compute.
+
+        Returns:
+        -------
+        dict
+            The "min" and "max" values, and the value of each percentile.
+        """
+        intensities, counts = histogram
+        cumulative = np.cumsum(counts)
+        n = int(cumulative[-1])
+
+        def order_statistic(k):
+            return intensities[np.searchsorted(cumulative, k, side="right")]
+
+        statistics = {"min": order_statistic(0), "max": order_statistic(n - 1)}
+        for q in percentiles:
+            h = (n - 1) * q / 100
+            a, b, t = order_statistic(int(np.floor(h))), order_statistic(int(np.ceil(h))), h - np.floor(h)
+            # same interpolation as np.percentile
+            statistics[q] = b - (b - a) * (1 - t) if t >= 0.5 else a + (b - a) * t
+
+        return statistics
+
+    def compute_histogram_moments(self, histogram: tuple) -> dict:
+        """
+        Computes the mean, standard deviation, skewness and kurtosis of the sequence from its histogram.
+
+        Parameters:
+        ----------
+        histogram : tuple
+            The intensities and their number of voxels, as returned by compute_histogram.
+
+        Returns:
+        -------
+        dict
+            The "mean", "std", "skewness" and (Fisher) "kurtosis" values, as scipy.stats (biased) estimators.
+        """
+        intensities, counts = histogram
+        n = counts.sum()
+        mean = np.dot(counts, intensities) / n
+
+        deviations = intensities - mean
+        squared = deviations * deviations
+        weighted = counts * squared
+        m2 = weighted.sum() / n
+        m3 = np.dot(weighted, deviations) / n
+        m4 = np.dot(weighted, squared) / n
+
+        return self.standardize_moments(mean, m2, m3, m4)
+
+    def use_histogram(self) -> bool:
+        """Checks whether the statistics are computed with the histogram engine."""
+        if self.engine != "auto":
+            return self.engine == "histogram"
+
+        sequence = np.asarray(self.sequence)
+        if not np.issubdtype(sequence.dtype, np.integer) or sequence.size == 0:
+            return False
+        return int(sequence.max()) - int(sequence.min()) < MAX_HISTOGRAM_BINS
+
+    @staticmethod
+    def get_percentile_name(n) -> str:
+        """Returns the name of the n-th percentile feature, e.g. 10th_percentile_intensity."""
+        n = int(n) if float(n).is_integer() else n
+        suffix = "th" if 10 <= n % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+        return f"{n}{suffix}_percentile_intensity"
+
     def extract_features(self):
         """
         Computes and returns all statistical metrics as a dictionary.
 
+        The order statistics are computed from a single partial sort (or the histogram of the sequence) and the
+        moments from a single pass over the sequence (or its histogram), whatever the number of percentiles.
+
         Returns:
         -------
         dict
@@ -101,22 +346,253 @@ class StatisticalFeatures:
             - min_intensity
             - mean_intensity
             - median_intensity
-            - 10_percentile_intensity
-            - 90_percentile_intensity
             - std_intensity
+            - <n>th_percentile_intensity, for each percentile (10th and 90th by default)
             - range_intensity
             - skewness
             - kurtosis
         """
+        use_histogram = self.use_histogram()
+        if use_histogram:
+            histogram = self.compute_histogram()
+            n = histogram[1].sum()
+        else:
+            values = self.get_values()
+            n = values.size
+
+        # sequences without any voxel (e.g. no brain) have undefined statistics
+        if n == 0:
+            names = ["max_intensity", "min_intensity", "mean_intensity", "median_intensity", "std_intensity"]
+            names += [self.get_percentile_name(q) for q in self.percentiles]
+            names += ["range_intensity", "skewness", "kurtosis"]
+            return dict.fromkeys(names, np.nan)
+
+        if use_histogram:
+            order_statistics = self.compute_histogram_order_statistics(histogram, [50] + self.percentiles)
+            moments = self.compute_histogram_moments(histogram)
+        else:
+            order_statistics = self.compute_order_statistics([50] + self.percentiles, values)
+            moments = self.compute_moments(values)
+
         return {
-            "max_intensity": self.get_max_intensity(),
-            "min_intensity": self.get_min_intensity(),
-            "mean_intensity": self.get_mean_intensity(),
-            "median_intensity": self.get_median_intensity(),
-            "std_intensity": self.get_std_intensity(),
-            "10th_percentile_intensity": self.get_percentile_n(10),
-            "90th_percentile_intensity": self.get_percentile_n(90),
-            "range_intensity": self.get_range_intensity(),
-            "skewness": self.get_skewness(),
-            "kurtosis": self.get_kurtosis(),
+            "max_intensity": order_statistics["max"],
+            "min_intensity": order_statistics["min"],
+            "mean_intensity": moments["mean"],
+            "median_intensity": order_statistics[50],
+            "std_intensity": moments["std"],
+            **{self.get_percentile_name(q): order_statistics[q] for q in self.percentiles},
+            "range_intensity": order_statistics["max"] - order_statistics["min"],
+            "skewness": moments["skewness"],
+            "kurtosis": moments["kurtosis"],
         }
+
+
+class RegionalStatisticalFeatures:
+    """
+    A class to compute intensity statistics of sequences within each region of a segmentation.
+
+    The voxels of the segmented regions are indexed once. For each sequence, the statistics of every region are
+    then computed together: the moments with ``np.bincount`` weighted by the intensities, and the order statistics
+    from a single sort of the region voxels grouped by label. No masked copy is made per region.
+
+    Attributes:
+    ----------
+    segmentation : np.ndarray
+        A numpy array representing the segmentation of the medical image.
+    mapping_names : dict
+        A dictionary to map segmentation values to names. The background label is described as the whole tumor.
+    percentiles : list
+        The percentiles to extract, besides the median.
+
+    Methods:
+    -------
+    get_regions():
+        Gets the labels and names of the regions described.
+
+    get_feature_names():
+        Returns the names of the statistics computed for each region.
+
+    index_regions():
+        Indexes the voxels of the segmented regions and their region, once for all the sequences.
+
+    compute_grouped_statistics(values, groups, n_groups, percentiles):
+        Computes the intensity statistics of several groups of voxels at once.
+
+    extract_features(sequence):
+        Computes the intensity statistics of a sequence within each region.
+    """
+
+    def __init__(self, segmentation, mapping_names: dict = None, percentiles: list = None):
+        """
+        Constructs all the necessary attributes for the RegionalStatisticalFeatures object.
+
+        Parameters:
+        ----------
+        segmentation : np.ndarray
+            A numpy array representing the segmentation of the medical image.
+        mapping_names : dict
+            A dictionary to map segmentation values to names (default uses the labels found in the segmentation).
+        percentiles : list
+            The percentiles to extract, besides the median (default is [10, 90]).
+        """
+        percentiles = list(DEFAULT_PERCENTILES if percentiles is None else percentiles)
+        if any(not 0 <= q <= 100 for q in percentiles):
+            raise ValueError(f"Invalid percentiles: {percentiles}. They must be between 0 and 100")
+
+        self.segmentation = segmentation
+        self.mapping_names = mapping_names
+        self.percentiles = percentiles
+        self.voxels = None
+        self.codes = None
+
+    def get_regions(self) -> dict:
+        """
+        Gets the labels and names of the regions described: each tumor label and the whole tumor.
+
+        Returns:
+        -------
+        dict
+            The name of each label, plus the whole tumor with the label None.
+        """
+        if self.mapping_names:
+            labels = {int(k): str(v).lower() for k, v in self.mapping_names.items() if k != 0}
+        elif self.segmentation is not None:
+            labels = {int(k): str(int(k)) for k in np.unique(self.segmentation) if k != 0}
+        else:
+            labels = {}
+
+        return {**labels, None: "whole"}
+
+    def get_feature_names(self) -> list:
+        """Returns the names of the statistics computed for each region."""
+        names = ["mean_intensity", "median_intensity", "std_intensity"]
+        names += [StatisticalFeatures.get_percentile_name(q) for q in self.percentiles]
+        return names + ["skewness", "kurtosis"]
+
+    def index_regions(self):
+        """Indexes the voxels of the segmented regions and their region, once for all the sequences."""
+        if self.voxels is not None:
+            return
+
+        segmentation = np.ravel(self.segmentation)
+        self.voxels = np.flatnonzero(segmentation)
+
+        # position of the label of each voxel in the regions (-1 for labels not described)
+        labels = [label for label in self.get_regions() if label is not None]
+        labelled = segmentation[self.voxels].astype(np.int64)
+        self.codes = np.full(labelled.shape, -1, dtype=np.int64)
+        for code, label in enumerate(labels):
+            self.codes[labelled == label] = code
+
+    @staticmethod
+    def compute_grouped_statistics(values: np.ndarray, groups: np.ndarray, n_groups: int, percentiles: list) -> list:
+        """
+        Computes the intensity statistics of several groups of voxels at once.
+
+        Parameters:
+        ----------
+        values : np.ndarray
+            The intensities of the voxels.
+        groups : np.ndarray
+            The group of each voxel, between 0 and n_groups - 1.
+        n_groups : int
+            The number of groups.
+        percentiles : list
+            The percentiles to compute, besides the median.
+
+        Returns:
+        -------
+        list
+            A dictionary of statistics per group (NaN for groups without voxels).
+        """
+        counts = np.bincount(groups, minlength=n_groups)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.bincount(groups, values, minlength=n_groups) / counts
+
+            # central moments of every group from one pass of weighted counts
+            deviations = values - means[groups]
+            squared = deviations * deviations
+            m2 = np.bincount(groups, squared, minlength=n_groups) / counts
+            m3 = np.bincount(groups, squared * deviations, minlength=n_groups) / counts
+            m4 = np.bincount(groups, squared * squared, minlength=n_groups) / counts
+
+        # sort by group and then by intensity, so that each group is a contiguous sorted run
+        ordered = values[np.lexsort((values, groups))]
+        starts = np.cumsum(counts) - counts
+
+        statistics = []
+        for g in range(n_groups):
+            n = counts[g]
+            if n == 0:
+                statistics.append(None)
+                continue
+
+            quantiles = {}
+            for q in [50] + percentiles:
+                h = (n - 1) * q / 100
+                a, b, t = ordered[starts[g] + int(np.floor(h))], ordered[starts[g] + int(np.ceil(h))], h - np.floor(h)
+                # same interpolation as np.percentile
+                quantiles[q] = b - (b - a) * (1 - t) if t >= 0.5 else a + (b - a) * t
+
+            moments = StatisticalFeatures.standardize_moments(means[g], m2[g], m3[g], m4[g])
+            statistics.append({**moments, **quantiles})
+
+        return statistics
+
+    def extract_features(self, sequence) -> dict:
+        """
+        Computes the intensity statistics of a sequence within each region.
+
+        Parameters:
+        ----------
+        sequence : np.ndarray
+            A numpy array representing the sequence, with the shape of the segmentation.
+
+        Returns:
+        -------
+        dict
+            The statistics of each region, named <region>_<statistic> (e.g. enh_mean_intensity). Regions without
+            voxels have NaN statistics.
+        """
+        regions = self.get_regions()
+        names = self.get_feature_names()
+        features = {f"{region}_{name}": np.nan for region in regions.values() for name in names}
+        if self.segmentation is None or sequence is None:
+            return features
+        if np.shape(sequence) != np.shape(self.segmentation):
+            logger.warning(
+                f"Sequence shape {np.shape(sequence)} does not match segmentation shape {np.shape(self.segmentation)}."
+                " Assigning NaN to the regional statistics"
+            )
+            return features
+
+        self.index_regions()
+        values = np.ravel(sequence)[self.voxels].astype(np.float64)
+        described = self.codes >= 0
+
+        # every label at once, then the whole tumor (all the segmented voxels)
+        statistics = self.compute_grouped_statistics(
+            values[described], self.codes[described], len(regions) - 1, self.percentiles
+        )
+        statistics += self.compute_grouped_statistics(
+            values, np.zeros(values.size, dtype=np.int64), 1, self.percentiles
+        )
+
+        for region, region_statistics in zip(regions.values(), statistics):
+            if region_statistics is None:
+                continue
+            features.update(
+                {
+                    f"{region}_mean_intensity": region_statistics["mean"],
+                    f"{region}_median_intensity": region_statistics[50],
+                    f"{region}_std_intensity": region_statistics["std"],
+                    **{
+                        f"{region}_{StatisticalFeatures.get_percentile_name(q)}": region_statistics[q]
+                        for q in self.percentiles
+                    },
+                    f"{region}_skewness": region_statistics["skewness"],
+                    f"{region}_kurtosis": region_statistics["kurtosis"],
+                }
+            )
+
+        return features
@@ -1,28 +1,63 @@
+import itertools
+
 import numpy as np
-from skimage.feature import graycomatrix
-from skimage.feature import graycoprops
 
-from audit.utils.sequences.sequences import fit_brain_boundaries
+from audit.utils.sequences.sequences import get_brain_bounding_box
+
+TEXTURES = ["contrast", "dissimilarity", "homogeneity", "ASM", "energy", "correlation"]
+
+# offsets (rows, columns) of the angles 0, pi/4, pi/2 and 3pi/4 at distance 1
+OFFSETS_2D = [(0, 1), (1, 1), (1, 0), (1, -1)]
+
+# the 13 unique offsets (z, y, x) between a voxel and its 26 neighbours (opposite offsets are redundant since the
+# co-occurrence matrices are symmetric)
+OFFSETS_3D = [offset for offset in itertools.product([-1, 0, 1], repeat=3) if offset > (0, 0, 0)]
 
 
 class TextureFeatures:
     """
     A class to compute second order texture features from a given MRI image.
 
+    The gray-level co-occurrence matrices (GLCM) are built once, with a vectorized ``np.bincount`` over the pairs
+    of shifted voxels, and every texture property is derived from them. In "2d" mode, one matrix is built for each
+    axial plane and angle (4 angles). In "3d" mode, one matrix is built for the whole volume and each of the 13
+    directions of the 3D neighbourhood.
+
     Attributes:
     ----------
     image_array : np.ndarray
         A 3D numpy array representing the MRI image.
+    levels : int
+        Number of gray levels the image is quantized to.
+    mode : str
+        Either "2d" (co-occurrences within axial planes) or "3d" (co-occurrences in the 3D neighbourhood).
+    foreground_only : bool
+        Whether co-occurrences are restricted to pairs of foreground (non-zero) voxels.
+    min_foreground_fraction : float
+        Minimum fraction of foreground voxels of the axial planes used in "2d" mode.
+    brain_mask : np.ndarray
+        A boolean array of the foreground (non-zero) voxels of the image, computed on demand if not given.
 
     Methods:
     -------
     compute_texture_values(texture="contrast"):
         Computes texture values for each 2D plane in the 3D image array.
+    compute_textures_values(textures=None) -> dict:
+        Computes the values of several textures for each 2D plane (or 3D direction) in one pass.
     extract_features(texture="contrast") -> dict:
         Extracts texture features from the MRI image.
     """
 
-    def __init__(self, sequence: np.array, remove_empty_planes: bool = False):
+    def __init__(
+        self,
+        sequence: np.array,
+        remove_empty_planes: bool = False,
+        levels: int = 256,
+        mode: str = "2d",
+        foreground_only: bool = False,
+        min_foreground_fraction: float = 0.0,
+        brain_mask: np.ndarray = None,
+    ):
         """
         Constructs all the necessary attributes for the TextureFeatures object.
 
@@ -30,58 +65,246 @@ class TextureFeatures:
         ----------
         sequence : np.ndarray
             A 3D numpy array representing the MRI image.
+        remove_empty_planes : bool
+            Whether to crop the image to its non-zero region before computing textures (default is False).
+        levels : int
+            Number of gray levels the image is quantized to, between 2 and 256 (default is 256).
+        mode : str
+            Either "2d" (default) or "3d".
+        foreground_only : bool
+            Whether to restrict the co-occurrences to pairs of foreground (non-zero) voxels (default is False). In
+            "2d" mode, planes without any such pair are skipped.
+        min_foreground_fraction : float
+            In "2d" mode, planes whose fraction of foreground voxels is below this value are skipped (default is 0).
+        brain_mask : np.ndarray
+            A boolean array of the foreground (non-zero) voxels of the image, if already computed.
         """
+        if not isinstance(levels, int) or not 2 <= levels <= 256:
+            raise ValueError(f"Invalid number of gray levels: {levels}. It must be an integer between 2 and 256")
+        if mode not in ["2d", "3d"]:
+            raise ValueError(f"Invalid texture mode: {mode}. Available modes are '2d' and '3d'")
+        if not 0 <= min_foreground_fraction <= 1:
+            raise ValueError(f"Invalid minimum foreground fraction: {min_foreground_fraction}. It must be in [0, 1]")
+
         self.sequence = sequence
         self.remove_empty_planes = remove_empty_planes
+        self.levels = levels
+        self.mode = mode
+        self.foreground_only = foreground_only
+        self.min_foreground_fraction = min_foreground_fraction
+        self.brain_mask = brain_mask
+
+    def get_brain_mask(self) -> np.ndarray:
+        """Returns the foreground (non-zero) voxels of the image, computing them only once."""
+        if self.brain_mask is None:
+            self.brain_mask = self.sequence != 0
+        return self.brain_mask
+
+    def get_bounding_box(self) -> tuple:
+        """Returns the slices of the non-zero region of the image (plus one voxel), or of the whole image."""
+        if self.remove_empty_planes:
+            return get_brain_bounding_box(self.get_brain_mask(), padding=1)
+        return tuple(slice(None) for _ in np.shape(self.sequence))
 
-    def compute_texture_values(self, texture: str = None):
+    def crop(self) -> np.ndarray:
+        """Crops the image to its non-zero region, if required."""
+        return self.sequence[self.get_bounding_box()]
+
+    def quantize(self, sequence: np.ndarray = None) -> np.ndarray:
         """
-        Computes texture values for each 2D plane in the 3D image array.
+        Rescales the image to integer gray levels between 0 and levels - 1.
 
         Parameters:
         ----------
-        texture : str
-            The texture feature to compute (default is "contrast").
+        sequence : np.ndarray
+            The image to quantize (default is the cropped image).
 
         Returns:
         -------
         np.ndarray
-            An array of texture values for each 2D plane in the image.
+            The quantized image.
         """
-        if texture is None:
-            texture = []
+        if sequence is None:
+            sequence = self.crop()
 
-        if np.all(self.sequence == 0):
-            return np.nan
+        # integer images are rescaled in double precision, so that they do not overflow; floating point images keep
+        # their precision, so that their gray levels do not change
+        sequence = np.asarray(sequence)
+        if not np.issubdtype(sequence.dtype, np.floating):
+            sequence = sequence.astype(np.float64)
+        min_value, max_value = np.min(sequence), np.max(sequence)
+        if max_value == min_value:
+            return np.zeros(sequence.shape, dtype=np.uint8)
 
-        sequence = self.sequence.copy()
-        if self.remove_empty_planes:
-            sequence = fit_brain_boundaries(self.sequence)
+        # Normalize the image to values between 0 and levels - 1
+        return ((self.levels - 1) * (sequence - min_value) / (max_value - min_value)).astype(np.uint8)
+
+    @staticmethod
+    def compute_glcm(images: np.ndarray, offsets: list, levels: int, mask: np.ndarray = None) -> np.ndarray:
+        """
+        Computes the symmetric gray-level co-occurrence counts of a stack of images.
 
-        # Normalize the image to values between 0 and 255
-        image_array = (255 * (sequence - np.min(sequence)) / (np.max(sequence) - np.min(sequence))).astype(np.uint8)
+        Parameters:
+        ----------
+        images : np.ndarray
+            An array of gray levels whose first axis indexes the images, e.g. (planes, rows, columns).
+        offsets : list
+            The offsets of the voxel pairs, with one value per image axis.
+        levels : int
+            Number of gray levels.
+        mask : np.ndarray
+            Boolean array with the shape of the images. If given, only pairs of voxels within it are counted.
+
+        Returns:
+        -------
+        np.ndarray
+            The co-occurrence counts, with shape (images, offsets, levels, levels).
+        """
+        n_images, shape = images.shape[0], images.shape[1:]
+        images = images.astype(np.intp)
+        image_index = np.arange(n_images).reshape((-1,) + (1,) * len(shape))
+
+        glcm = np.empty((n_images, len(offsets), levels, levels), dtype=np.int64)
+        for k, offset in enumerate(offsets):
+            reference = (slice(None),) + tuple(slice(max(0, -d), n - max(0, d)) for d, n in zip(offset, shape))
+            neighbour = (slice(None),) + tuple(slice(max(0, d), n + min(0, d)) for d, n in zip(offset, shape))
+            codes = ((image_index * levels + images[reference]) * levels + images[neighbour]).ravel()
+            if mask is not None:
+                codes = codes[(mask[reference] & mask[neighbour]).ravel()]
+            glcm[:, k] = np.bincount(codes, minlength=n_images * levels * levels).reshape(n_images, levels, levels)
+
+        return glcm + glcm.swapaxes(-1, -2)
 
-        # Define distances and angles for GLCM calculation
-        distances = [1]
-        angles = [0, np.pi / 4, np.pi / 2, 3 * np.pi / 4]
+    @staticmethod
+    def compute_properties(glcm: np.ndarray, textures: list) -> dict:
+        """
+        Computes texture properties from gray-level co-occurrence matrices, as skimage.feature.graycoprops.
 
-        # Initialize a list to store the texture values for each plane
-        texture_values = []
+        Parameters:
+        ----------
+        glcm : np.ndarray
+            Co-occurrence counts whose last two axes are the gray levels.
+        textures : list
+            The texture properties to compute.
 
-        # Iterate over each 2D plane in the Z dimension
-        for z in range(image_array.shape[0]):
-            plane = image_array[z, :, :]
+        Returns:
+        -------
+        dict
+            The values of each texture, with the shape of the leading axes of the matrices.
+        """
+        # normalize each GLCM
+        P = glcm.astype(np.float64)
+        sums = P.sum(axis=(-2, -1), keepdims=True)
+        sums[sums == 0] = 1
+        P /= sums
 
-            # Compute GLCM for the current plane
-            glcm = graycomatrix(plane, distances=distances, angles=angles, levels=256, symmetric=True, normed=True)
+        levels = P.shape[-1]
+        i, j = np.ogrid[0:levels, 0:levels]
+        weights = {
+            "contrast": (i - j) ** 2,
+            "dissimilarity": np.abs(i - j),
+            "homogeneity": 1.0 / (1.0 + (i - j) ** 2),
+        }
 
-            # Compute the texture feature using skimage.feature.graycoprops
-            feature_value = graycoprops(glcm, prop=texture).mean()
+        properties = {}
+        for texture in textures:
+            if texture in weights:
+                properties[texture] = np.tensordot(P, weights[texture].astype(np.float64), axes=([-2, -1], [0, 1]))
+            elif texture in ["ASM", "energy"]:
+                asm = np.einsum("...ij,...ij->...", P, P)
+                properties[texture] = asm if texture == "ASM" else np.sqrt(asm)
+            elif texture == "correlation":
+                gray_levels = np.arange(levels, dtype=np.float64)
+                diff_i = gray_levels - (P.sum(axis=-1) @ gray_levels)[..., None]
+                diff_j = gray_levels - (P.sum(axis=-2) @ gray_levels)[..., None]
+                std_i = np.sqrt(np.sum(P.sum(axis=-1) * diff_i**2, axis=-1))
+                std_j = np.sqrt(np.sum(P.sum(axis=-2) * diff_j**2, axis=-1))
+                cov = np.einsum("...ij,...i,...j->...", P, diff_i, diff_j)
 
-            # Store the texture value of the current plane
-            texture_values.append(feature_value)
+                # handle the special case of standard deviations near zero
+                constant = (std_i < 1e-15) | (std_j < 1e-15)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    properties[texture] = np.where(constant, 1.0, cov / (std_i * std_j))
+            else:
+                raise ValueError(f"{texture} is an invalid property")
 
-        return np.array(texture_values)
+        return properties
+
+    def compute_textures_values(self, textures: list = None) -> dict:
+        """
+        Computes the values of several textures in one pass.
+
+        The co-occurrence matrices are built once and shared by all the textures. In "2d" mode, there is a value
+        per axial plane (the average of the texture over the four angles), skipping the planes with too little
+        foreground. In "3d" mode, there is a value per direction of the 3D neighbourhood.
+
+        Parameters:
+        ----------
+        textures : list
+            The texture features to compute (default is all of them).
+
+        Returns:
+        -------
+        dict
+            An array of texture values for each plane (or direction), per texture (NaN for empty images).
+        """
+        if not textures:
+            textures = TEXTURES
+
+        brain_mask = self.get_brain_mask()
+        if not brain_mask.any():
+            return {texture: np.nan for texture in textures}
+
+        box = self.get_bounding_box()
+        image_array = self.quantize(self.sequence[box])
+        foreground = brain_mask[box]
+        mask = foreground if self.foreground_only else None
+
+        if self.mode == "3d":
+            mask = mask[np.newaxis] if mask is not None else None
+            glcm = self.compute_glcm(image_array[np.newaxis], OFFSETS_3D, self.levels, mask)
+            return {texture: values[0] for texture, values in self.compute_properties(glcm, textures).items()}
+
+        # skip the planes with too little foreground
+        if self.min_foreground_fraction > 0:
+            planes = foreground.mean(axis=(1, 2)) >= self.min_foreground_fraction
+            image_array = image_array[planes]
+            mask = mask[planes] if mask is not None else None
+
+        # process the planes in chunks to bound the size of the co-occurrence matrices
+        chunk_size = max(1, 2**22 // (len(OFFSETS_2D) * self.levels**2))
+        chunks = []
+        for start in range(0, image_array.shape[0], chunk_size):
+            chunk_mask = mask[start : start + chunk_size] if mask is not None else None
+            glcm = self.compute_glcm(image_array[start : start + chunk_size], OFFSETS_2D, self.levels, chunk_mask)
+
+            # planes without any pair of foreground voxels have no texture
+            if mask is not None:
+                glcm = glcm[glcm.sum(axis=(1, 2, 3)) > 0]
+
+            properties = self.compute_properties(glcm, textures)
+            chunks.append({texture: values.mean(axis=-1) for texture, values in properties.items()})
+
+        if not chunks or sum(len(chunk[textures[0]]) for chunk in chunks) == 0:
+            return {texture: np.nan for texture in textures}
+
+        return {texture: np.concatenate([chunk[texture] for chunk in chunks]) for texture in textures}
+
+    def compute_texture_values(self, texture: str = "contrast"):
+        """
+        Computes texture values for each 2D plane in the 3D image array.
+
+        Parameters:
+        ----------
+        texture : str
+            The texture feature to compute (default is "contrast").
+
+        Returns:
+        -------
+        np.ndarray
+            An array of texture values for each 2D plane in the image.
+        """
+        return self.compute_textures_values([texture])[texture]
 
     def extract_features(self, textures: list = None) -> dict:
         """
@@ -98,11 +321,13 @@ class TextureFeatures:
             A dictionary containing texture features for each plane.
         """
         if not textures:
-            textures = ["contrast", "dissimilarity", "homogeneity", "ASM", "energy", "correlation"]
+            textures = TEXTURES
+
+        textures_values = self.compute_textures_values(textures)
 
         features = {}
         for texture in textures:
-            texture_values = self.compute_texture_values(texture=texture)
+            texture_values = textures_values[texture]
 
             # Create a dictionary to store texture features
             features.update({f"mean_{texture.lower()}": np.mean(texture_values)})
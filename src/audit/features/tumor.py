@@ -1,5 +1,3 @@
-from collections import Counter
-
 import numpy as np
 from loguru import logger
 from scipy.spatial.distance import euclidean
@@ -22,6 +20,9 @@ class TumorFeatures:
 
     Methods:
     -------
+    compute_label_statistics():
+        Computes the number of voxels and the coordinate sums of every label in one pass (cached).
+
     count_tumor_pixels():
         Counts the number of pixels for each unique value in the segmentation.
 
@@ -32,7 +33,7 @@ class TumorFeatures:
         Calculates the center of mass for the tumor in the image.
 
     get_tumor_slices():
-        Gets the slices that contain tumor regions in axial, coronal, and sagittal planes.
+        Gets the slices that contain tumor regions in axial, coronal, and sagittal planes (cached).
     """
 
     def __init__(self, segmentation, spacing=(1, 1, 1), mapping_names=None, planes=None):
@@ -56,12 +57,45 @@ class TumorFeatures:
         self.number_pixels = None
         self.tumor_slices = None
         self.position_tumor_slices = None
+        self.tumor_slices_indices = None
+        self.label_statistics = None
         self.segmentation = segmentation
         self.spacing = np.array(spacing)
         self.mapping_names = mapping_names
         self.planes = planes if planes is not None else ["axial", "coronal", "sagittal"]
         self.tumor_centre_mass_per_label = {}
 
+    def compute_label_statistics(self) -> dict:
+        """
+        Computes the number of voxels and the sum of the coordinates of every label of the segmentation in one pass.
+
+        Only the positions of the tumor (non-zero) voxels are gathered. The number of voxels of each label and the
+        sums of their coordinates along each axis are then accumulated with ``np.bincount``. The result is cached
+        and shared by the lesion sizes and the centers of mass.
+
+        Returns:
+        -------
+        dict
+            The sorted non-zero "labels", their voxel "counts", their coordinate "sums" (one row per label) and the
+            number of "background" voxels.
+        """
+        if self.label_statistics is None:
+            values = np.ravel(self.segmentation)
+            voxels = np.flatnonzero(values)
+            labels, codes = np.unique(values[voxels], return_inverse=True)
+            coordinates = np.unravel_index(voxels, np.shape(self.segmentation))
+
+            self.label_statistics = {
+                "labels": labels,
+                "counts": np.bincount(codes, minlength=labels.size),
+                "sums": np.stack(
+                    [np.bincount(codes, weights=c, minlength=labels.size) for c in coordinates], axis=-1
+                ).reshape(labels.size, len(coordinates)),
+                "background": values.size - voxels.size,
+            }
+
+        return self.label_statistics
+
     def count_tumor_pixels(self):
         """
         Counts the number of pixels for each unique value in the segmentation.
@@ -77,8 +111,11 @@ class TumorFeatures:
             else:
                 return {}
 
-        unique, counts = np.unique(self.segmentation, return_counts=True)
-        pixels_dict = dict(zip(unique, counts))
+        statistics = self.compute_label_statistics()
+        pixels_dict = dict(zip(statistics["labels"], statistics["counts"]))
+        if statistics["background"] > 0:
+            pixels_dict[statistics["labels"].dtype.type(0)] = statistics["background"]
+        pixels_dict = dict(sorted(pixels_dict.items()))
 
         if self.mapping_names:
             pixels_dict = {str(self.mapping_names.get(k, k)).lower(): v for k, v in pixels_dict.items()}
@@ -97,7 +134,8 @@ class TumorFeatures:
         if self.segmentation is None:
             return {"lesion_size_whole": np.nan}
 
-        lesion_size = (self.segmentation > 0).sum() * np.prod(self.spacing)
+        statistics = self.compute_label_statistics()
+        lesion_size = statistics["counts"][statistics["labels"] > 0].sum() * np.prod(self.spacing)
         return {"lesion_size_whole": lesion_size}
 
     def get_tumor_center_mass(self, label=None):
@@ -118,44 +156,47 @@ class TumorFeatures:
             logger.warning("Segmentation is required to calculate the tumor center of mass. Assigning (nan, nan, nan)")
             return np.array([np.nan] * 3)  # assuming 3-d MRI
 
-        if label is not None and not np.any(self.segmentation == label):
+        statistics = self.compute_label_statistics()
+        present = statistics["background"] > 0 if label == 0 else np.any(statistics["labels"] == label)
+        if label is not None and not present:
             logger.warning(f"Label {label} not found in segmentation.")
             return np.array([np.nan] * len(self.segmentation.shape))
 
-        coordinates = np.argwhere(self.segmentation == label) if label != 0 else np.argwhere(self.segmentation != 0)
-        if coordinates.size == 0:
+        # the whole tumor (label 0) gathers all the non-zero labels
+        selected = statistics["labels"] == label if label != 0 else np.ones(statistics["labels"].size, dtype=bool)
+        count = statistics["counts"][selected].sum()
+        if count == 0:
             logger.warning("No tumor coordinates found. Assigning (nan, nan, nan)")
             return np.array([np.nan] * len(self.segmentation.shape))
 
-        center_of_mass_mean = np.mean(coordinates, axis=0)
+        center_of_mass_mean = statistics["sums"][selected].sum(axis=0) / count
         return center_of_mass_mean * self.spacing
 
     def get_tumor_slices(self):
+        """
+        Gets the slices that contain tumor regions in axial, coronal, and sagittal planes.
+
+        The slices are found from the projections of the tumor mask along each axis, computed once and cached.
+
+        Returns:
+        -------
+        tuple
+            The indices of the tumor slices in the axial, coronal and sagittal planes.
+        """
         if self.segmentation is None:
             return np.nan, np.nan, np.nan
 
-        axial_dim, coronal_dim, sagittal_dim = self.segmentation.shape
-        axial_tumor_slices, coronal_tumor_slices, sagittal_tumor_slices = [], [], []
-
-        # axial plane
-        for n, s in enumerate(range(axial_dim)):
-            slc = self.segmentation[s, :, :]
-            if Counter(slc.flatten()).get(0) != (coronal_dim * sagittal_dim):
-                axial_tumor_slices.append(n)
+        if self.tumor_slices_indices is None:
+            tumor = self.segmentation != 0
 
-        # coronal plane
-        for n, s in enumerate(range(coronal_dim)):
-            slc = self.segmentation[:, s, :]
-            if Counter(slc.flatten()).get(0) != (axial_dim * sagittal_dim):
-                coronal_tumor_slices.append(n)
+            # project the tumor onto the coronal-sagittal plane once, and derive the other two planes from it
+            axial = tumor.any(axis=(1, 2))
+            projection = tumor.any(axis=0)
+            coronal, sagittal = projection.any(axis=1), projection.any(axis=0)
 
-        # sagittal plane
-        for n, s in enumerate(range(sagittal_dim)):
-            slc = self.segmentation[:, :, s]
-            if Counter(slc.flatten()).get(0) != (axial_dim * coronal_dim):
-                sagittal_tumor_slices.append(n)
+            self.tumor_slices_indices = tuple(np.flatnonzero(p).tolist() for p in (axial, coronal, sagittal))
 
-        return axial_tumor_slices, coronal_tumor_slices, sagittal_tumor_slices
+        return self.tumor_slices_indices
 
     def calculate_tumor_slices(self):
         if self.segmentation is None:
@@ -17,6 +17,7 @@ from audit.metrics.backends.pymia.pymia import extract_pymia_metrics
 from audit.utils.internal._config_helpers import check_metric_extraction_config
 from audit.utils.internal._config_helpers import configure_logging
 from audit.utils.internal._config_helpers import load_config_file
+from audit.utils.internal._csv_helpers import write_dataset
 
 
 def run_metric_extraction(config_path):
@@ -44,21 +45,25 @@ def run_metric_extraction(config_path):
     logger.info("Starting metric extraction process")
 
     if config["backend"] == "audit":
-        extracted_metrics = extract_audit_metrics(config_file=config)
+        extracted_metrics, checkpoint = extract_audit_metrics(config_file=config)
     elif config["backend"] == "pymia":
-        extracted_metrics = extract_pymia_metrics(config_file=config)
+        extracted_metrics, checkpoint = extract_pymia_metrics(config_file=config)
     elif config["backend"] == "metricsreloaded":
-        extracted_metrics = extract_metricsreloaded_metrics(config_file=config)
+        extracted_metrics, checkpoint = extract_metricsreloaded_metrics(config_file=config)
     else:
-        extracted_metrics = pd.DataFrame()
+        extracted_metrics, checkpoint = pd.DataFrame(), None
 
     logger.info(f"Finishing metric extraction")
 
     # store information
     if not extracted_metrics.empty:
-        file_path = os.path.join(output_path, f"extracted_information_{config['filename']}.csv")
-        extracted_metrics.to_csv(file_path, index=False)
-        logger.info(f"Results exported to CSV file")
+        file_path = os.path.join(output_path, f"extracted_information_{config['filename']}")
+        file_path = write_dataset(extracted_metrics, file_path, config.get("output_format", "csv"))
+        logger.info(f"Results exported to {file_path}")
+
+    # the checkpoint is kept until the results are safely stored
+    if checkpoint is not None:
+        checkpoint.remove()
 
 
 def main():
@@ -1,62 +1,84 @@
-from multiprocessing import Lock
-from multiprocessing import Manager
 from multiprocessing import Pool
+from typing import Optional
 
 import pandas as pd
 from colorama import Fore
 from loguru import logger
 
+from audit.metrics.backends.commons import check_crop_margin
 from audit.metrics.backends.commons import check_multiprocessing
+from audit.metrics.backends.commons import check_volume_cache
+from audit.metrics.backends.commons import checkpoint_results
 from audit.metrics.backends.commons import initializer
-from audit.metrics.backends.commons import load_subject_data
+from audit.metrics.backends.commons import load_ground_truth
+from audit.metrics.backends.commons import load_prediction
+from audit.metrics.backends.commons import open_metrics_checkpoint
+from audit.metrics.backends.commons import open_metrics_manifest
+from audit.metrics.backends.commons import resume_from_checkpoint
+from audit.metrics.backends.commons import reuse_stored_results
 from audit.metrics.backends.commons import standardize_output
+from audit.metrics.backends.commons import store_results
 from audit.metrics.segmentation_metrics import calculate_metrics
-from audit.metrics.segmentation_metrics import one_hot_encoding
+from audit.metrics.segmentation_metrics import crop_to_foreground
+from audit.utils.commons.checkpoint import ExtractionCheckpoint
 from audit.utils.commons.file_manager import list_dirs
 from audit.utils.commons.strings import fancy_print
 from audit.utils.commons.strings import fancy_tqdm
 
 
-def process_subject(data: pd.DataFrame, params: dict, cpu_cores: int) -> pd.DataFrame:
-    """Compute AUDIT custom metrics for a single subject."""
+def process_subject(params: dict) -> dict:
+    """Compute AUDIT custom metrics of every model for a single subject.
+
+    The ground truth is decoded once, and each model's prediction is then evaluated against it
+    directly on the label maps, cropped to the bounding box of their joint foreground. Returns the
+    rows (one per region) keyed by (model, subject).
+    """
     path_ground_truth_dataset = params["path_ground_truth_dataset"]
-    path_predictions = params["path_predictions"]
+    model_predictions_paths = params["model_predictions_paths"]
     numeric_label = params["numeric_label"]
     subject_id = params["subject_id"]
     label_names = params["label_names"]
     metrics_to_extract = params["metrics_to_extract"]
-    model_name = params["model_name"]
-
-    # load arrays using the shared utility
-    gt, pred, spacing = load_subject_data(path_ground_truth_dataset, path_predictions, subject_id)
-
-    # one-hot encode each region
-    gt = one_hot_encoding(gt, numeric_label)
-    pred = one_hot_encoding(pred, numeric_label)
-
-    # compute metrics
-    metrics = calculate_metrics(
-        ground_truth=gt,
-        segmentation=pred,
-        subject=subject_id,
-        regions=label_names,
-        metrics=metrics_to_extract,
-        spacing=spacing,
-    )
-
-    subject_info_df = pd.DataFrame(metrics)
-    subject_info_df["model"] = model_name
-
-    if cpu_cores == 1:
-        return subject_info_df
-
-    with dataframe_lock:
-        data[subject_id] = subject_info_df
-
-    return data
-
-
-def extract_audit_metrics(config_file) -> pd.DataFrame:
+    crop_margin = params["crop_margin"]
+
+    # load the ground truth once for all the models
+    gt = load_ground_truth(path_ground_truth_dataset, subject_id)
+    if gt is None:
+        logger.warning(f"Ground truth of subject {subject_id} not found or unreadable, skipping the subject")
+        return {}
+
+    results = {}
+    for model_name, path_predictions in model_predictions_paths.items():
+        # the other models of the subject are still evaluated if one of them fails
+        try:
+            pred, spacing = load_prediction(path_predictions, subject_id)
+            if pred is None:
+                logger.warning(
+                    f"Prediction of {model_name} for subject {subject_id} not found or unreadable, skipping it"
+                )
+                continue
+            gt_cropped, pred_cropped, n_background = crop_to_foreground(gt, pred, crop_margin)
+
+            # compute metrics
+            metrics = calculate_metrics(
+                ground_truth=gt_cropped,
+                segmentation=pred_cropped,
+                subject=subject_id,
+                regions=label_names,
+                labels=numeric_label,
+                metrics=metrics_to_extract,
+                spacing=spacing,
+                n_background=n_background,
+            )
+        except Exception as e:
+            logger.error(f"Could not compute the metrics of {model_name} for subject {subject_id}, skipping it: {e}")
+            continue
+        results[(model_name, subject_id)] = [{**row, "model": model_name} for row in metrics]
+
+    return results
+
+
+def extract_audit_metrics(config_file) -> tuple[pd.DataFrame, Optional[ExtractionCheckpoint]]:
     label_names = list(config_file["labels"].keys())
     numeric_label = list(config_file["labels"].values())
 
@@ -65,67 +87,64 @@ def extract_audit_metrics(config_file) -> pd.DataFrame:
     subjects_list = list_dirs(path_ground_truth_dataset)
 
     models = config_file["model_predictions_paths"]
-    raw_metrics = pd.DataFrame()
     cpu_cores = check_multiprocessing(config_file)
-
-    if cpu_cores == 1:
-        for model_name, path_predictions in models.items():
-            fancy_print(f"\nStarting metric extraction for model {model_name}", Fore.LIGHTMAGENTA_EX, "✨")
-            logger.info(f"Starting metric extraction for model {model_name}")
-
-            with fancy_tqdm(total=len(subjects_list), desc=f"{Fore.CYAN}Progress", leave=True) as pbar:
-                for subject_id in subjects_list:
-                    pbar.set_postfix_str(f"{Fore.CYAN}Current subject: {Fore.LIGHTBLUE_EX}{subject_id}{Fore.CYAN}")
-                    pbar.update(1)
-
-                    params = {
-                        "path_ground_truth_dataset": path_ground_truth_dataset,
-                        "path_predictions": path_predictions,
-                        "numeric_label": numeric_label,
-                        "subject_id": subject_id,
-                        "label_names": label_names,
-                        "metrics_to_extract": metrics_to_extract,
-                        "model_name": model_name,
-                    }
-
-                    subject_info_df = process_subject(pd.DataFrame(), params, cpu_cores)
-                    raw_metrics = pd.concat([raw_metrics, subject_info_df], ignore_index=True)
-
-            logger.info(f"Finishing metric extraction for model {model_name}")
-
-        return standardize_output(raw_metrics)
-
-    # multiprocessing path
-    manager = Manager()
-    shared_data = manager.dict()
-    lock = Lock()
-
-    with Pool(processes=cpu_cores, initializer=initializer, initargs=(shared_data, lock)) as pool:
-        for model_name, path_predictions in models.items():
-            fancy_print(f"\nStarting metric extraction for model {model_name}", Fore.LIGHTMAGENTA_EX, "✨")
-            logger.info(f"Starting metric extraction for model {model_name}")
-
-            tasks = []
-            for subject_id in subjects_list:
-                params = {
-                    "path_ground_truth_dataset": path_ground_truth_dataset,
-                    "path_predictions": path_predictions,
-                    "numeric_label": numeric_label,
-                    "subject_id": subject_id,
-                    "label_names": label_names,
-                    "metrics_to_extract": metrics_to_extract,
-                    "model_name": model_name,
-                }
-                tasks.append(pool.apply_async(process_subject, args=(shared_data, params, cpu_cores)))
-
-            with fancy_tqdm(total=len(subjects_list), desc=f"{Fore.CYAN}Progress", leave=True) as pbar:
-                for task in tasks:
-                    task.wait()
+    volume_cache = check_volume_cache(config_file)
+    crop_margin = check_crop_margin(config_file)
+
+    # a single flat queue with one task per subject (evaluating all the models against its ground truth), so that
+    # no worker idles at model boundaries
+    tasks = [
+        {
+            "path_ground_truth_dataset": path_ground_truth_dataset,
+            "model_predictions_paths": models,
+            "numeric_label": numeric_label,
+            "subject_id": subject_id,
+            "label_names": label_names,
+            "metrics_to_extract": metrics_to_extract,
+            "crop_margin": crop_margin,
+        }
+        for subject_id in subjects_list
+    ]
+
+    # rows of every (model, subject) pair; the DataFrame is only built once all of them are available. In incremental
+    # runs, the rows of the pairs whose files did not change since the previous run are reused
+    manifest = open_metrics_manifest(config_file, "audit")
+    tasks, results = reuse_stored_results(manifest, tasks)
+
+    # the rows of the completed subjects are checkpointed as the run goes, so that an interrupted run resumes from
+    # the remaining ones
+    checkpoint = open_metrics_checkpoint(config_file, "audit")
+    tasks, resumed = resume_from_checkpoint(checkpoint, tasks)
+    results.update(resumed)
+
+    fancy_print(f"\nStarting metric extraction for models {', '.join(models)}", Fore.LIGHTMAGENTA_EX, "✨")
+    logger.info(f"Starting metric extraction for models {', '.join(models)}")
+
+    with fancy_tqdm(total=len(tasks), desc=f"{Fore.CYAN}Progress", leave=True) as pbar:
+        if cpu_cores == 1:
+            for params in tasks:
+                pbar.set_postfix_str(
+                    f"{Fore.CYAN}Current subject: {Fore.LIGHTBLUE_EX}{params['subject_id']}{Fore.CYAN}"
+                )
+                subject_results = process_subject(params)
+                results.update(subject_results)
+                checkpoint_results(checkpoint, subject_results)
+                pbar.update(1)
+        else:
+            with Pool(processes=cpu_cores, initializer=initializer, initargs=(volume_cache,)) as pool:
+                # rows are consumed as soon as each worker finishes, whatever the submission order
+                for subject_results in pool.imap_unordered(process_subject, tasks):
+                    results.update(subject_results)
+                    checkpoint_results(checkpoint, subject_results)
                     pbar.update(1)
 
-            for subject_id, subject_info_df in shared_data.items():
-                raw_metrics = pd.concat([raw_metrics, subject_info_df], ignore_index=True)
+    logger.info(f"Finishing metric extraction for models {', '.join(models)}")
+    store_results(manifest, results)
 
-            logger.info(f"Finishing metric extraction for model {model_name}")
+    rows = [row for subject_rows in results.values() for row in subject_rows]
+    extracted_metrics = standardize_output(pd.DataFrame(rows))
+    # the checkpoint is only removed by the caller, once the metrics are stored
+    if checkpoint is not None:
+        checkpoint.close()
 
-    return standardize_output(raw_metrics)
+    return extracted_metrics, checkpoint
@@ -11,8 +11,14 @@ import os
 import numpy as np
 from loguru import logger
 
+from audit.utils.commons.checkpoint import ExtractionCheckpoint
+from audit.utils.commons.checkpoint import open_checkpoint
+from audit.utils.commons.manifest import ExtractionManifest
+from audit.utils.commons.manifest import open_manifest
 from audit.utils.sequences.sequences import get_spacing
 from audit.utils.sequences.sequences import load_nii_by_subject_id
+from audit.utils.sequences.sequences import load_nii_metadata_by_subject_id
+from audit.utils.sequences.volume_cache import configure_volume_cache
 
 
 @logger.catch
@@ -29,11 +35,169 @@ def check_multiprocessing(config_file) -> int:
     return cpu_cores
 
 
-def initializer(shared_df, lock):
-    """Initialise shared variables for multiprocessing workers."""
-    global shared_dataframe, dataframe_lock
-    shared_dataframe = shared_df
-    dataframe_lock = lock
+def initializer(volume_cache=None):
+    """Initialise the multiprocessing workers."""
+    configure_volume_cache(volume_cache)
+
+
+def check_volume_cache(config_file) -> dict:
+    """Enable the decoded-volume cache if the config file defines one, and return its settings."""
+    volume_cache = config_file.get("volume_cache")
+    if configure_volume_cache(volume_cache) is not None:
+        logger.info(f"Using volume cache at {volume_cache['path']}")
+    return volume_cache
+
+
+def check_crop_margin(config_file) -> int:
+    """Return the validated margin (in voxels) added around the foreground bounding box before computing metrics."""
+    crop_margin = config_file.get("crop_margin", 1)
+    if not isinstance(crop_margin, int) or crop_margin < 0:
+        logger.info(f"Invalid crop_margin value: {crop_margin}, defaulting to 1")
+        crop_margin = 1
+    return crop_margin
+
+
+def open_metrics_manifest(config_file, backend: str) -> ExtractionManifest:
+    """Open the manifest of previous results if the config file enables incremental runs (None otherwise)."""
+    settings = {
+        "backend": backend,
+        "labels": config_file.get("labels"),
+        "metrics": config_file.get("metrics"),
+        "crop_margin": config_file.get("crop_margin"),
+    }
+    return open_manifest(config_file, f"metrics_{backend}_{config_file.get('filename', 'metrics')}", settings)
+
+
+def get_manifest_key(model_name: str, subject_id: str) -> str:
+    """Return the manifest key of the results of a (model, subject) pair."""
+    return f"{model_name}/{subject_id}"
+
+
+def reuse_stored_results(manifest: ExtractionManifest, tasks: list) -> tuple[list, dict]:
+    """Reuse the stored rows of the (model, subject) pairs whose ground truth and prediction did not change.
+
+    Each task (one per subject) keeps only the models that must be evaluated again, and tasks left without
+    models are dropped.
+
+    Returns
+    -------
+    tasks : list
+        The tasks still to process.
+    results : dict
+        The stored rows of the unchanged (model, subject) pairs.
+    """
+    if manifest is None:
+        return tasks, {}
+
+    pending, results = [], {}
+    for task in tasks:
+        subject_id = task["subject_id"]
+        path_gt = get_subject_file(task["path_ground_truth_dataset"], subject_id, "_seg")
+
+        models = {}
+        for model_name, path_predictions in task["model_predictions_paths"].items():
+            path_pred = get_subject_file(path_predictions, subject_id, "_pred")
+            rows = manifest.get(get_manifest_key(model_name, subject_id), [path_gt, path_pred])
+            if rows is None:
+                models[model_name] = path_predictions
+            else:
+                results[(model_name, subject_id)] = rows
+
+        if models:
+            pending.append({**task, "model_predictions_paths": models})
+
+    logger.info(f"Reusing the metrics of {len(results)} unchanged (model, subject) pairs")
+    return pending, results
+
+
+def store_results(manifest: ExtractionManifest, results: dict) -> None:
+    """Store the rows of every (model, subject) pair in the manifest, if any, and drop the stale entries."""
+    if manifest is None:
+        return
+
+    for (model_name, subject_id), rows in results.items():
+        manifest.put(get_manifest_key(model_name, subject_id), rows)
+    manifest.prune([get_manifest_key(model_name, subject_id) for model_name, subject_id in results])
+    manifest.save()
+
+
+def open_metrics_checkpoint(config_file, backend: str) -> ExtractionCheckpoint:
+    """Open the checkpoint of the run, with the results completed by a previous interrupted run (None if disabled)."""
+    settings = {
+        "backend": backend,
+        "data_path": config_file.get("data_path"),
+        "model_predictions_paths": config_file.get("model_predictions_paths"),
+        "labels": config_file.get("labels"),
+        "metrics": config_file.get("metrics"),
+        "crop_margin": config_file.get("crop_margin"),
+    }
+    return open_checkpoint(config_file, f"metrics_{backend}_{config_file.get('filename', 'metrics')}", settings)
+
+
+def resume_from_checkpoint(checkpoint: ExtractionCheckpoint, tasks: list) -> tuple[list, dict]:
+    """Skip the (model, subject) pairs completed by a previous interrupted run.
+
+    Each task (one per subject) keeps only the models still to evaluate, and tasks left without models are dropped.
+
+    Returns
+    -------
+    tasks : list
+        The tasks still to process.
+    results : dict
+        The checkpointed rows of the completed (model, subject) pairs.
+    """
+    if checkpoint is None or not checkpoint.completed:
+        return tasks, {}
+
+    pending, results = [], {}
+    for task in tasks:
+        subject_id = task["subject_id"]
+
+        models = {}
+        for model_name, path_predictions in task["model_predictions_paths"].items():
+            rows = checkpoint.completed.get(get_manifest_key(model_name, subject_id))
+            if rows is None:
+                models[model_name] = path_predictions
+            else:
+                results[(model_name, subject_id)] = rows
+
+        if models:
+            pending.append({**task, "model_predictions_paths": models})
+
+    return pending, results
+
+
+def checkpoint_results(checkpoint: ExtractionCheckpoint, results: dict) -> None:
+    """Append the rows of the newly completed (model, subject) pairs to the checkpoint, if any."""
+    if checkpoint is None:
+        return
+
+    for (model_name, subject_id), rows in results.items():
+        checkpoint.append(get_manifest_key(model_name, subject_id), rows)
+
+
+def get_subject_file(root_dir: str, subject_id: str, seq: str) -> str:
+    """Return the path to a subject's file, named ``<root>/<subject_id>/<subject_id><seq>.nii.gz``."""
+    return os.path.join(str(root_dir), subject_id, f"{subject_id}{seq}.nii.gz")
+
+
+def load_ground_truth(path_ground_truth_dataset: str, subject_id: str) -> np.ndarray:
+    """Load the ground-truth segmentation array of a single subject.
+
+    Follows the ``<root>/<subject_id>/<subject_id>_seg.nii.gz`` naming convention.
+    """
+    return load_nii_by_subject_id(root_dir=path_ground_truth_dataset, subject_id=subject_id, as_array=True)
+
+
+def load_prediction(path_predictions: str, subject_id: str) -> tuple[np.ndarray, tuple]:
+    """Load the predicted segmentation array of a single subject together with its spacing.
+
+    Follows the ``<root>/<subject_id>/<subject_id>_pred.nii.gz`` naming convention. The spacing
+    is read from the header, so the voxels are only decoded once.
+    """
+    pred = load_nii_by_subject_id(root_dir=path_predictions, subject_id=subject_id, seq="_pred", as_array=True)
+    pred_header = load_nii_metadata_by_subject_id(root_dir=path_predictions, subject_id=subject_id, seq="_pred")
+    return pred, get_spacing(pred_header)
 
 
 def load_subject_data(
@@ -49,6 +213,9 @@ def load_subject_data(
         <root>/<subject_id>/<subject_id>_seg.nii.gz   (ground truth)
         <root>/<subject_id>/<subject_id>_pred.nii.gz  (prediction)
 
+    Backends evaluating several models should rather call :func:`load_ground_truth`
+    once per subject and :func:`load_prediction` once per model.
+
     Returns
     -------
     gt : np.ndarray
@@ -56,12 +223,10 @@ def load_subject_data(
     pred : np.ndarray
         Predicted segmentation array.
     spacing : tuple
-        Voxel spacing extracted from the prediction image.
+        Voxel spacing read from the prediction header (the voxels are only decoded once).
     """
-    gt = load_nii_by_subject_id(root_dir=path_ground_truth_dataset, subject_id=subject_id, as_array=True)
-    pred_img = load_nii_by_subject_id(root_dir=path_predictions, subject_id=subject_id, seq="_pred")
-    pred = load_nii_by_subject_id(root_dir=path_predictions, subject_id=subject_id, seq="_pred", as_array=True)
-    spacing = get_spacing(pred_img)
+    gt = load_ground_truth(path_ground_truth_dataset, subject_id)
+    pred, spacing = load_prediction(path_predictions, subject_id)
     return gt, pred, spacing
 
 
@@ -258,6 +258,16 @@ class BinaryPairwiseMeasures(object):
         self.connectivity = connectivity_type
         self.pixdim = pixdim
         self.dict_args = dict_args
+        # number of voxels cropped away from both images, all of them negative in both (option n_background)
+        self.n_background = self.dict_args.get("n_background", 0)
+
+    def n_elements(self):
+        """
+        Returns the number of elements of the images, including the ones cropped away
+
+        :return: n_elements
+        """
+        return np.size(self.ref) + self.n_background
 
     def __fp_map(self):
         """
@@ -339,7 +349,7 @@ class BinaryPairwiseMeasures(object):
 
         :return: n_neg_ref
         """
-        n_neg_ref = np.sum(1 - self.ref)
+        n_neg_ref = np.sum(1 - self.ref) + self.n_background
         return n_neg_ref
 
     @CacheFunctionOutput
@@ -359,7 +369,7 @@ class BinaryPairwiseMeasures(object):
 
         :return: n_neg_pred
         """
-        n_neg_pred = np.sum(1 - self.pred)
+        n_neg_pred = np.sum(1 - self.pred) + self.n_background
         return n_neg_pred
 
     @CacheFunctionOutput
@@ -399,7 +409,7 @@ class BinaryPairwiseMeasures(object):
 
         :return: tn
         """
-        tn = np.sum(self.__tn_map())
+        tn = np.sum(self.__tn_map()) + self.n_background
         return tn
 
     @CacheFunctionOutput
@@ -510,8 +520,8 @@ class BinaryPairwiseMeasures(object):
         :return: normalised_expected_cost
         """
 
-        prior_background = (self.tn() + self.fp()) / (np.size(self.ref))
-        prior_foreground = (self.tp() + self.fn()) / np.size(self.ref)
+        prior_background = (self.tn() + self.fp()) / self.n_elements()
+        prior_foreground = (self.tp() + self.fn()) / self.n_elements()
 
         if "cost_fn" in self.dict_args.keys():
             c_fn = self.dict_args["cost_fn"]
@@ -521,8 +531,8 @@ class BinaryPairwiseMeasures(object):
             c_fp = self.dict_args["cost_fp"]
         else:
             c_fp = 1.0 / (2 * prior_background)
-        prior_background = (self.tn() + self.fp()) / (np.size(self.ref))
-        prior_foreground = (self.tp() + self.fn()) / np.size(self.ref)
+        prior_background = (self.tn() + self.fp()) / self.n_elements()
+        prior_foreground = (self.tp() + self.fn()) / self.n_elements()
         alpha = c_fp * prior_background / (c_fn * prior_foreground)
         r_fp = self.fp() / self.n_neg_ref()
         r_fn = self.fn() / self.n_pos_ref()
@@ -549,14 +559,14 @@ class BinaryPairwiseMeasures(object):
 
     def expected_matching_ck(self):
         list_values = np.unique(self.ref)
+        if self.n_background > 0:
+            list_values = np.union1d(list_values, [0])
         p_e = 0
         for val in list_values:
-            p_er = np.sum(np.where(self.ref == val, np.ones_like(self.ref), np.zeros_like(self.ref))) / np.prod(
-                self.ref.shape
-            )
-            p_es = np.sum(np.where(self.pred == val, np.ones_like(self.pred), np.zeros_like(self.pred))) / np.prod(
-                self.pred.shape
-            )
+            # the elements cropped away are 0 in both images
+            n_background = self.n_background if val == 0 else 0
+            p_er = (np.sum(self.ref == val) + n_background) / self.n_elements()
+            p_es = (np.sum(self.pred == val) + n_background) / self.n_elements()
             p_e += p_es * p_er
         return p_e
 
@@ -722,7 +732,7 @@ class BinaryPairwiseMeasures(object):
             er = self.dict_args["exchange_rate"]
         else:
             er = 1
-        n = np.size(self.pred)
+        n = self.n_elements()
         tp = self.tp()
         fp = self.fp()
         net_benefit = tp / n - fp / n * er
@@ -987,19 +997,36 @@ class BinaryPairwiseMeasures(object):
             boundary_iou = intersect / union
             return boundary_iou
 
+    def __union_crop(self):
+        """
+        This function determines the bounding box of the union of prediction and reference, extended by
+        a margin (option edt_margin, default 1 voxel). All the borders lie inside it, so the distance
+        transforms between borders are exact when restricted to it. The whole image is kept if
+        the prediction or the reference is empty.
+
+        :return: tuple of slices
+        """
+        if self.flag_empty_pred or self.flag_empty_ref:
+            return tuple(slice(None) for _ in np.shape(self.ref))
+        margin = self.dict_args.get("edt_margin", 1)
+        union = np.argwhere(np.logical_or(self.pred, self.ref))
+        lower = np.maximum(union.min(axis=0) - margin, 0)
+        upper = np.minimum(union.max(axis=0) + 1 + margin, np.shape(self.ref))
+        return tuple(slice(lo, up) for lo, up in zip(lower, upper))
+
     @CacheFunctionOutput
     def border_distance(self):
         """
         This functions determines the map of distance from the borders of the
-        prediction and the reference and the border maps themselves
+        prediction and the reference and the border maps themselves, restricted
+        to the bounding box of their union
 
         :return: distance_border_ref, distance_border_pred, border_ref,
         border_pred
         """
-        border_ref = MorphologyOps(self.ref, self.connectivity).border_map()
-        border_pred = MorphologyOps(self.pred, self.connectivity).border_map()
-        oppose_ref = 1 - self.ref
-        oppose_pred = 1 - self.pred
+        crop = self.__union_crop()
+        border_ref = MorphologyOps(self.ref[crop], self.connectivity).border_map()
+        border_pred = MorphologyOps(self.pred[crop], self.connectivity).border_map()
         distance_ref = ndimage.distance_transform_edt(1 - border_ref, sampling=self.pixdim)
         distance_pred = ndimage.distance_transform_edt(1 - border_pred, sampling=self.pixdim)
         distance_border_pred = border_ref * distance_pred
@@ -1037,6 +1064,7 @@ class BinaryPairwiseMeasures(object):
             # print(numerator, denominator, tau)
             return numerator / denominator
 
+    @CacheFunctionOutput
     def measured_distance(self):
         """
         This functions calculates the average symmetric distance and the
@@ -1,18 +1,28 @@
 import os
 import warnings
-from multiprocessing import Lock
-from multiprocessing import Manager
 from multiprocessing import Pool
+from typing import Optional
 
 import pandas as pd
 from colorama import Fore
 from loguru import logger
 
+from audit.metrics.backends.commons import check_crop_margin
 from audit.metrics.backends.commons import check_multiprocessing
+from audit.metrics.backends.commons import check_volume_cache
+from audit.metrics.backends.commons import checkpoint_results
 from audit.metrics.backends.commons import initializer
-from audit.metrics.backends.commons import load_subject_data
+from audit.metrics.backends.commons import load_ground_truth
+from audit.metrics.backends.commons import load_prediction
+from audit.metrics.backends.commons import open_metrics_checkpoint
+from audit.metrics.backends.commons import open_metrics_manifest
+from audit.metrics.backends.commons import resume_from_checkpoint
+from audit.metrics.backends.commons import reuse_stored_results
 from audit.metrics.backends.commons import standardize_output
+from audit.metrics.backends.commons import store_results
 from audit.metrics.backends.metrics_reloaded.processes.mixed_measures_processes import MultiLabelPairwiseMeasures
+from audit.metrics.segmentation_metrics import crop_to_foreground
+from audit.utils.commons.checkpoint import ExtractionCheckpoint
 from audit.utils.commons.file_manager import list_dirs
 from audit.utils.commons.strings import fancy_print
 from audit.utils.commons.strings import fancy_tqdm
@@ -20,57 +30,70 @@ from audit.utils.commons.strings import fancy_tqdm
 warnings.filterwarnings("ignore")
 
 
-def process_subject_metricsreloaded(shared_df, params: dict, cpu_cores: int):
-    """Compute MetricsReloaded metrics for a single subject."""
-    # Use the shared loader — same convention as all other backends
-    gt, pred, spacing = load_subject_data(
-        params["path_ground_truth_dataset"],
-        params["path_predictions"],
-        params["subject_id"],
-    )
+def process_subject_metricsreloaded(params: dict) -> dict:
+    """Compute MetricsReloaded metrics of every model for a single subject.
 
-    list_values = [v for v in params["numeric_label"] if v != 0]
-    mlpm = MultiLabelPairwiseMeasures(
-        [pred],
-        [gt],
-        [None],
-        list_values=list_values,
-        measures_pcc=params["metrics_to_extract"],
-        per_case=True,
-        pixdim=spacing,
-    )
-    df_seg, _ = mlpm.per_label_dict()
+    The ground truth is decoded once and each model's prediction is then evaluated against it, cropped to
+    the bounding box of their joint foreground (true negatives are corrected for the voxels cropped away).
+    Returns the long-format rows keyed by (model, subject).
+    """
+    subject_id = params["subject_id"]
+    gt = load_ground_truth(params["path_ground_truth_dataset"], subject_id)
+    if gt is None:
+        logger.warning(f"Ground truth of subject {subject_id} not found or unreadable, skipping the subject")
+        return {}
 
+    list_values = [v for v in params["numeric_label"] if v != 0]
     label_to_region = dict(zip(params["numeric_label"], params["label_names"]))
-    results = []
-    for _, row in df_seg.iterrows():
-        region = label_to_region[row["label"]]
-        for metric_name in params["metrics_to_extract"]:
-            if metric_name in row:
-                value = row[metric_name]
-                results.append(
-                    {
-                        "ID": params["subject_id"],
-                        "region": region,
-                        "metric": metric_name,
-                        "value": float(value) if value is not None else float("nan"),
-                        "model": params["model_name"],
-                    }
-                )
-
-    df_metrics = pd.DataFrame(results)
-
-    if cpu_cores == 1:
-        return df_metrics
-
-    # multiprocessing path
-    with dataframe_lock:
-        shared_df[params["subject_id"]] = df_metrics
-
-    return None
 
-
-def extract_metricsreloaded_metrics(config_file) -> pd.DataFrame:
+    results = {}
+    for model_name, path_predictions in params["model_predictions_paths"].items():
+        # the other models of the subject are still evaluated if one of them fails
+        try:
+            pred, spacing = load_prediction(path_predictions, subject_id)
+            if pred is None:
+                logger.warning(
+                    f"Prediction of {model_name} for subject {subject_id} not found or unreadable, skipping it"
+                )
+                continue
+            gt_cropped, pred_cropped, n_background = crop_to_foreground(gt, pred, params["crop_margin"])
+
+            mlpm = MultiLabelPairwiseMeasures(
+                [pred_cropped],
+                [gt_cropped],
+                [None],
+                list_values=list_values,
+                measures_pcc=params["metrics_to_extract"],
+                per_case=True,
+                pixdim=spacing,
+                dict_args={"n_background": n_background},
+            )
+            df_seg, _ = mlpm.per_label_dict()
+
+            rows = []
+            for _, row in df_seg.iterrows():
+                region = label_to_region[row["label"]]
+                for metric_name in params["metrics_to_extract"]:
+                    if metric_name in row:
+                        value = row[metric_name]
+                        rows.append(
+                            {
+                                "ID": subject_id,
+                                "region": region,
+                                "metric": metric_name,
+                                "value": float(value) if value is not None else float("nan"),
+                                "model": model_name,
+                            }
+                        )
+        except Exception as e:
+            logger.error(f"Could not compute the metrics of {model_name} for subject {subject_id}, skipping it: {e}")
+            continue
+        results[(model_name, subject_id)] = rows
+
+    return results
+
+
+def extract_metricsreloaded_metrics(config_file) -> tuple[pd.DataFrame, Optional[ExtractionCheckpoint]]:
     label_names = list(config_file["labels"].keys())
     numeric_label = list(config_file["labels"].values())
     path_ground_truth_dataset = config_file["data_path"]
@@ -78,73 +101,67 @@ def extract_metricsreloaded_metrics(config_file) -> pd.DataFrame:
     subjects_list = list_dirs(path_ground_truth_dataset)
     models = config_file["model_predictions_paths"]
     cpu_cores = check_multiprocessing(config_file)
-
-    raw_metrics = pd.DataFrame()
-
-    if cpu_cores == 1:
-        for model_name, path_predictions in models.items():
-            fancy_print(f"\nStarting metric extraction for model {model_name}", Fore.LIGHTMAGENTA_EX, "✨")
-            logger.info(f"Starting metric extraction for model {model_name}")
-
-            with fancy_tqdm(total=len(subjects_list), desc=f"{Fore.CYAN}Progress", leave=True) as pbar:
-                for subject_id in subjects_list:
-                    pbar.set_postfix_str(f"{Fore.CYAN}Current subject: {Fore.LIGHTBLUE_EX}{subject_id}{Fore.CYAN}")
+    volume_cache = check_volume_cache(config_file)
+    crop_margin = check_crop_margin(config_file)
+
+    # a single flat queue with one task per subject (evaluating all the models against its ground truth)
+    tasks = [
+        {
+            "path_ground_truth_dataset": path_ground_truth_dataset,
+            "model_predictions_paths": models,
+            "numeric_label": numeric_label,
+            "subject_id": subject_id,
+            "label_names": label_names,
+            "metrics_to_extract": metrics_to_extract,
+            "crop_margin": crop_margin,
+        }
+        for subject_id in subjects_list
+    ]
+
+    # rows of every (model, subject) pair; the DataFrame is only built once all of them are available. In incremental
+    # runs, the rows of the pairs whose files did not change since the previous run are reused
+    manifest = open_metrics_manifest(config_file, "metricsreloaded")
+    tasks, results = reuse_stored_results(manifest, tasks)
+
+    # the rows of the completed subjects are checkpointed as the run goes, so that an interrupted run resumes from
+    # the remaining ones
+    checkpoint = open_metrics_checkpoint(config_file, "metricsreloaded")
+    tasks, resumed = resume_from_checkpoint(checkpoint, tasks)
+    results.update(resumed)
+
+    fancy_print(f"\nStarting metric extraction for models {', '.join(models)}", Fore.LIGHTMAGENTA_EX, "✨")
+    logger.info(f"Starting metric extraction for models {', '.join(models)}")
+
+    with fancy_tqdm(total=len(tasks), desc=f"{Fore.CYAN}Progress", leave=True) as pbar:
+        if cpu_cores == 1:
+            for params in tasks:
+                pbar.set_postfix_str(
+                    f"{Fore.CYAN}Current subject: {Fore.LIGHTBLUE_EX}{params['subject_id']}{Fore.CYAN}"
+                )
+                subject_results = process_subject_metricsreloaded(params)
+                results.update(subject_results)
+                checkpoint_results(checkpoint, subject_results)
+                pbar.update(1)
+        else:
+            with Pool(processes=cpu_cores, initializer=initializer, initargs=(volume_cache,)) as pool:
+                # rows are consumed as soon as each worker finishes, whatever the submission order
+                for subject_results in pool.imap_unordered(process_subject_metricsreloaded, tasks):
+                    results.update(subject_results)
+                    checkpoint_results(checkpoint, subject_results)
                     pbar.update(1)
 
-                    params = {
-                        "path_ground_truth_dataset": path_ground_truth_dataset,
-                        "path_predictions": path_predictions,
-                        "numeric_label": numeric_label,
-                        "subject_id": subject_id,
-                        "label_names": label_names,
-                        "metrics_to_extract": metrics_to_extract,
-                        "model_name": model_name,
-                    }
-
-                    df_subject = process_subject_metricsreloaded(None, params, cpu_cores)
-                    raw_metrics = pd.concat([raw_metrics, df_subject], ignore_index=True)
-
-            logger.info(f"Finishing metric extraction for model {model_name}")
-
-    else:
-        manager = Manager()
-        shared_data = manager.dict()
-        lock = Lock()
-
-        with Pool(processes=cpu_cores, initializer=initializer, initargs=(shared_data, lock)) as pool:
-            for model_name, path_predictions in models.items():
-                fancy_print(f"\nStarting metric extraction for model {model_name}", Fore.LIGHTMAGENTA_EX, "✨")
-                logger.info(f"Starting metric extraction for model {model_name}")
-
-                tasks = []
-                for subject_id in subjects_list:
-                    params = {
-                        "path_ground_truth_dataset": path_ground_truth_dataset,
-                        "path_predictions": path_predictions,
-                        "numeric_label": numeric_label,
-                        "subject_id": subject_id,
-                        "label_names": label_names,
-                        "metrics_to_extract": metrics_to_extract,
-                        "model_name": model_name,
-                    }
-                    tasks.append(
-                        pool.apply_async(process_subject_metricsreloaded, args=(shared_data, params, cpu_cores))
-                    )
-
-                with fancy_tqdm(total=len(subjects_list), desc=f"{Fore.CYAN}Progress", leave=True) as pbar:
-                    for task in tasks:
-                        task.wait()
-                        pbar.update(1)
-
-                for subject_id, df_subject in shared_data.items():
-                    raw_metrics = pd.concat([raw_metrics, df_subject], ignore_index=True)
-                shared_data.clear()
-
-                logger.info(f"Finishing metric extraction for model {model_name}")
+    logger.info(f"Finishing metric extraction for models {', '.join(models)}")
+    store_results(manifest, results)
 
+    raw_metrics = pd.DataFrame([row for subject_rows in results.values() for row in subject_rows])
     raw_metrics = raw_metrics.pivot_table(
         index=["ID", "region", "model"],
         columns="metric",
         values="value",
     ).reset_index()
-    return standardize_output(raw_metrics)
+    extracted_metrics = standardize_output(raw_metrics)
+    # the checkpoint is only removed by the caller, once the metrics are stored
+    if checkpoint is not None:
+        checkpoint.close()
+
+    return extracted_metrics, checkpoint
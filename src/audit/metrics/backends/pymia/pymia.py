@@ -1,19 +1,28 @@
 import os
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
 import pandas as pd
 import pymia.evaluation.evaluator as eval_
-import SimpleITK as sitk
 from colorama import Fore
 from loguru import logger
 from pymia.evaluation.metric import metric
 from pymia.evaluation.writer import CSVStatisticsWriter
 
+from audit.metrics.backends.commons import check_volume_cache
+from audit.metrics.backends.commons import checkpoint_results
+from audit.metrics.backends.commons import get_manifest_key
+from audit.metrics.backends.commons import get_subject_file
+from audit.metrics.backends.commons import open_metrics_checkpoint
+from audit.metrics.backends.commons import open_metrics_manifest
 from audit.metrics.backends.commons import standardize_output
+from audit.metrics.backends.commons import store_results
+from audit.utils.commons.checkpoint import ExtractionCheckpoint
 from audit.utils.commons.file_manager import list_dirs
 from audit.utils.commons.strings import fancy_print
 from audit.utils.commons.strings import fancy_tqdm
+from audit.utils.sequences.sequences import load_nii
 
 
 def _pivot_and_standardize(raw: list) -> pd.DataFrame:
@@ -24,18 +33,20 @@ def _pivot_and_standardize(raw: list) -> pd.DataFrame:
     return standardize_output(df)
 
 
-def perform_evaluation(pymia_evaluator, path_gt, path_pred, subject):
+def perform_evaluation(pymia_evaluator, path_gt, path_pred, subject, ground_truth=None):
     path_gt = os.path.join(str(path_gt), subject, f"{subject}_seg.nii.gz")
     path_pred = os.path.join(str(path_pred), subject, f"{subject}_pred.nii.gz")
 
     try:
-        if not os.path.exists(path_gt):
+        if ground_truth is None and not os.path.exists(path_gt):
             raise FileNotFoundError(f'Ground truth file "{path_gt}" does not exist')
         if not os.path.exists(path_pred):
             raise FileNotFoundError(f'Prediction file "{path_pred}" does not exist')
 
-        ground_truth = sitk.ReadImage(path_gt)
-        prediction = sitk.ReadImage(path_pred)
+        # the ground truth may be given already loaded, so that it is shared by all the models
+        if ground_truth is None:
+            ground_truth = load_nii(path_gt)
+        prediction = load_nii(path_pred)
         pymia_evaluator.evaluate(prediction, ground_truth, subject)
     except Exception as e:
         print(f"{subject} -> {e}")
@@ -43,7 +54,7 @@ def perform_evaluation(pymia_evaluator, path_gt, path_pred, subject):
     return pymia_evaluator
 
 
-def aggregate_results(pymia_evaluator, model_name: str) -> list:
+def aggregate_results(pymia_evaluator, model_name: str, start: int = 0) -> list:
     return [
         {
             "ID": result.id_,
@@ -52,7 +63,7 @@ def aggregate_results(pymia_evaluator, model_name: str) -> list:
             "value": result.value,
             "model": model_name,
         }
-        for result in pymia_evaluator.results
+        for result in pymia_evaluator.results[start:]
     ]
 
 
@@ -134,7 +145,7 @@ def instantiate_pymia_metrics(selected_metrics: list) -> list:
     return metrics
 
 
-def extract_pymia_metrics(config_file) -> pd.DataFrame:
+def extract_pymia_metrics(config_file) -> tuple[pd.DataFrame, Optional[ExtractionCheckpoint]]:
     labels, processed_labels = config_file["labels"], {}
     for key, value in labels.items():
         if value != 0:
@@ -145,36 +156,95 @@ def extract_pymia_metrics(config_file) -> pd.DataFrame:
     path_ground_truth_dataset = config_file["data_path"]
     metrics_to_extract = [key for key, value in config_file["metrics"].items() if value]
     subjects_list = list_dirs(path_ground_truth_dataset)
-
-    pymia_metrics = instantiate_pymia_metrics(metrics_to_extract)
-    evaluator = eval_.SegmentationEvaluator(pymia_metrics, processed_labels)
+    check_volume_cache(config_file)
 
     models = config_file["model_predictions_paths"]
-    # Accumulate results across ALL models before pivoting
-    all_raw_metrics = []
 
-    for model_name, path_predictions in models.items():
-        fancy_print(f"\nStarting metric extraction for model {model_name}", Fore.LIGHTMAGENTA_EX, "✨")
-        logger.info(f"Starting metric extraction for model {model_name}")
-
-        with fancy_tqdm(total=len(subjects_list), desc=f"{Fore.CYAN}Progress", leave=True) as pbar:
-            for n, subject_id in enumerate(subjects_list):
-                pbar.set_postfix_str(f"{Fore.CYAN}Current subject: {Fore.LIGHTBLUE_EX}{subject_id}{Fore.CYAN}")
-                pbar.update(1)
-                if n % 10 == 0 and n > 0:
-                    fancy_print(f"Processed {n} subjects", Fore.CYAN, "🔹")
+    # one evaluator per model, so that each subject's ground truth is loaded once and shared by all the models
+    evaluators = {
+        model_name: eval_.SegmentationEvaluator(instantiate_pymia_metrics(metrics_to_extract), processed_labels)
+        for model_name in models
+    }
 
-                logger.info(f"Processing subject: {subject_id}")
-                evaluator = perform_evaluation(evaluator, path_ground_truth_dataset, path_predictions, subject_id)
+    # in incremental runs, the rows of the (model, subject) pairs whose files did not change since the previous run
+    # are reused
+    manifest = open_metrics_manifest(config_file, "pymia")
+    stored_results, results = {}, {}
+
+    # the rows of the completed (model, subject) pairs are checkpointed as the run goes, so that an interrupted run
+    # resumes from the remaining ones
+    checkpoint = open_metrics_checkpoint(config_file, "pymia")
+
+    fancy_print(f"\nStarting metric extraction for models {', '.join(models)}", Fore.LIGHTMAGENTA_EX, "✨")
+    logger.info(f"Starting metric extraction for models {', '.join(models)}")
+
+    with fancy_tqdm(total=len(subjects_list), desc=f"{Fore.CYAN}Progress", leave=True) as pbar:
+        for n, subject_id in enumerate(subjects_list):
+            pbar.set_postfix_str(f"{Fore.CYAN}Current subject: {Fore.LIGHTBLUE_EX}{subject_id}{Fore.CYAN}")
+            pbar.update(1)
+            if n % 10 == 0 and n > 0:
+                fancy_print(f"Processed {n} subjects", Fore.CYAN, "🔹")
+
+            logger.info(f"Processing subject: {subject_id}")
+            path_gt = get_subject_file(path_ground_truth_dataset, subject_id, "_seg")
+
+            pending_models = {}
+            for model_name, path_predictions in models.items():
+                key = get_manifest_key(model_name, subject_id)
+                path_pred = get_subject_file(path_predictions, subject_id, "_pred")
+                rows = None
+                if manifest is not None:
+                    rows = manifest.get(key, [path_gt, path_pred])
+                if rows is None and checkpoint is not None:
+                    rows = checkpoint.completed.get(key)
+                if rows is None:
+                    pending_models[model_name] = path_predictions
+                else:
+                    stored_results[(model_name, subject_id)] = rows
+            if not pending_models:
+                continue
+
+            ground_truth = load_nii(path_gt) if os.path.exists(path_gt) else None
+            if ground_truth is None:
+                logger.warning(f"Ground truth of subject {subject_id} not found or unreadable, skipping the subject")
+                continue
+            for model_name, path_predictions in pending_models.items():
+                if not os.path.exists(get_subject_file(path_predictions, subject_id, "_pred")):
+                    # the other models of the subject are still evaluated
+                    logger.warning(f"Prediction of {model_name} for subject {subject_id} not found, skipping it")
+                    continue
+                n_results = len(evaluators[model_name].results)
+                evaluators[model_name] = perform_evaluation(
+                    evaluators[model_name], path_ground_truth_dataset, path_predictions, subject_id, ground_truth
+                )
+                rows = aggregate_results(evaluators[model_name], model_name, start=n_results)
+                if rows:
+                    results[(model_name, subject_id)] = rows
+                    checkpoint_results(checkpoint, {(model_name, subject_id): rows})
 
-        # collect this model's results, then clear the evaluator for the next model
-        all_raw_metrics.extend(aggregate_results(evaluator, model_name))
+    # Accumulate results across ALL models before pivoting
+    results.update(stored_results)
+    for model_name, evaluator in evaluators.items():
+        # the statistics also cover the subjects whose results were reused or resumed from the checkpoint
+        evaluator.results.extend(
+            eval_.Result(row["ID"], row["region"], row["metric"], row["value"])
+            for (model, _), rows in stored_results.items()
+            if model == model_name
+            for row in rows
+        )
 
         if config_file.get("calculate_stats", None):
             Path(os.path.join(config_file["output_path"], "stats", f"{model_name}")).mkdir(parents=True, exist_ok=True)
             compute_statistics(evaluator, config_file, model_name)
 
         evaluator.clear()
-        logger.info(f"Finishing metric extraction for model {model_name}")
 
-    return _pivot_and_standardize(all_raw_metrics)
+    logger.info(f"Finishing metric extraction for models {', '.join(models)}")
+    store_results(manifest, results)
+
+    extracted_metrics = _pivot_and_standardize([row for rows in results.values() for row in rows])
+    # the checkpoint is only removed by the caller, once the metrics are stored
+    if checkpoint is not None:
+        checkpoint.close()
+
+    return extracted_metrics, checkpoint
@@ -1,5 +1,7 @@
 import numpy as np
 
+from audit.metrics.segmentation_metrics import crop_to_foreground
+
 
 def errors_per_class(ground_truth, predicted, unique_classes):
     # Find all unique classes present in the ground truth data and predictions
@@ -8,9 +10,9 @@ def errors_per_class(ground_truth, predicted, unique_classes):
     # Initialize a zero matrix with the maximum range of classes
     errors = np.zeros((num_classes, num_classes), dtype=np.int32)
 
-    # Convert ground truth and predicted to arrays for indexing
-    ground_truth = np.array(ground_truth)
-    predicted = np.array(predicted)
+    # Convert ground truth and predicted to arrays for indexing, cropped to their foreground (the voxels cropped
+    # away are background in both, so they are never errors)
+    ground_truth, predicted, _ = crop_to_foreground(np.asarray(ground_truth), np.asarray(predicted), margin=0)
 
     # Calculate indices where ground truth and prediction match
     match_indices = ground_truth == predicted
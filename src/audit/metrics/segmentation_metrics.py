@@ -1,9 +1,8 @@
-from collections import Counter
-
 import numpy as np
 from numpy import logical_and as l_and
 from numpy import logical_not as l_not
-from scipy.spatial.distance import directed_hausdorff
+from scipy.ndimage import binary_erosion
+from scipy.spatial import cKDTree
 
 
 def one_hot_encoding(segmentation, labels, skip_background=True):
@@ -16,7 +15,7 @@ def one_hot_encoding(segmentation, labels, skip_background=True):
     - skip_background (bool): Flag to skip encoding for the background label (default=True).
 
     Returns:
-    - one_hot_enc (np.ndarray): One-hot encoded segmentation map.
+    - one_hot_enc (np.ndarray): One-hot encoded segmentation map, as a boolean array of shape (R, Z, Y, X).
     """
 
     # initialize list of binary segmentations
@@ -27,9 +26,9 @@ def one_hot_encoding(segmentation, labels, skip_background=True):
             continue
 
         if not isinstance(i, list):
-            binary_image = np.where(segmentation == i, 1, 0)
+            binary_image = segmentation == i
         else:
-            binary_image = np.where(np.isin(segmentation, i), 1, 0)
+            binary_image = np.isin(segmentation, i)
         binary_images.append(binary_image)
 
     one_hot_enc = np.stack(binary_images)
@@ -37,6 +36,41 @@ def one_hot_encoding(segmentation, labels, skip_background=True):
     return one_hot_enc
 
 
+def crop_to_foreground(gt, seg, margin=1):
+    """
+    Crop two label maps to the bounding box of their joint foreground (non-zero voxels), extended by a margin.
+
+    Every voxel cropped away is background in both maps, so it only contributes to the true negatives of the
+    foreground regions (or to the matching background voxels). Its number is returned so that those counts
+    can be corrected analytically.
+
+    Parameters:
+    - gt (np.ndarray): Ground truth label map.
+    - seg (np.ndarray): Predicted label map.
+    - margin (int): Number of voxels added around the bounding box (default=1).
+
+    Returns:
+    - gt (np.ndarray): Cropped ground truth label map (a view of the input).
+    - seg (np.ndarray): Cropped predicted label map (a view of the input).
+    - n_background (int): Number of voxels cropped away.
+    """
+    gt, seg = np.asarray(gt), np.asarray(seg)
+    foreground = (gt != 0) | (seg != 0)
+
+    crop = []
+    for axis in range(foreground.ndim):
+        other_axes = tuple(a for a in range(foreground.ndim) if a != axis)
+        indices = np.flatnonzero(np.any(foreground, axis=other_axes))
+        if len(indices) == 0:
+            crop = [slice(0, 0)] * foreground.ndim
+            break
+        crop.append(slice(max(indices[0] - margin, 0), indices[-1] + 1 + margin))
+    crop = tuple(crop)
+
+    gt_cropped, seg_cropped = gt[crop], seg[crop]
+    return gt_cropped, seg_cropped, gt.size - gt_cropped.size
+
+
 def calculate_confusion_matrix_elements(gt, seg):
     """
     Calculate the elements tp, tn, fp, and fn for segmentation evaluation.
@@ -60,55 +94,117 @@ def calculate_confusion_matrix_elements(gt, seg):
     return tp, tn, fp, fn
 
 
+def calculate_multilabel_confusion_elements(gt, seg, labels, n_background=0):
+    """
+    Calculate the elements tp, tn, fp, and fn of every label from a single pass over two label maps.
+
+    The joint histogram of (ground truth, prediction) values is computed once with ``np.bincount``, and
+    the confusion elements of each label are then read from it. Labels may be grouped (given as a list
+    of values), in which case the region is the union of those values.
+
+    Parameters:
+    - gt (np.ndarray): Ground truth label map (non-negative integer values).
+    - seg (np.ndarray): Predicted label map (non-negative integer values).
+    - labels (list): Labels (or lists of labels) to evaluate.
+    - n_background (int): Number of background voxels cropped away from both maps (default=0).
+
+    Returns:
+    - elements (list): List of (tp, tn, fp, fn) tuples, one per label, as floats.
+    """
+    gt = np.asarray(gt).ravel()
+    seg = np.asarray(seg).ravel()
+
+    flat_labels = [v for label in labels for v in (label if isinstance(label, list) else [label])]
+    n = int(max(gt.max(initial=0), seg.max(initial=0), *flat_labels, 0)) + 1
+
+    # joint histogram of (gt, seg) values computed with the smallest integer type able to hold the codes
+    code_type = np.min_scalar_type(n * n - 1)
+    codes = gt.astype(code_type) * code_type.type(n)
+    codes += seg.astype(code_type)
+    joint = np.bincount(codes, minlength=n * n).reshape(n, n)
+
+    # voxels cropped away are background in both maps
+    joint[0, 0] += n_background
+    total = float(gt.size + n_background)
+
+    elements = []
+    for label in labels:
+        in_region = np.zeros(n, dtype=bool)
+        in_region[label] = True
+
+        tp = float(joint[np.ix_(in_region, in_region)].sum())
+        fp = float(joint[np.ix_(~in_region, in_region)].sum())
+        fn = float(joint[np.ix_(in_region, ~in_region)].sum())
+        tn = total - tp - fp - fn
+        elements.append((tp, tn, fp, fn))
+
+    return elements
+
+
 def calculate_metrics(
     ground_truth: np.ndarray,
     segmentation: np.ndarray,
     subject: str,
     regions: list,
+    labels: list,
     metrics: list,
     skip_background=True,
     spacing: np.array = np.array([1, 1, 1]),
+    n_background: int = 0,
 ) -> list:
     """
     Calculate evaluation metrics (Jaccard index, Accuracy, Hausdorff, DICE score, Sensitivity, Specificity, and
     Precision) for a segmentation compared to its ground truth.
 
     Parameters:
-    - ground_truth (np.ndarray): Ground truth segmentation data. (R*Z*Y*X)
-    - segmentation (np.ndarray): Predicted segmentation data. (R*Z*Y*X)
+    - ground_truth (np.ndarray): Ground truth label map. (Z*Y*X)
+    - segmentation (np.ndarray): Predicted label map. (Z*Y*X)
     - subject (str): Identifier for the subject.
     - regions (list): List of regions to evaluate.
+    - labels (list): Label value (or list of values) of each region.
+    - metrics (list): List of metrics to compute.
     - skip_background (bool): Flag to skip background region (default=True).
+    - spacing (np.array): Voxel spacing (x, y, z), as returned by get_spacing.
+    - n_background (int): Number of background voxels cropped away from both maps, e.g. by crop_to_foreground.
 
     Returns:
     - metrics_list (list): List of dictionaries containing metrics for each region {metric:value}.
     """
     assert segmentation.shape == ground_truth.shape, "Predicted segmentation and ground truth do not have the same size"
 
-    if skip_background and "BKG" in regions:
-        regions.remove("BKG")
+    regions_labels = [(r, l) for r, l in zip(regions, labels) if not (skip_background and (r == "BKG" or l == 0))]
+
+    #  cardinalities metrics tp, tn, fp, fn of all the regions at once
+    confusion_elements = calculate_multilabel_confusion_elements(
+        ground_truth, segmentation, [l for _, l in regions_labels], n_background
+    )
+
+    # the arrays are indexed (z, y, x)
+    axes_spacing = np.asarray(spacing, dtype=float)[::-1]
 
     metrics_list = []
-    for n, r in enumerate(regions):
+    for (r, label), (tp, tn, fp, fn) in zip(regions_labels, confusion_elements):
         output_metrics = dict(ID=subject, region=r)
 
-        # Ground truth and segmentation for i-th region
-        gt = ground_truth[n]
-        seg = segmentation[n]
-
-        #  cardinalities metrics tp, tn, fp, fn
-        tp, tn, fp, fn = calculate_confusion_matrix_elements(gt, seg)
+        # binary masks and surface distances are shared by all the distance metrics, and only computed if needed
+        masks = {}
+        if {"haus", "hd95", "assd"} & set(metrics):
+            gt, seg = binarize(ground_truth, label), binarize(segmentation, label)
+            empty = tp + fn == 0 or tp + fp == 0
+            masks = dict(gt=gt, seg=seg, distances=None if empty else surface_distances(gt, seg, axes_spacing))
 
         # compute selected metrics
         available_metrics = {
-            "haus": lambda: hausdorff_distance(gt, seg),
-            "dice": lambda: dice_score(tp, fp, fn, gt, seg),
+            "haus": lambda: hausdorff_distance(**masks),
+            "hd95": lambda: hausdorff_distance(**masks, percentile=95),
+            "assd": lambda: average_surface_distance(**masks),
+            "dice": lambda: dice_score(tp, fp, fn),
             "sens": lambda: sensitivity(tp, fn),
             "spec": lambda: specificity(tn, fp),
             "accu": lambda: accuracy(tp, tn, fp, fn),
-            "jacc": lambda: jaccard_index(tp, fp, fn, gt, seg),
+            "jacc": lambda: jaccard_index(tp, fp, fn),
             "prec": lambda: precision(tp, fp),
-            "size": lambda: Counter(seg.flatten()).get(1, np.nan) * spacing.prod(),
+            "size": lambda: (tp + fp if tp + fp > 0 else np.nan) * spacing.prod(),
         }
         for metric in metrics:
             if metric in available_metrics:
@@ -119,6 +215,22 @@ def calculate_metrics(
     return metrics_list
 
 
+def binarize(segmentation, label):
+    """
+    Extract the binary mask of a label (or list of labels) from a label map.
+
+    Parameters:
+    - segmentation (np.ndarray): Input label map.
+    - label (int or list): Label value, or list of values forming the region.
+
+    Returns:
+    - mask (np.ndarray): Boolean mask of the region.
+    """
+    if isinstance(label, list):
+        return np.isin(segmentation, label)
+    return segmentation == label
+
+
 def sensitivity(tp: float, fn: float) -> float:
     """
     The sensitivity is intuitively the ability of the classifier to find all tumor voxels.
@@ -179,7 +291,7 @@ def accuracy(tp: float, tn: float, fp: float, fn: float) -> float:
     return accu
 
 
-def dice_score(tp: float, fp: float, fn: float, gt: np.ndarray, seg: np.ndarray) -> float:
+def dice_score(tp: float, fp: float, fn: float, gt: np.ndarray = None, seg: np.ndarray = None) -> float:
     """
     Computes the Dice coefficient.
 
@@ -187,21 +299,24 @@ def dice_score(tp: float, fp: float, fn: float, gt: np.ndarray, seg: np.ndarray)
     - tp (float): Number of true positives.
     - fp (float): Number of false positives.
     - fn (float): Number of false negatives.
-    - gt (np.ndarray): Ground truth segmentation mask.
-    - seg (np.ndarray): Segmented mask.
+    - gt (np.ndarray): Ground truth segmentation mask. If not given, its emptiness is derived from tp and fn.
+    - seg (np.ndarray): Segmented mask. If not given, its emptiness is derived from tp and fp.
 
     Returns:
     - dice (float): Dice coefficient.
     """
-    if np.sum(gt) == 0:
-        dice = 1 if np.sum(seg) == 0 else 0
+    gt_empty = np.sum(gt) == 0 if gt is not None else tp + fn == 0
+    seg_empty = np.sum(seg) == 0 if seg is not None else tp + fp == 0
+
+    if gt_empty:
+        dice = 1 if seg_empty else 0
     else:
         dice = 2 * tp / (2 * tp + fp + fn)
 
     return dice
 
 
-def jaccard_index(tp: float, fp: float, fn: float, gt: np.ndarray, seg: np.ndarray) -> float:
+def jaccard_index(tp: float, fp: float, fn: float, gt: np.ndarray = None, seg: np.ndarray = None) -> float:
     """
     Computes the Jaccard index.
 
@@ -209,27 +324,64 @@ def jaccard_index(tp: float, fp: float, fn: float, gt: np.ndarray, seg: np.ndarr
     - tp (float): Number of true positives.
     - fp (float): Number of false positives.
     - fn (float): Number of false negatives.
-    - gt (np.ndarray): Ground truth segmentation mask.
-    - seg (np.ndarray): Segmented mask.
+    - gt (np.ndarray): Ground truth segmentation mask. If not given, its emptiness is derived from tp and fn.
+    - seg (np.ndarray): Segmented mask. If not given, its emptiness is derived from tp and fp.
 
     Returns:
     - jac (float): Jaccard index.
     """
-    if np.sum(gt) == 0:
-        jac = 1 if np.sum(seg) == 0 else 0
+    gt_empty = np.sum(gt) == 0 if gt is not None else tp + fn == 0
+    seg_empty = np.sum(seg) == 0 if seg is not None else tp + fp == 0
+
+    if gt_empty:
+        jac = 1 if seg_empty else 0
     else:
         jac = tp / (tp + fp + fn)
 
     return jac
 
 
-def hausdorff_distance(gt: np.ndarray, seg: np.ndarray) -> float:
+def surface_distances(gt: np.ndarray, seg: np.ndarray, spacing: np.ndarray = None) -> tuple:
     """
-    Computes the Hausdorff distance.
+    Computes the distances between the surfaces of two masks.
+
+    Surface voxels are the foreground voxels removed by a binary erosion. Their coordinates are scaled by the
+    voxel spacing, and the nearest surface voxel of the other mask is found with a KD-tree query.
 
     Parameters:
     - gt (np.ndarray): Ground truth segmentation mask.
     - seg (np.ndarray): Segmented mask.
+    - spacing (np.ndarray): Voxel spacing along each array axis (default=isotropic).
+
+    Returns:
+    - seg_to_gt (np.ndarray): Distance from every surface voxel of the segmentation to the ground truth surface.
+    - gt_to_seg (np.ndarray): Distance from every surface voxel of the ground truth to the segmentation surface.
+    """
+    gt = np.asarray(gt, dtype=bool)
+    seg = np.asarray(seg, dtype=bool)
+    spacing = np.ones(gt.ndim) if spacing is None else np.asarray(spacing, dtype=float)
+
+    gt_surface = np.argwhere(gt & ~binary_erosion(gt)) * spacing
+    seg_surface = np.argwhere(seg & ~binary_erosion(seg)) * spacing
+
+    seg_to_gt = cKDTree(gt_surface).query(seg_surface)[0]
+    gt_to_seg = cKDTree(seg_surface).query(gt_surface)[0]
+
+    return seg_to_gt, gt_to_seg
+
+
+def hausdorff_distance(
+    gt: np.ndarray, seg: np.ndarray, spacing: np.ndarray = None, percentile: float = 100, distances: tuple = None
+) -> float:
+    """
+    Computes the symmetric Hausdorff distance between the surfaces of two masks.
+
+    Parameters:
+    - gt (np.ndarray): Ground truth segmentation mask.
+    - seg (np.ndarray): Segmented mask.
+    - spacing (np.ndarray): Voxel spacing along each array axis (default=isotropic).
+    - percentile (float): Percentile of the surface distances to use, e.g. 95 for HD95 (default=100).
+    - distances (tuple): Surface distances already computed with surface_distances (optional).
 
     Returns:
     - hd (float): Hausdorff distance.
@@ -246,6 +398,34 @@ def hausdorff_distance(gt: np.ndarray, seg: np.ndarray) -> float:
     if np.sum(seg) == 0:
         return np.nan
 
-    hd = directed_hausdorff(np.argwhere(seg), np.argwhere(gt))[0]
+    seg_to_gt, gt_to_seg = distances if distances is not None else surface_distances(gt, seg, spacing)
+    hd = float(max(np.percentile(seg_to_gt, percentile), np.percentile(gt_to_seg, percentile)))
 
     return hd
+
+
+def average_surface_distance(
+    gt: np.ndarray, seg: np.ndarray, spacing: np.ndarray = None, distances: tuple = None
+) -> float:
+    """
+    Computes the average symmetric surface distance (ASSD) between two masks.
+
+    Parameters:
+    - gt (np.ndarray): Ground truth segmentation mask.
+    - seg (np.ndarray): Segmented mask.
+    - spacing (np.ndarray): Voxel spacing along each array axis (default=isotropic).
+    - distances (tuple): Surface distances already computed with surface_distances (optional).
+
+    Returns:
+    - assd (float): Average symmetric surface distance.
+    """
+    if np.sum(gt) == 0 and np.sum(seg) == 0:
+        return 0.0
+
+    if np.sum(gt) == 0 or np.sum(seg) == 0:
+        return np.nan
+
+    seg_to_gt, gt_to_seg = distances if distances is not None else surface_distances(gt, seg, spacing)
+    assd = float((seg_to_gt.sum() + gt_to_seg.sum()) / (len(seg_to_gt) + len(gt_to_seg)))
+
+    return assd
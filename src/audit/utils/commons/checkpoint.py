@@ -0,0 +1,149 @@
+"""
+Checkpoints of extraction runs, to resume them after a crash.
+
+While an extraction runs, the rows of every completed subject (or (model, subject) pair in
+the metric backends) are appended to a JSON Lines sidecar next to the outputs, and flushed
+right away. If the run is interrupted (out of memory, a corrupt file, a pre-empted node, ...),
+the next run with the same settings loads the completed rows and only processes the
+remaining subjects. The sidecar is removed once the results are written.
+
+The first line of the sidecar holds the fingerprint of the extraction settings; a checkpoint
+written with other settings is discarded. A record left half written by the crash is ignored.
+"""
+
+import json
+import os
+import uuid
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from loguru import logger
+
+from audit.utils.commons.manifest import _to_builtin
+from audit.utils.commons.manifest import fingerprint_settings
+
+CHECKPOINT_VERSION = 1
+
+
+class ExtractionCheckpoint:
+    """
+    Append-only record of the rows completed by an extraction run, keyed by subject (or model and subject).
+
+    Attributes:
+    ----------
+    path : str
+        Path to the JSON Lines checkpoint.
+    settings : str
+        Fingerprint of the extraction settings.
+    completed : dict
+        The rows of each key completed by the interrupted run(s).
+    """
+
+    def __init__(self, path: str, settings: Dict):
+        """
+        Constructs all the necessary attributes for the ExtractionCheckpoint object, loading the previous checkpoint.
+
+        Parameters:
+        ----------
+        path : str
+            Path to the JSON Lines checkpoint. It is created on the first append if it does not exist.
+        settings : dict
+            The extraction settings the results depend on. A previous checkpoint is discarded if they differ.
+        """
+        self.path = str(path)
+        self.settings = fingerprint_settings(settings)
+        self.completed = {}
+        self._file = None
+
+        try:
+            with open(self.path, "r") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return
+
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+        if header.get("version") != CHECKPOINT_VERSION or header.get("settings") != self.settings:
+            logger.info(f"Discarding the checkpoint {self.path}, written with other extraction settings")
+            return
+
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # the record being written when the run was interrupted
+                break
+            self.completed[record["key"]] = record["rows"]
+
+    def append(self, key: str, rows: List[Dict]) -> None:
+        """Appends the rows of a completed key to the checkpoint, flushing them to disk right away."""
+        if self._file is None:
+            self.open()
+        self._file.write(json.dumps({"key": key, "rows": rows}, default=_to_builtin) + "\n")
+        self._file.flush()
+        self.completed[key] = rows
+
+    def open(self) -> None:
+        """Rewrites the checkpoint with the records loaded so far (dropping any truncated one) and opens it for
+        appending."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps({"version": CHECKPOINT_VERSION, "settings": self.settings}) + "\n")
+            for key, rows in self.completed.items():
+                f.write(json.dumps({"key": key, "rows": rows}, default=_to_builtin) + "\n")
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a")
+
+    def close(self) -> None:
+        """Closes the checkpoint, keeping it on disk."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self) -> None:
+        """Closes and deletes the checkpoint, once all the results of the run are available."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def open_checkpoint(config_file: Dict, name: str, settings: Dict) -> Optional[ExtractionCheckpoint]:
+    """
+    Opens the checkpoint of an extraction, loading the rows completed by a previous interrupted run.
+
+    Parameters:
+    ----------
+    config_file : dict
+        The extraction config. Checkpoints are enabled by default whenever it defines ``output_path``. Its
+        ``checkpoint`` key is either a boolean or a dictionary with the optional key ``path`` (default is
+        ``<output_path>/.checkpoint_<name>.jsonl``).
+    name : str
+        Name of the extraction, used to name the checkpoint.
+    settings : dict
+        The extraction settings the results depend on.
+
+    Returns:
+    -------
+    ExtractionCheckpoint or None
+        The checkpoint, or None if checkpoints are disabled.
+    """
+    checkpoint = config_file.get("checkpoint", True)
+    if not checkpoint:
+        return None
+
+    checkpoint = checkpoint if isinstance(checkpoint, dict) else {}
+    path = checkpoint.get("path")
+    if not path:
+        if not config_file.get("output_path"):
+            return None
+        path = os.path.join(config_file["output_path"], f".checkpoint_{name}.jsonl")
+
+    checkpoint = ExtractionCheckpoint(path, settings)
+    if checkpoint.completed:
+        logger.info(f"Resuming from {path}: {len(checkpoint.completed)} results already completed")
+
+    return checkpoint
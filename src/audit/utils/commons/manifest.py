@@ -0,0 +1,207 @@
+"""
+Manifest of extraction results, for incremental runs.
+
+When incremental extraction is enabled, the rows computed for each subject (or each
+(model, subject) pair in the metric backends) are stored in a JSON manifest next to the
+outputs, together with a fingerprint of the input files they were computed from. Later runs
+reuse the stored rows of unchanged inputs and only process new or modified ones.
+
+Fingerprints are built either from the path, size and modification time of each file
+(``stat``, the default) or from a SHA-1 of their content (``content``). The whole manifest is
+discarded when the extraction settings (labels, features, metrics, ...) change.
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+MANIFEST_VERSION = 1
+
+FINGERPRINT_MODES = ["stat", "content"]
+
+
+def _to_builtin(value):
+    """Converts numpy values into their JSON serializable counterparts."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def fingerprint_files(paths: List[str], mode: str = "stat") -> str:
+    """
+    Builds the fingerprint of a set of files.
+
+    Parameters:
+    ----------
+    paths : list
+        Paths to the files. Missing files are part of the fingerprint too.
+    mode : str
+        Either "stat" (path, size and modification time of each file) or "content" (SHA-1 of each file).
+
+    Returns:
+    -------
+    str
+        The hexadecimal digest of the files.
+    """
+    digest = hashlib.sha1()
+    for path in sorted(os.path.abspath(p) for p in paths):
+        digest.update(path.encode())
+        if not os.path.isfile(path):
+            digest.update(b"|missing")
+        elif mode == "content":
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(2**20), b""):
+                    digest.update(chunk)
+        else:
+            stat = os.stat(path)
+            digest.update(f"|{stat.st_size}|{stat.st_mtime_ns}".encode())
+        digest.update(b"\n")
+
+    return digest.hexdigest()
+
+
+def fingerprint_settings(settings: Dict) -> str:
+    """Builds the fingerprint of the extraction settings the results depend on."""
+    return hashlib.sha1(json.dumps(settings, sort_keys=True, default=_to_builtin).encode()).hexdigest()
+
+
+class ExtractionManifest:
+    """
+    Rows of previous extraction runs, keyed by subject (or model and subject) and by the fingerprint of their inputs.
+
+    Attributes:
+    ----------
+    path : str
+        Path to the JSON manifest.
+    settings : str
+        Fingerprint of the extraction settings.
+    fingerprint_mode : str
+        Either "stat" or "content".
+    entries : dict
+        The fingerprint and the rows of each key.
+    """
+
+    def __init__(self, path: str, settings: Dict, fingerprint_mode: str = "stat"):
+        """
+        Constructs all the necessary attributes for the ExtractionManifest object, loading the previous manifest.
+
+        Parameters:
+        ----------
+        path : str
+            Path to the JSON manifest. It is created on save if it does not exist.
+        settings : dict
+            The extraction settings the results depend on. Previous entries are discarded if they differ.
+        fingerprint_mode : str
+            Either "stat" (default) or "content".
+        """
+        if fingerprint_mode not in FINGERPRINT_MODES:
+            raise ValueError(f"Invalid fingerprint mode: {fingerprint_mode}. Available modes are {FINGERPRINT_MODES}")
+
+        self.path = str(path)
+        self.settings = fingerprint_settings(settings)
+        self.fingerprint_mode = fingerprint_mode
+        self.entries = {}
+        self.pending = {}
+
+        try:
+            with open(self.path, "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if manifest.get("version") != MANIFEST_VERSION or manifest.get("settings") != self.settings:
+            logger.info(f"Extraction settings changed since {self.path} was written. Recomputing all the results")
+            return
+        self.entries = manifest.get("entries", {})
+
+    def get(self, key: str, paths: List[str]) -> Optional[List[Dict]]:
+        """
+        Looks up the rows of a key, if its input files did not change.
+
+        The current fingerprint of the files is remembered, so that the rows computed later for the key can be
+        stored with :meth:`put`.
+
+        Parameters:
+        ----------
+        key : str
+            The key of the rows, e.g. the subject ID.
+        paths : list
+            Paths to the input files the rows are computed from.
+
+        Returns:
+        -------
+        list or None
+            The stored rows, or None if the key is new or its inputs changed.
+        """
+        fingerprint = fingerprint_files(paths, self.fingerprint_mode)
+        self.pending[key] = fingerprint
+
+        entry = self.entries.get(key)
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            return None
+        return entry["rows"]
+
+    def put(self, key: str, rows: List[Dict]) -> None:
+        """Stores the rows of a key, with the fingerprint of its inputs computed by :meth:`get`."""
+        if key not in self.pending:
+            raise KeyError(f"No fingerprint computed for {key}")
+        self.entries[key] = {"fingerprint": self.pending[key], "rows": rows}
+
+    def prune(self, keys: List[str]) -> None:
+        """Removes the entries whose key is not in keys (e.g. subjects removed from the dataset)."""
+        keys = set(keys)
+        self.entries = {key: entry for key, entry in self.entries.items() if key in keys}
+
+    def save(self) -> None:
+        """Writes the manifest, through a temporary file so that it is never left half written."""
+        manifest = {"version": MANIFEST_VERSION, "settings": self.settings, "entries": self.entries}
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f, default=_to_builtin)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write the extraction manifest {self.path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def open_manifest(config_file: Dict, name: str, settings: Dict) -> Optional[ExtractionManifest]:
+    """
+    Opens the manifest of an extraction if the config file enables incremental runs.
+
+    Parameters:
+    ----------
+    config_file : dict
+        The extraction config. Its ``incremental`` key is either a boolean or a dictionary with the optional keys
+        ``fingerprint`` ("stat" or "content") and ``path`` (default is ``<output_path>/.manifest_<name>.json``).
+    name : str
+        Name of the extraction, used to name the manifest.
+    settings : dict
+        The extraction settings the results depend on.
+
+    Returns:
+    -------
+    ExtractionManifest or None
+        The manifest, or None if incremental runs are disabled.
+    """
+    incremental = config_file.get("incremental")
+    if not incremental:
+        return None
+
+    incremental = incremental if isinstance(incremental, dict) else {}
+    path = incremental.get("path") or os.path.join(config_file.get("output_path", "."), f".manifest_{name}.json")
+    manifest = ExtractionManifest(path, settings, incremental.get("fingerprint", "stat"))
+    logger.info(f"Incremental extraction: {len(manifest.entries)} results stored in {path}")
+
+    return manifest
@@ -1,3 +1,4 @@
+import importlib.util
 import os
 import re
 import sys
@@ -6,6 +7,8 @@ from pathlib import Path
 import yaml
 from loguru import logger
 
+from audit.utils.internal._csv_helpers import OUTPUT_FORMATS
+
 
 def load_config_file(path: str) -> dict:
     """
@@ -66,6 +69,9 @@ labels:
   ENH: 1
   NEC: 2
 
+# Intensity percentiles extracted by the statistical features, if not the default [10, 90]
+# percentiles: [1, 5, 10, 25, 75, 90, 95, 99]
+
 # Root paths
 datasets_path: './datasets'
 features_path: './outputs/features'
@@ -76,12 +82,12 @@ raw_datasets:
   dataset_1: "${datasets_path}/dataset_1/images"
   dataset_2: "${datasets_path}/dataset_2/images"
 
-# Paths for feature extraction CSV files
+# Paths for feature extraction files (CSV, Parquet or Feather, detected from the extension)
 features:
   dataset_1: "${features_path}/dataset_1.csv"
   dataset_2: "${features_path}/dataset_2.csv"
 
-# Paths for metric extraction CSV files
+# Paths for metric extraction files (CSV, Parquet or Feather, detected from the extension)
 metrics:
   dataset_1: "${metrics_path}/dataset_1.csv"
   dataset_2: "${metrics_path}/dataset_2.csv"
@@ -126,9 +132,20 @@ labels:
 # List of features to extract
 features:
   statistical: true
+  # instead of true, statistical accepts the intensity percentiles to extract (computed at no extra cost):
+  # statistical:
+  #   percentiles: [1, 5, 10, 25, 75, 90, 95, 99]  # default [10, 90]; the median is always extracted
+  #   engine: auto  # histogram (integer sequences: exact statistics from np.bincount, no sort), sort, or auto (default)
   texture: true
+  # instead of true, texture accepts settings for the gray-level co-occurrence matrices:
+  # texture:
+  #   levels: 64    # number of gray levels, between 2 and 256 (default 256). Radiomics typically uses 32 or 64
+  #   mode: 2d      # 2d (each axial plane, 4 angles; default) or 3d (whole volume, 13 directions)
+  #   foreground_only: true        # only count co-occurrences between brain (non-zero) voxels (default false)
+  #   min_foreground_fraction: 0.1 # in 2d mode, skip planes with a smaller fraction of brain voxels (default 0)
   spatial: true
   tumor: true
+  regional: false  # intensity statistics of each sequence within each tumor region (uses the statistical percentiles)
 
 # Longitudinal study settings
 longitudinal:
@@ -140,9 +157,24 @@ longitudinal:
 # Path where extracted features will be saved
 output_path: './outputs/features'
 logs_path: './logs/features'
+output_format: csv  # csv, parquet or feather (parquet and feather keep the dtypes and require pyarrow)
 
 # Other settings
 cpu_cores: 8
+
+# Optional on-disk cache of decoded volumes. Speeds up repeated runs over the same datasets
+# volume_cache:
+#   path: './cache/volumes'
+#   max_size_gb: 20
+
+# Optional incremental runs: rows of unchanged subjects (per model for metrics) are reused from the previous run,
+# and only new or modified ones are processed. The inputs are fingerprinted in a manifest next to the outputs
+# incremental:
+#   fingerprint: stat  # stat (size and modification time of the files, default) or content (SHA-1 of the files)
+
+# Completed subjects are checkpointed next to the outputs while the extraction runs, so that an interrupted run resumes
+# from the remaining subjects when launched again with the same config. Set to false to disable them
+# checkpoint: true
 """
     with open(dest, "w") as f:
         f.write(yaml_content)
@@ -180,15 +212,36 @@ metrics:
   sens: true
   spec: true
   haus: true
+  hd95: true
+  assd: true
   size: true
 
 # Path where output metrics will be saved
 output_path: './outputs/metrics'
 filename: 'dataset_2'
 logs_path: './logs/metric'
+output_format: csv  # csv, parquet or feather (parquet and feather keep the dtypes and require pyarrow)
 
 # Other settings
 cpu_cores: 12
+
+# Margin (in voxels) kept around the bounding box of the ground truth and prediction foreground, to which the
+# volumes are cropped before computing the metrics (audit and metricsreloaded backends)
+crop_margin: 1
+
+# Optional on-disk cache of decoded volumes. Speeds up repeated runs over the same datasets
+# volume_cache:
+#   path: './cache/volumes'
+#   max_size_gb: 20
+
+# Optional incremental runs: rows of unchanged subjects (per model for metrics) are reused from the previous run,
+# and only new or modified ones are processed. The inputs are fingerprinted in a manifest next to the outputs
+# incremental:
+#   fingerprint: stat  # stat (size and modification time of the files, default) or content (SHA-1 of the files)
+
+# Completed subjects are checkpointed next to the outputs while the extraction runs, so that an interrupted run resumes
+# from the remaining subjects when launched again with the same config. Set to false to disable them
+# checkpoint: true
 """
     with open(dest, "w") as f:
         f.write(yaml_content)
@@ -212,6 +265,21 @@ def check_path_existence(path: str, name: str, group_1: str = None, group_2: str
         sys.exit(1)
 
 
+def check_output_format(config: dict, config_name: str) -> None:
+    """Check the format of the extraction outputs, and that its optional dependency is installed."""
+    output_format = config.get("output_format", "csv")
+    if output_format not in OUTPUT_FORMATS:
+        logger.error(
+            f"Invalid output_format: {output_format} in the {config_name} file. "
+            f"Available formats are {list(OUTPUT_FORMATS)}"
+        )
+        sys.exit(1)
+
+    if output_format != "csv" and importlib.util.find_spec("pyarrow") is None:
+        logger.error(f"output_format {output_format} requires pyarrow. Install it with 'pip install pyarrow'")
+        sys.exit(1)
+
+
 def check_feature_extraction_config(config: dict) -> None:
     """Check the configuration for the feature extraction."""
     # check input data
@@ -228,6 +296,7 @@ def check_feature_extraction_config(config: dict) -> None:
         logger.error("Missing output_path in the feature_extraction.yml file")
         sys.exit(1)
     check_path_access(config.get("output_path"), "output_path")
+    check_output_format(config, "feature_extraction.yml")
 
     # logs outputs
     logs_path = config.get("logs_path")
@@ -273,6 +342,7 @@ def check_metric_extraction_config(config: dict) -> None:
         logger.error("Missing output_path in the metric_extraction.yml file")
         sys.exit(1)
     check_path_access(config.get("output_path"), "output_path")
+    check_output_format(config, "metric_extraction.yml")
 
     # log outputs
     logs_path = config.get("logs_path")
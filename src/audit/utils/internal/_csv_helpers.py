@@ -2,6 +2,9 @@ import os
 
 import pandas as pd
 
+# supported formats of the extraction outputs and their file extensions. Parquet and Feather require pyarrow
+OUTPUT_FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
 
 def concatenate_csv_files(path: str, output_file: str):
     """
@@ -18,13 +21,87 @@ def concatenate_csv_files(path: str, output_file: str):
     print(f"Concatenated CSV files saved to: {output_file}")
 
 
-def read_datasets_from_dict(name_path_dict: dict, col_name: str = "set") -> pd.DataFrame:
+def get_file_format(path: str) -> str:
+    """
+    Detects the format of a dataset file from its extension.
+
+    Args:
+        path: The path to the file.
+
+    Returns:
+        str: "parquet" (.parquet, .pq), "feather" (.feather, .arrow) or "csv" (any other extension).
+    """
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext in [".parquet", ".pq"]:
+        return "parquet"
+    if ext in [".feather", ".arrow"]:
+        return "feather"
+    return "csv"
+
+
+def write_dataset(data: pd.DataFrame, path: str, output_format: str = "csv") -> str:
+    """
+    Writes a dataset in the given format, adding the extension of the format to the path.
+
+    Args:
+        data: The DataFrame to write.
+        path: The path to the output file, without extension.
+        output_format: One of "csv" (default), "parquet" or "feather".
+
+    Returns:
+        str: The path to the written file.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Invalid output format: {output_format}. Available formats are {list(OUTPUT_FORMATS)}")
+
+    path = f"{path}{OUTPUT_FORMATS[output_format]}"
+    if output_format == "parquet":
+        data.to_parquet(path, index=False)
+    elif output_format == "feather":
+        # feather files do not store the index, which must be the default one
+        data.reset_index(drop=True).to_feather(path)
+    else:
+        data.to_csv(path, index=False)
+
+    return path
+
+
+def read_dataset(path: str, columns: list = None) -> pd.DataFrame:
+    """
+    Reads a CSV, Parquet or Feather dataset, detecting its format from the extension.
+
+    Args:
+        path: The path to the file.
+        columns: The columns to read. Columns missing from the file are ignored. Defaults to all of them.
+
+    Returns:
+        pd.DataFrame: The dataset. Parquet and Feather files keep the dtypes they were written with.
+    """
+    file_format = get_file_format(path)
+    if file_format == "csv":
+        return pd.read_csv(path, usecols=None if columns is None else lambda c: c in columns)
+
+    if columns is not None:
+        # only request the columns the file has, as Arrow readers reject unknown ones
+        import pyarrow.dataset as ds
+
+        available = ds.dataset(path, format="parquet" if file_format == "parquet" else "ipc").schema.names
+        columns = [c for c in available if c in columns]
+
+    if file_format == "parquet":
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_feather(path, columns=columns)
+
+
+def read_datasets_from_dict(name_path_dict: dict, col_name: str = "set", columns: list = None) -> pd.DataFrame:
     """
     Reads multiple datasets from a dictionary of name-root_dir pairs and concatenates them into a single DataFrame.
 
     Args:
-        name_path_dict: A dictionary where keys are dataset names and values are file paths to CSV files.
+        name_path_dict: A dictionary where keys are dataset names and values are file paths to CSV, Parquet or
+                        Feather files (the format is detected from the extension).
         col_name: The name of the column to add that will contain the dataset name. Defaults to "set".
+        columns: The columns to read from each file, so that only the needed ones are loaded. Defaults to all.
 
     Returns:
         pd.DataFrame: A concatenated DataFrame containing all the datasets, with an additional column specifying
@@ -33,7 +110,7 @@ def read_datasets_from_dict(name_path_dict: dict, col_name: str = "set") -> pd.D
 
     out = []
     for name, path in name_path_dict.items():
-        data = pd.read_csv(path)
+        data = read_dataset(path, columns=columns)
         data[col_name] = name
         out.append(data)
     out = pd.concat(out)
@@ -1,7 +1,9 @@
 import os
+from typing import Any
 from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Tuple
 from typing import Union
 
 import numpy as np
@@ -9,9 +11,12 @@ import SimpleITK
 from loguru import logger
 from SimpleITK import GetArrayFromImage
 from SimpleITK import GetImageFromArray
+from SimpleITK import ImageFileReader
 from SimpleITK import ReadImage
 from SimpleITK import WriteImage
 
+from audit.utils.sequences.volume_cache import get_volume_cache
+
 
 def load_nii(path: str, as_array: bool = False) -> Optional[Union[SimpleITK.Image, np.ndarray]]:
     """
@@ -21,6 +26,10 @@ def load_nii(path: str, as_array: bool = False) -> Optional[Union[SimpleITK.Imag
     image is returned as a NumPy array; otherwise a ``SimpleITK.Image`` is returned.
     If an error occurs while reading, ``None`` is returned and a warning is logged.
 
+    When the volume cache is enabled (see :mod:`audit.utils.sequences.volume_cache`), the
+    decoded voxels are read from (or stored in) the cache, and arrays are returned as
+    read-only memory maps.
+
     Parameters
     ----------
     path : str
@@ -37,6 +46,11 @@ def load_nii(path: str, as_array: bool = False) -> Optional[Union[SimpleITK.Imag
         raise ValueError(f"The file at {path} does not exist or is not a valid file.")
 
     try:
+        cache = get_volume_cache()
+        if cache is not None:
+            array, metadata = cache.fetch(str(path), _decode_nii)
+            return array if as_array else _build_image_from_cache(array, metadata)
+
         image = ReadImage(str(path))
         if as_array:
             return GetArrayFromImage(image)
@@ -49,6 +63,21 @@ def load_nii(path: str, as_array: bool = False) -> Optional[Union[SimpleITK.Imag
         return None
 
 
+def _decode_nii(path: str) -> Tuple[np.ndarray, Dict[str, tuple]]:
+    """Decode a NIfTI file into its voxel array and header geometry."""
+    image = ReadImage(str(path))
+    return GetArrayFromImage(image), get_image_metadata(image)
+
+
+def _build_image_from_cache(array: np.ndarray, metadata: Dict[str, tuple]) -> SimpleITK.Image:
+    """Rebuild a SimpleITK image from a cached voxel array and its header geometry."""
+    image = GetImageFromArray(np.asarray(array), isVector=array.ndim > len(metadata["size"]))
+    image.SetSpacing(metadata["spacing"])
+    image.SetOrigin(metadata["origin"])
+    image.SetDirection(metadata["direction"])
+    return image
+
+
 def load_nii_by_subject_id(
     root_dir: str, subject_id: str, seq: str = "_seg", as_array: bool = False
 ) -> Optional[Union[SimpleITK.Image, np.ndarray]]:
@@ -84,6 +113,70 @@ def load_nii_by_subject_id(
     return load_nii(nii_path, as_array=as_array)
 
 
+def load_nii_metadata(path: str) -> Optional[Dict[str, tuple]]:
+    """
+    Read the header geometry of a NIfTI file without decoding its voxels.
+
+    Only the image information is parsed (via ``SimpleITK.ImageFileReader.ReadImageInformation``),
+    so this is cheap even for large gzip-compressed volumes.
+
+    Parameters
+    ----------
+    path : str
+        Path to the NIfTI file on disk.
+
+    Returns
+    -------
+    dict or None
+        Mapping with ``spacing``, ``origin``, ``direction`` and ``size`` tuples, or ``None`` if
+        the header could not be read.
+    """
+    if path is None or not os.path.isfile(path):
+        raise ValueError(f"The file at {path} does not exist or is not a valid file.")
+
+    try:
+        reader = ImageFileReader()
+        reader.SetFileName(str(path))
+        reader.ReadImageInformation()
+        return get_image_metadata(reader)
+    except RuntimeError as e:
+        logger.warning(f"Error reading NIfTI header {path}: {e}")
+        return None
+    except Exception as e:
+        logger.warning(f"Unexpected error while reading NIfTI header {path}: {e}")
+        return None
+
+
+def load_nii_metadata_by_subject_id(root_dir: str, subject_id: str, seq: str = "_seg") -> Optional[Dict[str, tuple]]:
+    """
+    Read the header geometry of a specific NIfTI sequence for a subject ID.
+
+    Header-only counterpart of :func:`load_nii_by_subject_id`, see :func:`load_nii_metadata`.
+
+    Parameters
+    ----------
+    root_dir : str
+        Root folder containing all subject subfolders.
+    subject_id : str
+        Identifier of the subject (e.g., ``Patient-001``).
+    seq : str, default "_seg"
+        Sequence suffix to append to the subject id (e.g., "_t1", "_pred").
+
+    Returns
+    -------
+    dict or None
+        The header geometry if found and readable; otherwise ``None``.
+    """
+    if not root_dir or not subject_id:
+        raise ValueError("Invalid path or subject ID provided. Both must be non-empty strings.")
+
+    nii_path = os.path.join(root_dir, subject_id, f"{subject_id}{seq}.nii.gz")
+    if not os.path.exists(nii_path):
+        logger.warning(f"Sequence '{seq}' for subject '{subject_id}' not found at {nii_path}.")
+        return None
+    return load_nii_metadata(nii_path)
+
+
 def read_sequences_dict(
     root_dir: str, subject_id: str, sequences: Optional[List[str]] = None
 ) -> Dict[str, Optional[np.ndarray]]:
@@ -135,22 +228,154 @@ def read_sequences_dict(
     return out
 
 
-def get_spacing(img: Optional[SimpleITK.Image]) -> np.ndarray:
+def get_image_metadata(img: Optional[Union[SimpleITK.Image, ImageFileReader]]) -> Optional[Dict[str, tuple]]:
+    """
+    Collect the header geometry of a SimpleITK image.
+
+    Parameters
+    ----------
+    img : SimpleITK.Image, SimpleITK.ImageFileReader or None
+        Input image, or a reader on which the image information has already been read.
+
+    Returns
+    -------
+    dict or None
+        Mapping with ``spacing``, ``origin``, ``direction`` and ``size`` tuples as reported by
+        SimpleITK, or ``None`` if ``img`` is ``None``.
+    """
+    if img is None:
+        return None
+    return {
+        "spacing": tuple(img.GetSpacing()),
+        "origin": tuple(img.GetOrigin()),
+        "direction": tuple(img.GetDirection()),
+        "size": tuple(img.GetSize()),
+    }
+
+
+def load_nii_volume(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Decode a NIfTI file once and return its voxels together with its header geometry.
+
+    Parameters
+    ----------
+    path : str
+        Path to the NIfTI file on disk.
+
+    Returns
+    -------
+    dict or None
+        Mapping with the voxel ``array`` plus the ``spacing``, ``origin``, ``direction`` and ``size``
+        entries of :func:`get_image_metadata`, or ``None`` if the file could not be read.
+    """
+    if path is None or not os.path.isfile(path):
+        raise ValueError(f"The file at {path} does not exist or is not a valid file.")
+
+    try:
+        cache = get_volume_cache()
+        array, metadata = cache.fetch(str(path), _decode_nii) if cache is not None else _decode_nii(path)
+    except RuntimeError as e:
+        logger.warning(f"Error loading NIfTI file {path}: {e}")
+        return None
+    except Exception as e:
+        logger.warning(f"Unexpected error while loading NIfTI file {path}: {e}")
+        return None
+
+    volume = {"array": array}
+    volume.update(metadata)
+    return volume
+
+
+def read_subject_volumes(
+    root_dir: str,
+    subject_id: str,
+    sequences: Optional[List[str]] = None,
+    seg: Optional[str] = "_seg",
+    header_only: bool = False,
+    seg_header_only: Optional[bool] = None,
+) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Read every NIfTI volume of a subject, decoding each file exactly once.
+
+    Unlike :func:`read_sequences_dict`, each entry bundles the voxel array with its header
+    geometry (see :func:`load_nii_volume`), so callers that also need the spacing do not have
+    to read the same file again.
+
+    Parameters
+    ----------
+    root_dir : str
+        Root directory where subject data is stored.
+    subject_id : str
+        Subject identifier used to locate the NIfTI files.
+    sequences : list of str, optional
+        Sequence suffixes to load. Defaults to ``["_t1", "_t1ce", "_t2", "_flair"]``.
+    seg : str or None, default "_seg"
+        Suffix of the segmentation to load along with the sequences. ``None`` skips it.
+    header_only : bool, default False
+        If True, only the header geometry of the sequences is read (see :func:`load_nii_metadata`)
+        and their bundles carry no ``array`` entry.
+    seg_header_only : bool, optional
+        Same as ``header_only`` for the segmentation. Defaults to ``header_only``.
+
+    Returns
+    -------
+    dict[str, Optional[dict]]
+        Mapping from suffix without underscores (e.g., ``"t1"``, ``"seg"``) to the volume bundle,
+        or ``None`` if the file is missing/unreadable.
+    """
+    if sequences is None:
+        sequences = ["_t1", "_t1ce", "_t2", "_flair"]
+    if not root_dir or not subject_id:
+        raise ValueError("Both 'root_dir path' and 'subject id' must be non-empty strings.")
+
+    if seg_header_only is None:
+        seg_header_only = header_only
+    suffixes = [(suffix, header_only) for suffix in sequences] + ([(seg, seg_header_only)] if seg else [])
+
+    out = {}
+    for suffix, suffix_header_only in suffixes:
+        key = suffix.replace("_", "")
+        if key in out:
+            continue
+
+        nii_path = os.path.join(root_dir, subject_id, f"{subject_id}{suffix}.nii.gz")
+        if not os.path.isfile(nii_path):
+            out[key] = None
+            logger.warning(f"Sequence '{suffix}' for subject '{subject_id}' not found at {nii_path}.")
+            continue
+
+        try:
+            out[key] = load_nii_metadata(nii_path) if suffix_header_only else load_nii_volume(nii_path)
+        except Exception as e:
+            out[key] = None
+            logger.error(f"Error loading sequence '{suffix}' for subject '{subject_id}': {e}")
+
+    return out
+
+
+def get_spacing(img: Optional[Union[SimpleITK.Image, Dict[str, Any], str]]) -> np.ndarray:
     """
     Get voxel spacing of a SimpleITK image as a NumPy array.
 
-    If ``img`` is ``None``, returns isotropic spacing ``[1, 1, 1]`` and logs a warning.
+    If ``img`` is ``None`` (or its header cannot be read), returns isotropic spacing ``[1, 1, 1]``
+    and logs a warning.
 
     Parameters
     ----------
-    img : SimpleITK.Image or None
-        Input image from which to read spacing.
+    img : SimpleITK.Image, dict, str or None
+        Input image from which to read spacing, a volume bundle/header returned by
+        :func:`load_nii_volume` or :func:`load_nii_metadata`, or the path of a NIfTI file whose
+        header is read without decoding the voxels.
 
     Returns
     -------
     np.ndarray
-        The spacing vector as ``(z, y, x)``.
+        The spacing vector as ``(x, y, z)``, i.e. reversed with respect to the array axes.
     """
+    if isinstance(img, (str, os.PathLike)):
+        img = load_nii_metadata(str(img))
+    if isinstance(img, dict):
+        return np.array(img["spacing"])
     if img is not None:
         return np.array(img.GetSpacing())
     logger.warning("Sequence empty. Assuming isotropic spacing (1, 1, 1).")
@@ -298,43 +523,57 @@ def count_labels(
     return pixels_dict
 
 
-def fit_brain_boundaries(sequence: np.ndarray, padding: int = 1) -> np.ndarray:
+def get_brain_bounding_box(mask: np.ndarray, padding: int = 1) -> tuple:
     """
-    Crop a 3D sequence tightly around the non-zero brain region with optional padding.
+    Compute the bounding box of the non-zero brain region of a sequence, with optional padding.
 
-    The function computes the bounding box around non-zero voxels and returns the
-    cropped subvolume. If the input is all zeros, the input is returned unchanged.
+    The box is found from the projections of the mask along each axis, without gathering the
+    coordinates of the brain voxels.
 
     Parameters
     ----------
-    sequence : np.ndarray
-        Input 3D array to crop.
+    mask : np.ndarray
+        Boolean array of the brain voxels (e.g. ``sequence != 0``).
     padding : int, default 1
         Number of voxels to pad the bounding box on each side.
 
     Returns
     -------
-    np.ndarray
-        Cropped subvolume of ``sequence``.
+    tuple
+        One slice per axis. If the mask is empty, the slices cover the whole array.
     """
-    seq = sequence.copy()
+    box = []
+    for axis, n in enumerate(mask.shape):
+        indexes = np.flatnonzero(mask.any(axis=tuple(a for a in range(mask.ndim) if a != axis)))
+        if indexes.size == 0:
+            return tuple(slice(0, n) for n in mask.shape)
+        box.append(slice(max(0, indexes[0] - padding), min(n, indexes[-1] + padding + 1)))
 
-    if np.all(seq == 0):
-        return seq
+    return tuple(box)
 
-    z_indexes, y_indexes, x_indexes = np.nonzero(seq != 0)
 
-    zmin, ymin, xmin = np.min(z_indexes), np.min(y_indexes), np.min(x_indexes)
-    zmax, ymax, xmax = np.max(z_indexes), np.max(y_indexes), np.max(x_indexes)
+def fit_brain_boundaries(sequence: np.ndarray, padding: int = 1, mask: np.ndarray = None) -> np.ndarray:
+    """
+    Crop a 3D sequence tightly around the non-zero brain region with optional padding.
 
-    zmin = max(0, zmin - padding)
-    ymin = max(0, ymin - padding)
-    xmin = max(0, xmin - padding)
+    The function computes the bounding box around non-zero voxels and returns the
+    cropped subvolume. If the mask is empty, a copy of the whole array is returned.
 
-    zmax = min(seq.shape[0] - 1, zmax + padding)
-    ymax = min(seq.shape[1] - 1, ymax + padding)
-    xmax = min(seq.shape[2] - 1, xmax + padding)
+    Parameters
+    ----------
+    sequence : np.ndarray
+        Input 3D array to crop.
+    padding : int, default 1
+        Number of voxels to pad the bounding box on each side.
+    mask : np.ndarray, optional
+        Precomputed boolean array of the brain voxels (``sequence != 0`` by default).
 
-    seq = seq[zmin : zmax + 1, ymin : ymax + 1, xmin : xmax + 1]
+    Returns
+    -------
+    np.ndarray
+        Cropped subvolume of ``sequence``.
+    """
+    if mask is None:
+        mask = sequence != 0
 
-    return seq
+    return sequence[get_brain_bounding_box(mask, padding)].copy()
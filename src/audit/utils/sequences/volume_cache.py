@@ -0,0 +1,196 @@
+"""
+Opt-in on-disk cache of decoded NIfTI volumes.
+
+Decompressing ``.nii.gz`` files dominates the runtime of repeated feature and metric
+extractions over the same datasets. When the cache is enabled, every decoded volume is
+stored uncompressed as a ``.npy`` file (plus a small JSON sidecar with its header
+geometry), keyed by the source path, modification time and size. Later reads memory-map
+the ``.npy`` file instead of decompressing the source again.
+
+The cache is bounded: whenever an entry is written, least-recently-used entries are
+evicted until the total size fits the configured budget. Recency is tracked through the
+modification time of the cached files, so several worker processes can share one cache
+directory safely.
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+from loguru import logger
+
+_volume_cache = None
+
+
+class VolumeCache:
+    """
+    Size-bounded, least-recently-used cache of decoded volumes stored as uncompressed ``.npy`` files.
+
+    Attributes:
+    ----------
+    cache_dir : str
+        Directory where the cached volumes are stored.
+    max_size : int
+        Maximum total size of the cache, in bytes.
+    """
+
+    def __init__(self, cache_dir: str, max_size_gb: float = 10.0):
+        """
+        Constructs all the necessary attributes for the VolumeCache object.
+
+        Parameters:
+        ----------
+        cache_dir : str
+            Directory where the cached volumes are stored. It is created if it does not exist.
+        max_size_gb : float
+            Maximum total size of the cache, in gigabytes (default is 10).
+        """
+        self.cache_dir = str(cache_dir)
+        self.max_size = int(float(max_size_gb) * 1024**3)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_key(self, path: str) -> str:
+        """Builds the cache key of a file from its absolute path, modification time and size."""
+        stat = os.stat(path)
+        fingerprint = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}"
+        return hashlib.sha1(fingerprint.encode()).hexdigest()
+
+    def get(self, path: str) -> Optional[Tuple[np.ndarray, Dict]]:
+        """
+        Looks up the decoded volume of a file.
+
+        Returns:
+        -------
+        tuple or None
+            The read-only memory-mapped array and its header metadata, or None on a cache miss.
+        """
+        key = self.get_key(path)
+        array_path = os.path.join(self.cache_dir, f"{key}.npy")
+        metadata_path = os.path.join(self.cache_dir, f"{key}.json")
+
+        try:
+            with open(metadata_path, "r") as f:
+                metadata = json.load(f)
+            array = np.load(array_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+        # refresh recency for the LRU eviction
+        for p in (array_path, metadata_path):
+            try:
+                os.utime(p)
+            except OSError:
+                pass
+
+        metadata = {k: tuple(v) if isinstance(v, list) else v for k, v in metadata.items()}
+        return array, metadata
+
+    def put(self, path: str, array: np.ndarray, metadata: Dict) -> None:
+        """Stores the decoded volume of a file and evicts old entries if the size budget is exceeded."""
+        key = self.get_key(path)
+        array_path = os.path.join(self.cache_dir, f"{key}.npy")
+        metadata_path = os.path.join(self.cache_dir, f"{key}.json")
+
+        # write to temporary files first so that concurrent readers never see partial entries
+        tmp = uuid.uuid4().hex
+        try:
+            with open(f"{array_path}.{tmp}", "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            with open(f"{metadata_path}.{tmp}", "w") as f:
+                json.dump(metadata, f)
+            os.replace(f"{array_path}.{tmp}", array_path)
+            os.replace(f"{metadata_path}.{tmp}", metadata_path)
+        except OSError as e:
+            logger.warning(f"Could not store {path} in the volume cache: {e}")
+            for p in (f"{array_path}.{tmp}", f"{metadata_path}.{tmp}"):
+                if os.path.exists(p):
+                    os.remove(p)
+            return
+
+        self.evict()
+
+    def fetch(self, path: str, decode: Callable[[str], Tuple[np.ndarray, Dict]]) -> Tuple[np.ndarray, Dict]:
+        """
+        Returns the decoded volume of a file, decoding and storing it on a cache miss.
+
+        Parameters:
+        ----------
+        path : str
+            Path to the source file.
+        decode : callable
+            Function that decodes the source file and returns its array and header metadata.
+
+        Returns:
+        -------
+        tuple
+            The array (memory-mapped whenever possible) and its header metadata.
+        """
+        cached = self.get(path)
+        if cached is not None:
+            return cached
+
+        array, metadata = decode(path)
+        self.put(path, array, metadata)
+        return self.get(path) or (array, metadata)
+
+    def get_size(self) -> int:
+        """Computes the total size of the cached volumes, in bytes."""
+        return sum(entry.stat().st_size for entry in os.scandir(self.cache_dir) if entry.is_file())
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache fits its size budget."""
+        entries = {}
+        for entry in os.scandir(self.cache_dir):
+            key, ext = os.path.splitext(entry.name)
+            if not entry.is_file() or ext not in (".npy", ".json"):
+                continue
+            stat = entry.stat()
+            size, last_used = entries.get(key, (0, 0))
+            entries[key] = (size + stat.st_size, max(last_used, stat.st_mtime))
+
+        total_size = sum(size for size, _ in entries.values())
+        for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if total_size <= self.max_size:
+                break
+            for ext in (".npy", ".json"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, f"{key}{ext}"))
+                except OSError:
+                    pass
+            total_size -= size
+
+
+def configure_volume_cache(settings: Optional[Dict]) -> Optional[VolumeCache]:
+    """
+    Enables or disables the process-wide volume cache.
+
+    Parameters:
+    ----------
+    settings : dict or None
+        The ``volume_cache`` section of a config file, with the keys ``path`` and (optionally)
+        ``max_size_gb``. If None or without ``path``, the cache is disabled.
+
+    Returns:
+    -------
+    VolumeCache or None
+        The active cache, if any.
+    """
+    global _volume_cache
+
+    if not settings or not settings.get("path"):
+        _volume_cache = None
+        return None
+
+    _volume_cache = VolumeCache(settings["path"], settings.get("max_size_gb", 10.0))
+    return _volume_cache
+
+
+def get_volume_cache() -> Optional[VolumeCache]:
+    """Returns the active process-wide volume cache, or None if caching is disabled."""
+    return _volume_cache
@@ -0,0 +1,45 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import numpy as np
+import pytest
+import SimpleITK as sitk
+
+from src.audit.features.main import extract_features
+
+
+def write_volume(path, array):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    sitk.WriteImage(sitk.GetImageFromArray(array), str(path))
+
+
+@pytest.fixture
+def dataset_with_corrupt_subject(tmp_path):
+    """Three subjects, the second of them with a corrupt (two-dimensional) T1 volume."""
+    rng = np.random.default_rng(0)
+    for n in range(3):
+        subject_id = f"subject_{n}"
+        seg = np.zeros((6, 6, 6), dtype=np.uint8)
+        seg[1:4, 1:4, 1:4] = 1
+        shape = (6, 6) if n == 1 else (6, 6, 6)
+        write_volume(tmp_path / subject_id / f"{subject_id}_t1.nii.gz", rng.integers(1, 100, shape).astype(np.int16))
+        write_volume(tmp_path / subject_id / f"{subject_id}_seg.nii.gz", seg)
+
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("cpu_cores", [1, 2])
+def test_extract_features_skips_unreadable_subjects(dataset_with_corrupt_subject, cpu_cores):
+    config = {
+        "labels": {"BKG": 0, "ENH": 1},
+        "features": {"statistical": True, "tumor": True, "spatial": True},
+        "sequences": ["_t1"],
+        "cpu_cores": cpu_cores,
+    }
+    result, _ = extract_features(dataset_with_corrupt_subject, config, "dataset")
+
+    assert result is not None, "A single unreadable subject should not discard the whole dataset."
+    assert result["ID"].tolist() == ["subject_0", "subject_2"]
+    assert result["t1_mean_intensity"].notna().all()
@@ -127,3 +127,19 @@ def test_extract_features_no_sequence():
         "sagittal_plane_center_of_mass": np.nan,
     }
     assert result == expected_result, "Extracted features are incorrect without sequence"
+
+
+def test_calculate_center_mass_matches_argwhere():
+    """Test that the center of mass matches the mean of the brain voxel coordinates, with a precomputed mask."""
+    sequence = np.random.default_rng(0).choice([0, 0, 1, 5], size=(6, 7, 8))
+    spacing = np.array([1.0, 2.0, 3.0])
+    result = SpatialFeatures(sequence, spacing, brain_mask=sequence != 0).calculate_anatomical_center_mass()
+
+    expected = np.argwhere(sequence != 0).mean(axis=0) * spacing
+    assert list(result.values()) == pytest.approx(list(expected)), "Center of mass calculation is incorrect."
+
+
+def test_calculate_center_mass_empty_sequence():
+    """Test that an empty sequence has an undefined center of mass."""
+    result = SpatialFeatures(np.zeros((3, 3, 3))).calculate_anatomical_center_mass()
+    assert all(np.isnan(v) for v in result.values()), "Center of mass should be NaN for an empty sequence."
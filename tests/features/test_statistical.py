@@ -7,6 +7,7 @@ import pytest
 from scipy.stats import kurtosis
 from scipy.stats import skew
 
+from src.audit.features.statistical import RegionalStatisticalFeatures
 from src.audit.features.statistical import StatisticalFeatures
 
 
@@ -143,3 +144,159 @@ def test_extract_features_flat_sequence(mock_flat_sequence):
     }
     for key, value in expected_features.items():
         assert result[key] == pytest.approx(value), f"{key} feature calculation is incorrect in flat sequence."
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_extract_features_extra_percentiles(size):
+    """Test that any set of percentiles matches np.percentile."""
+    sequence = np.random.default_rng(0).normal(100, 20, size).astype(np.float32)
+    percentiles = [1, 2.5, 5, 25, 75, 95, 99]
+    result = StatisticalFeatures(sequence, percentiles=percentiles).extract_features()
+
+    for q in percentiles:
+        name = StatisticalFeatures.get_percentile_name(q)
+        assert result[name] == pytest.approx(np.percentile(sequence, q)), f"{name} calculation is incorrect."
+    assert result["median_intensity"] == pytest.approx(np.median(sequence))
+    assert "10th_percentile_intensity" not in result
+
+
+def test_get_percentile_name():
+    """Test the ordinal names of the percentile features."""
+    names = [StatisticalFeatures.get_percentile_name(q) for q in [1, 2, 3, 11, 12, 21, 2.5, 10.0]]
+    assert names == [
+        "1st_percentile_intensity",
+        "2nd_percentile_intensity",
+        "3rd_percentile_intensity",
+        "11th_percentile_intensity",
+        "12th_percentile_intensity",
+        "21st_percentile_intensity",
+        "2.5th_percentile_intensity",
+        "10th_percentile_intensity",
+    ]
+
+
+def test_invalid_percentiles():
+    """Test that percentiles out of [0, 100] are rejected."""
+    with pytest.raises(ValueError):
+        StatisticalFeatures(np.arange(10), percentiles=[50, 101])
+
+
+def test_extract_features_empty_sequence():
+    """Test that an empty sequence gives NaN features, with the same keys."""
+    result = StatisticalFeatures(np.array([])).extract_features()
+    expected_keys = StatisticalFeatures(np.arange(10)).extract_features().keys()
+
+    assert list(result.keys()) == list(expected_keys)
+    assert all(np.isnan(value) for value in result.values())
+
+
+def test_extract_features_constant_sequence():
+    """Test that a constant sequence has zero spread and undefined skewness and kurtosis."""
+    result = StatisticalFeatures(np.full(20, 7, dtype=np.int16)).extract_features()
+
+    assert result["std_intensity"] == 0
+    assert result["range_intensity"] == 0
+    assert np.isnan(result["skewness"]) and np.isnan(result["kurtosis"])
+
+
+@pytest.mark.parametrize("foreground_only", [False, True])
+def test_histogram_engine_matches_sort_engine(foreground_only):
+    """Test that the histogram engine gives the same statistics as the sort engine on integer sequences."""
+    sequence = np.random.default_rng(0).normal(50, 40, (6, 7, 8)).astype(np.int16)
+    percentiles = [1, 2.5, 25, 75, 99]
+    sort_features = StatisticalFeatures(sequence, percentiles, foreground_only, engine="sort").extract_features()
+    histogram_features = StatisticalFeatures(
+        sequence, percentiles, foreground_only, engine="histogram"
+    ).extract_features()
+
+    assert list(histogram_features.keys()) == list(sort_features.keys())
+    for key, value in sort_features.items():
+        assert histogram_features[key] == pytest.approx(value), f"{key} differs between the engines."
+
+
+def test_foreground_only(mock_sequence):
+    """Test that only the positive intensities are described when foreground_only is set."""
+    for engine in ["sort", "histogram"]:
+        result = StatisticalFeatures(mock_sequence, foreground_only=True, engine=engine).extract_features()
+        expected = StatisticalFeatures(mock_sequence[mock_sequence > 0], engine="sort").extract_features()
+        for key, value in expected.items():
+            assert result[key] == pytest.approx(value), f"{key} feature calculation is incorrect ({engine})."
+
+
+def test_histogram_engine_empty_foreground():
+    """Test that a sequence without positive intensities gives NaN features with the histogram engine."""
+    result = StatisticalFeatures(np.zeros((3, 3), dtype=np.int16), foreground_only=True).extract_features()
+    assert all(np.isnan(value) for value in result.values())
+
+
+def test_use_histogram():
+    """Test the engine chosen in auto mode."""
+    assert StatisticalFeatures(np.arange(10, dtype=np.int16)).use_histogram()
+    assert not StatisticalFeatures(np.arange(10, dtype=np.float32)).use_histogram()
+    assert not StatisticalFeatures(np.array([0, 2**30], dtype=np.int32)).use_histogram()
+    assert not StatisticalFeatures(np.arange(10, dtype=np.int16), engine="sort").use_histogram()
+
+
+def test_invalid_engine():
+    """Test that invalid engines are rejected."""
+    with pytest.raises(ValueError):
+        StatisticalFeatures(np.arange(10), engine="median")
+    with pytest.raises(ValueError):
+        StatisticalFeatures(np.arange(10, dtype=np.float32), engine="histogram")
+
+
+@pytest.fixture
+def mock_regions():
+    """Fixture to create a mock sequence and segmentation with three labelled regions."""
+    rng = np.random.default_rng(0)
+    sequence = rng.normal(100, 20, (8, 9, 10)).astype(np.float32)
+    segmentation = np.zeros((8, 9, 10), dtype=np.uint8)
+    segmentation[2:6, 2:6, 2:6] = 3
+    segmentation[3:5, 3:5, 3:5] = 1
+    segmentation[3:5, 3:5, 5] = 2
+    return sequence, segmentation
+
+
+def test_regional_features(mock_regions):
+    """Test that the statistics of each region match those of the masked sequence."""
+    sequence, segmentation = mock_regions
+    mapping_names = {0: "BKG", 1: "ENH", 2: "NEC", 3: "EDE"}
+    result = RegionalStatisticalFeatures(segmentation, mapping_names, percentiles=[5, 95]).extract_features(sequence)
+
+    masks = {"enh": segmentation == 1, "nec": segmentation == 2, "ede": segmentation == 3, "whole": segmentation > 0}
+    for region, mask in masks.items():
+        expected = StatisticalFeatures(sequence[mask].astype(np.float64), percentiles=[5, 95]).extract_features()
+        for name in ["mean_intensity", "median_intensity", "std_intensity", "5th_percentile_intensity", "skewness"]:
+            assert result[f"{region}_{name}"] == pytest.approx(expected[name]), f"{region}_{name} is incorrect."
+        assert result[f"{region}_kurtosis"] == pytest.approx(expected["kurtosis"])
+    assert "bkg_mean_intensity" not in result
+
+
+def test_regional_features_missing_region(mock_regions):
+    """Test that regions absent from the segmentation, or without segmentation, have NaN statistics."""
+    sequence, segmentation = mock_regions
+    mapping_names = {0: "BKG", 1: "ENH", 4: "RC"}
+    result = RegionalStatisticalFeatures(segmentation, mapping_names).extract_features(sequence)
+
+    assert all(np.isnan(v) for k, v in result.items() if k.startswith("rc_"))
+    assert result["enh_mean_intensity"] == pytest.approx(sequence[segmentation == 1].mean())
+    assert result["whole_mean_intensity"] == pytest.approx(sequence[segmentation > 0].mean())
+
+    result = RegionalStatisticalFeatures(None, mapping_names).extract_features(sequence)
+    assert len(result) == 3 * 7 and all(np.isnan(v) for v in result.values())
+
+
+def test_regional_features_without_mapping(mock_regions):
+    """Test that regions are named after their labels when no mapping is given."""
+    sequence, segmentation = mock_regions
+    result = RegionalStatisticalFeatures(segmentation).extract_features(sequence)
+
+    assert result["3_median_intensity"] == pytest.approx(np.median(sequence[segmentation == 3]))
+    assert "whole_median_intensity" in result
+
+
+def test_regional_features_shape_mismatch(mock_regions):
+    """Test that sequences with a shape different from the segmentation have NaN statistics."""
+    sequence, segmentation = mock_regions
+    result = RegionalStatisticalFeatures(segmentation, {0: "BKG", 1: "ENH"}).extract_features(sequence[1:])
+    assert all(np.isnan(v) for v in result.values())
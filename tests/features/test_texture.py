@@ -4,7 +4,10 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 import numpy as np
 import pytest
+from skimage.feature import graycomatrix
+from skimage.feature import graycoprops
 
+from src.audit.features.texture import TEXTURES
 from src.audit.features.texture import TextureFeatures
 
 
@@ -192,3 +195,137 @@ def test_compute_texture_values_no_removal(mock_sequence_with_empty_planes):
 
     # Ensure that all computed texture values are finite
     assert np.all(np.isfinite(result)), "All computed texture values should be finite."
+
+
+def test_compute_textures_values_match_skimage():
+    """Test that the vectorized GLCM properties match skimage.feature.graycoprops."""
+    rng = np.random.default_rng(0)
+    sequence = rng.normal(100, 30, size=(6, 20, 17)).clip(0)
+    texture_features = TextureFeatures(sequence)
+
+    result = texture_features.compute_textures_values()
+
+    angles = [0, np.pi / 4, np.pi / 2, 3 * np.pi / 4]
+    for texture in TEXTURES:
+        expected = [
+            graycoprops(graycomatrix(plane, [1], angles, levels=256, symmetric=True, normed=True), texture).mean()
+            for plane in texture_features.quantize()
+        ]
+        assert np.allclose(result[texture], expected), f"Mismatch for texture {texture}."
+
+
+def test_compute_texture_values_invalid_texture(mock_sequence):
+    """Test that an unknown texture raises an error."""
+    with pytest.raises(ValueError):
+        TextureFeatures(mock_sequence).compute_texture_values("unknown")
+
+
+@pytest.mark.parametrize("levels", [2, 32, 64])
+def test_compute_textures_values_with_levels(levels):
+    """Test that the quantization and the co-occurrence matrices use the configured number of gray levels."""
+    rng = np.random.default_rng(1)
+    sequence = rng.normal(100, 30, size=(4, 15, 12)).clip(0)
+    texture_features = TextureFeatures(sequence, levels=levels)
+
+    image_array = texture_features.quantize()
+    assert image_array.max() == levels - 1
+
+    result = texture_features.compute_textures_values(["contrast", "energy"])
+    angles = [0, np.pi / 4, np.pi / 2, 3 * np.pi / 4]
+    expected = [
+        graycoprops(graycomatrix(plane, [1], angles, levels=levels, symmetric=True, normed=True), "contrast").mean()
+        for plane in image_array
+    ]
+    assert np.allclose(result["contrast"], expected)
+
+
+def test_compute_textures_values_3d():
+    """Test the 3D co-occurrence mode against a direct count over the 13 directions."""
+    rng = np.random.default_rng(2)
+    sequence = rng.integers(1, 5, size=(5, 6, 7)).astype(float)
+    texture_features = TextureFeatures(sequence, levels=4, mode="3d")
+    image_array = texture_features.quantize()
+
+    result = texture_features.compute_textures_values(["contrast"])
+    assert result["contrast"].shape == (13,)
+
+    expected = []
+    for dz, dy, dx in [(dz, dy, dx) for dz in (-1, 0, 1) for dy in (-1, 0, 1) for dx in (-1, 0, 1)]:
+        if (dz, dy, dx) <= (0, 0, 0):
+            continue
+        diffs = []
+        for z, y, x in np.ndindex(image_array.shape):
+            if 0 <= z + dz < 5 and 0 <= y + dy < 6 and 0 <= x + dx < 7:
+                diffs.append(int(image_array[z, y, x]) - int(image_array[z + dz, y + dy, x + dx]))
+        expected.append(np.mean(np.square(diffs)))
+    assert np.allclose(result["contrast"], expected)
+
+
+def test_extract_features_3d(mock_sequence):
+    """Test that the 3D mode yields the same features."""
+    result = TextureFeatures(mock_sequence, mode="3d").extract_features()
+
+    for texture in TEXTURES:
+        assert np.isfinite(result[f"mean_{texture.lower()}"])
+        assert np.isfinite(result[f"std_{texture.lower()}"])
+
+
+@pytest.mark.parametrize("settings", [{"levels": 1}, {"levels": 512}, {"mode": "4d"}])
+def test_invalid_texture_settings(mock_sequence, settings):
+    """Test that invalid settings are rejected."""
+    with pytest.raises(ValueError):
+        TextureFeatures(mock_sequence, **settings)
+
+
+def test_quantize_integer_image():
+    """Test that integer images are rescaled without overflowing."""
+    sequence = np.arange(0, 800, dtype=np.int16).reshape(8, 10, 10)
+
+    image_array = TextureFeatures(sequence).quantize()
+
+    assert image_array.max() == 255
+    assert np.all(np.diff(image_array.ravel().astype(int)) >= 0)
+
+
+def test_quantize_float32_image():
+    """Test that float32 images are rescaled in their own precision, as before the integer overflow fix."""
+    # some of these intensities fall on a different gray level when rescaled in double precision
+    sequence = (np.arange(1000, dtype=np.float32) * 0.1 + 3.3).reshape(10, 10, 10)
+
+    image_array = TextureFeatures(sequence).quantize()
+
+    expected = (255 * (sequence - np.min(sequence)) / (np.max(sequence) - np.min(sequence))).astype(np.uint8)
+    assert np.array_equal(image_array, expected)
+
+
+def test_compute_textures_values_min_foreground_fraction(mock_sequence_with_empty_planes):
+    """Test that planes with too little foreground are skipped."""
+    texture_features = TextureFeatures(mock_sequence_with_empty_planes, min_foreground_fraction=0.5)
+
+    # only the third plane has at least half of its voxels in the foreground
+    result = texture_features.compute_texture_values("contrast")
+    assert len(result) == 1
+
+    expected = TextureFeatures(mock_sequence_with_empty_planes).compute_texture_values("contrast")[2]
+    assert result[0] == pytest.approx(expected)
+
+
+def test_compute_textures_values_foreground_only():
+    """Test that only pairs of foreground voxels are counted when foreground_only is set."""
+    sequence = np.zeros((3, 6, 6))
+    sequence[1, 1:5, 1:5] = 10
+    sequence[1, 2:4, 2:4] = 20
+
+    result = TextureFeatures(sequence, foreground_only=True).compute_textures_values(["contrast", "homogeneity"])
+
+    # the planes without foreground are skipped, and the background does not contribute to the contrast
+    assert len(result["contrast"]) == 1
+    background = TextureFeatures(sequence).compute_textures_values(["contrast"])["contrast"][1]
+    assert 0 < result["contrast"][0] < background
+
+
+def test_compute_textures_values_all_planes_skipped(mock_sequence_with_empty_planes):
+    """Test that the textures are NaN if all the planes are skipped."""
+    result = TextureFeatures(mock_sequence_with_empty_planes, min_foreground_fraction=1.0).extract_features()
+
+    assert all(np.isnan(value) for value in result.values())
@@ -430,3 +430,36 @@ def test_calculate_tumor_pixel(mock_segmentation_multiple_labels):
     # Check that the result contains tumor pixel counts with proper prefixes
     assert "lesion_size_1" in result, "Tumor pixels for label '1' should be in the result."
     assert "lesion_size_2" in result, "Tumor pixels for label '2' should be in the result."
+
+
+def test_get_tumor_slices_matches_per_slice_search():
+    """Test that the tumor slices match a slice by slice search, and that they are computed only once."""
+    segmentation = np.zeros((6, 7, 8), dtype=np.uint8)
+    segmentation[1, 2, 3] = 1
+    segmentation[3:5, 4:6, 0] = 2
+    tumor_features = TumorFeatures(segmentation=segmentation)
+    result = tumor_features.get_tumor_slices()
+
+    expected = tuple(
+        [n for n in range(segmentation.shape[axis]) if np.take(segmentation, n, axis=axis).any()] for axis in range(3)
+    )
+    assert result == expected, f"Expected tumor slices {expected}, got {result}"
+    assert tumor_features.get_tumor_slices() is result, "Tumor slices should be cached."
+
+
+def test_compute_label_statistics():
+    """Test that the one-pass label statistics match the counts and centers of mass of each label."""
+    segmentation = np.random.default_rng(0).choice([0, 0, 0, 1, 2, 4], size=(5, 6, 7))
+    tumor_features = TumorFeatures(segmentation=segmentation, spacing=(1, 2, 3))
+    statistics = tumor_features.compute_label_statistics()
+
+    assert statistics["labels"].tolist() == [1, 2, 4], "Only the non-zero labels should be described."
+    assert statistics["background"] == (segmentation == 0).sum(), "Background voxels are miscounted."
+    for label, count in zip(statistics["labels"], statistics["counts"]):
+        assert count == (segmentation == label).sum(), f"Voxels of label {label} are miscounted."
+        expected_center = np.argwhere(segmentation == label).mean(axis=0) * np.array([1, 2, 3])
+        assert np.allclose(tumor_features.get_tumor_center_mass(label=label), expected_center)
+
+    expected_center = np.argwhere(segmentation != 0).mean(axis=0) * np.array([1, 2, 3])
+    assert np.allclose(tumor_features.get_tumor_center_mass(label=0), expected_center)
+    assert tumor_features.compute_label_statistics() is statistics, "Label statistics should be cached."
@@ -0,0 +1,136 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+import SimpleITK as sitk
+import yaml
+
+from src.audit.metric_extraction import run_metric_extraction
+from src.audit.metrics.backends.audit.audit import extract_audit_metrics
+from src.audit.metrics.backends.audit.audit import load_ground_truth
+
+
+def write_segmentation(path, array):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    sitk.WriteImage(sitk.GetImageFromArray(array.astype(np.uint8)), str(path))
+
+
+@pytest.fixture
+def metric_extraction_config(tmp_path):
+    """Three subjects and two models: modelA predicts the ground truth, modelB predicts nothing."""
+    for n in range(3):
+        subject_id = f"subject_{n}"
+        gt = np.zeros((6, 6, 6))
+        gt[1:4, 1:4, 1:4] = 1
+        gt[2, 2, 2] = 2
+        write_segmentation(tmp_path / "gt" / subject_id / f"{subject_id}_seg.nii.gz", gt)
+        write_segmentation(tmp_path / "modelA" / subject_id / f"{subject_id}_pred.nii.gz", gt)
+        write_segmentation(tmp_path / "modelB" / subject_id / f"{subject_id}_pred.nii.gz", np.zeros_like(gt))
+
+    return {
+        "data_path": str(tmp_path / "gt"),
+        "model_predictions_paths": {"modelA": str(tmp_path / "modelA"), "modelB": str(tmp_path / "modelB")},
+        "labels": {"BKG": 0, "ENH": 1, "NEC": 2},
+        "metrics": {"dice": True, "sens": True},
+    }
+
+
+@pytest.mark.parametrize("cpu_cores", [1, 2])
+def test_extract_audit_metrics_keeps_models_apart(metric_extraction_config, cpu_cores):
+    result, _ = extract_audit_metrics({**metric_extraction_config, "cpu_cores": cpu_cores})
+
+    assert len(result) == 2 * 3 * 2
+    assert not result.duplicated(subset=["model", "ID", "region"]).any()
+    assert (result.loc[result["model"] == "modelA", "DICE"] == 1).all()
+    assert (result.loc[result["model"] == "modelB", "DICE"] == 0).all()
+
+
+def test_extract_audit_metrics_is_independent_of_cpu_cores(metric_extraction_config):
+    sequential, _ = extract_audit_metrics({**metric_extraction_config, "cpu_cores": 1})
+    parallel, _ = extract_audit_metrics({**metric_extraction_config, "cpu_cores": 2})
+
+    pd.testing.assert_frame_equal(sequential, parallel)
+
+
+def test_extract_audit_metrics_loads_ground_truth_once_per_subject(metric_extraction_config):
+    with mock.patch(
+        "src.audit.metrics.backends.audit.audit.load_ground_truth", wraps=load_ground_truth
+    ) as mock_load_ground_truth:
+        extract_audit_metrics({**metric_extraction_config, "cpu_cores": 1})
+
+    assert mock_load_ground_truth.call_count == 3
+
+
+def test_extract_audit_metrics_resumes_interrupted_runs(metric_extraction_config, tmp_path):
+    config = {**metric_extraction_config, "cpu_cores": 1, "output_path": str(tmp_path / "output")}
+    expected, checkpoint = extract_audit_metrics(config)
+    assert os.path.exists(checkpoint.path), "The checkpoint should be kept until the results are stored."
+    checkpoint.remove()
+
+    # the run crashes on the third subject
+    ground_truths = [load_ground_truth(config["data_path"], f"subject_{n}") for n in range(2)]
+    with mock.patch(
+        "src.audit.metrics.backends.audit.audit.load_ground_truth", side_effect=ground_truths + [MemoryError()]
+    ):
+        with pytest.raises(MemoryError):
+            extract_audit_metrics(config)
+    assert os.listdir(tmp_path / "output")
+
+    with mock.patch(
+        "src.audit.metrics.backends.audit.audit.load_ground_truth", wraps=load_ground_truth
+    ) as mock_load_ground_truth:
+        resumed, checkpoint = extract_audit_metrics(config)
+
+    assert mock_load_ground_truth.call_count == 1
+    pd.testing.assert_frame_equal(expected, resumed)
+    checkpoint.remove()
+    assert not os.listdir(tmp_path / "output")
+
+
+@pytest.mark.parametrize("cpu_cores", [1, 2])
+def test_extract_audit_metrics_skips_missing_predictions(metric_extraction_config, tmp_path, cpu_cores):
+    os.remove(tmp_path / "modelB" / "subject_1" / "subject_1_pred.nii.gz")
+    result, _ = extract_audit_metrics({**metric_extraction_config, "cpu_cores": cpu_cores})
+
+    assert sorted(result.loc[result["model"] == "modelA", "ID"].unique()) == ["subject_0", "subject_1", "subject_2"]
+    assert sorted(result.loc[result["model"] == "modelB", "ID"].unique()) == ["subject_0", "subject_2"]
+    assert len(result) == 2 * (3 + 2)
+
+
+@pytest.mark.parametrize("cpu_cores", [1, 2])
+def test_extract_audit_metrics_skips_failing_pairs(metric_extraction_config, tmp_path, cpu_cores):
+    # a prediction whose shape does not match the ground truth
+    write_segmentation(tmp_path / "modelB" / "subject_1" / "subject_1_pred.nii.gz", np.zeros((5, 6, 6)))
+    result, _ = extract_audit_metrics({**metric_extraction_config, "cpu_cores": cpu_cores})
+
+    assert sorted(result.loc[result["model"] == "modelA", "ID"].unique()) == ["subject_0", "subject_1", "subject_2"]
+    assert sorted(result.loc[result["model"] == "modelB", "ID"].unique()) == ["subject_0", "subject_2"]
+    assert len(result) == 2 * (3 + 2)
+
+
+def test_run_metric_extraction_keeps_checkpoint_until_stored(metric_extraction_config, tmp_path):
+    config = {
+        **metric_extraction_config,
+        "backend": "audit",
+        "cpu_cores": 1,
+        "filename": "metrics",
+        "output_path": str(tmp_path / "output"),
+        "logs_path": str(tmp_path / "logs"),
+    }
+    config_path = tmp_path / "metric_extraction.yml"
+    config_path.write_text(yaml.safe_dump(config))
+    checkpoint_path = tmp_path / "output" / ".checkpoint_metrics_audit_metrics.jsonl"
+
+    with mock.patch("src.audit.metric_extraction.write_dataset", side_effect=OSError("No space left on device")):
+        with pytest.raises(OSError):
+            run_metric_extraction(str(config_path))
+    assert checkpoint_path.exists(), "The computed rows should survive a failed write."
+
+    run_metric_extraction(str(config_path))
+    assert not checkpoint_path.exists()
+    assert (tmp_path / "output" / "extracted_information_metrics.csv").exists()
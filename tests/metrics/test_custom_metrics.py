@@ -4,10 +4,14 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 import numpy as np
 import pytest
-from scipy.spatial.distance import directed_hausdorff
+from scipy.spatial.distance import cdist
 
 from src.audit.metrics.segmentation_metrics import accuracy
+from src.audit.metrics.segmentation_metrics import average_surface_distance
 from src.audit.metrics.segmentation_metrics import calculate_confusion_matrix_elements
+from src.audit.metrics.segmentation_metrics import calculate_metrics
+from src.audit.metrics.segmentation_metrics import calculate_multilabel_confusion_elements
+from src.audit.metrics.segmentation_metrics import crop_to_foreground
 from src.audit.metrics.segmentation_metrics import dice_score
 from src.audit.metrics.segmentation_metrics import hausdorff_distance
 from src.audit.metrics.segmentation_metrics import jaccard_index
@@ -107,6 +111,11 @@ def test_one_hot_encoding_with_multiple_labels(mock_segmentation_multiple_labels
     assert np.array_equal(result[1], (mock_segmentation_multiple_labels == 2).astype(int))  # Check label 2
 
 
+def test_one_hot_encoding_is_boolean(mock_segmentation_multiple_labels, multiclass_labels):
+    result = one_hot_encoding(mock_segmentation_multiple_labels, multiclass_labels, skip_background=True)
+    assert result.dtype == bool
+
+
 def test_calculate_confusion_matrix_elements_binary(mock_segmentation_binary_labels, mock_ground_truth_binary_labels):
     """Test confusion matrix elements for a binary segmentation and ground truth."""
     tp, tn, fp, fn = calculate_confusion_matrix_elements(
@@ -422,11 +431,38 @@ def test_hausdorff_distance_standard_case():
     gt = np.array([[1, 0, 0], [1, 1, 1], [0, 1, 0]])
     seg = np.array([[1, 0, 0], [1, 1, 1], [0, 0, 0]])
 
-    # Directed Hausdorff from seg to gt and from gt to seg
+    # Symmetric Hausdorff distance between the surfaces (every foreground voxel of these masks is on the surface)
     result = hausdorff_distance(gt, seg)
-    expected_result = directed_hausdorff(np.argwhere(seg), np.argwhere(gt))[0]
+    distances = cdist(np.argwhere(seg), np.argwhere(gt))
+    expected_result = max(distances.min(axis=1).max(), distances.min(axis=0).max())
 
-    assert result == expected_result
+    assert result == pytest.approx(expected_result)
+
+
+def test_hausdorff_distance_uses_surfaces_and_spacing():
+    gt = np.zeros((9, 9, 9), dtype=bool)
+    gt[2:7, 2:7, 2:7] = True
+    seg = np.zeros((9, 9, 9), dtype=bool)
+    seg[2:7, 2:7, 2:8] = True
+
+    # the segmentation surface exceeds the ground truth by one voxel along the last axis
+    assert hausdorff_distance(gt, seg) == pytest.approx(1.0)
+    assert hausdorff_distance(gt, seg, spacing=np.array([1.0, 1.0, 2.5])) == pytest.approx(2.5)
+    assert hausdorff_distance(gt, seg, percentile=95) <= hausdorff_distance(gt, seg)
+    assert hausdorff_distance(seg, gt) == hausdorff_distance(gt, seg)
+
+
+def test_average_surface_distance():
+    gt = np.zeros((9, 9, 9), dtype=bool)
+    gt[2:7, 2:7, 2:7] = True
+
+    assert average_surface_distance(gt, gt) == 0.0
+    assert np.isnan(average_surface_distance(gt, np.zeros_like(gt)))
+    assert average_surface_distance(np.zeros_like(gt), np.zeros_like(gt)) == 0.0
+
+    seg = np.zeros_like(gt)
+    seg[2:7, 2:7, 2:8] = True
+    assert 0.0 < average_surface_distance(gt, seg) < 1.0
 
 
 def test_hausdorff_distance_perfect_match():
@@ -474,3 +510,86 @@ def test_hausdorff_distance_edge_case_empty_both():
     # Both are empty, Hausdorff distance should be NaN
     result = hausdorff_distance(gt, seg)
     assert result == 0.0
+
+
+# Tests for calculate_multilabel_confusion_elements
+@pytest.mark.parametrize("labels", [[1, 2, 3], [[1, 2, 3], [1, 3], 2], [5]])
+def test_multilabel_confusion_elements_match_binary(labels):
+    rng = np.random.default_rng(0)
+    gt = rng.integers(0, 4, size=(6, 7, 8)).astype(np.uint8)
+    seg = rng.integers(0, 4, size=(6, 7, 8)).astype(np.uint8)
+
+    result = calculate_multilabel_confusion_elements(gt, seg, labels)
+
+    expected = [
+        calculate_confusion_matrix_elements(np.isin(gt, label).astype(int), np.isin(seg, label).astype(int))
+        for label in labels
+    ]
+    assert result == expected
+
+
+def test_multilabel_confusion_elements_empty_maps():
+    gt = np.zeros((3, 3, 3), dtype=np.uint8)
+    seg = np.zeros((3, 3, 3), dtype=np.uint8)
+
+    result = calculate_multilabel_confusion_elements(gt, seg, [1, 2])
+    assert result == [(0.0, 27.0, 0.0, 0.0), (0.0, 27.0, 0.0, 0.0)]
+
+
+# Tests for calculate_metrics
+def test_calculate_metrics_on_label_maps():
+    rng = np.random.default_rng(1)
+    gt = rng.integers(0, 3, size=(5, 6, 7))
+    seg = rng.integers(0, 3, size=(5, 6, 7))
+    spacing = np.array([1.0, 2.0, 0.5])
+
+    result = calculate_metrics(
+        gt, seg, "subject", ["BKG", "A", "B"], [0, 1, 2], ["dice", "size", "haus"], spacing=spacing
+    )
+
+    assert [row["region"] for row in result] == ["A", "B"]
+    for row, label in zip(result, [1, 2]):
+        tp, tn, fp, fn = calculate_confusion_matrix_elements((gt == label).astype(int), (seg == label).astype(int))
+        assert row["DICE"] == dice_score(tp, fp, fn, gt == label, seg == label)
+        assert row["SIZE"] == np.sum(seg == label) * spacing.prod()
+        assert row["HAUS"] == hausdorff_distance(gt == label, seg == label, spacing=spacing[::-1])
+
+
+# Tests for crop_to_foreground
+def test_crop_to_foreground():
+    gt = np.zeros((10, 12, 14), dtype=np.uint8)
+    gt[3:5, 4:6, 5:7] = 1
+    seg = np.zeros_like(gt)
+    seg[4:7, 5:6, 6:9] = 2
+
+    gt_cropped, seg_cropped, n_background = crop_to_foreground(gt, seg, margin=1)
+
+    assert gt_cropped.shape == (6, 4, 6)
+    assert n_background == gt.size - gt_cropped.size
+    assert gt_cropped.sum() == gt.sum() and seg_cropped.sum() == seg.sum()
+
+
+def test_crop_to_foreground_empty_maps():
+    gt = np.zeros((4, 4, 4), dtype=np.uint8)
+
+    gt_cropped, seg_cropped, n_background = crop_to_foreground(gt, gt.copy())
+
+    assert gt_cropped.size == 0 and seg_cropped.size == 0
+    assert n_background == 64
+
+
+def test_calculate_metrics_on_cropped_maps():
+    rng = np.random.default_rng(2)
+    gt = np.zeros((20, 20, 20), dtype=np.uint8)
+    gt[5:12, 6:13, 7:14] = rng.integers(0, 3, size=(7, 7, 7))
+    seg = np.zeros_like(gt)
+    seg[6:13, 6:12, 8:15] = rng.integers(0, 3, size=(7, 6, 7))
+    metrics = ["dice", "sens", "spec", "accu", "jacc", "prec", "size", "haus", "hd95", "assd"]
+
+    full = calculate_metrics(gt, seg, "subject", ["BKG", "A", "B"], [0, 1, 2], metrics)
+    gt_cropped, seg_cropped, n_background = crop_to_foreground(gt, seg)
+    cropped = calculate_metrics(
+        gt_cropped, seg_cropped, "subject", ["BKG", "A", "B"], [0, 1, 2], metrics, n_background=n_background
+    )
+
+    assert cropped == full
@@ -0,0 +1,62 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+import numpy as np
+import pytest
+
+from src.audit.metrics.backends.metrics_reloaded.metrics.pairwise_measures import BinaryPairwiseMeasures
+from src.audit.metrics.segmentation_metrics import crop_to_foreground
+
+DISTANCE_MEASURES = ["hd", "hd_perc", "assd", "masd", "nsd"]
+
+
+@pytest.fixture
+def masks():
+    z, y, x = np.ogrid[:20, :24, :22]
+    ref = (((z - 9) ** 2 + (y - 11) ** 2 + (x - 10) ** 2) < 5**2).astype(int)
+    pred = (((z - 10) ** 2 + (y - 12) ** 2 + (x - 10) ** 2) < 4**2).astype(int)
+    return pred, ref
+
+
+def test_distances_do_not_depend_on_background_extent(masks):
+    pred, ref = masks
+    padded_pred, padded_ref = np.pad(pred, 15), np.pad(ref, 15)
+
+    result = BinaryPairwiseMeasures(
+        pred, ref, measures=DISTANCE_MEASURES, pixdim=[1, 1, 2], dict_args={"nsd": 1}
+    ).to_dict_meas()
+    padded_result = BinaryPairwiseMeasures(
+        padded_pred, padded_ref, measures=DISTANCE_MEASURES, pixdim=[1, 1, 2], dict_args={"nsd": 1}
+    ).to_dict_meas()
+
+    assert result == pytest.approx(padded_result)
+
+
+def test_measured_distance_is_cached(masks):
+    pred, ref = masks
+    bpm = BinaryPairwiseMeasures(pred, ref, measures=DISTANCE_MEASURES)
+
+    assert bpm.measured_distance() is bpm.measured_distance()
+
+
+def test_distances_with_empty_prediction(masks):
+    _, ref = masks
+    result = BinaryPairwiseMeasures(np.zeros_like(ref), ref, measures=["hd", "assd"]).to_dict_meas()
+
+    assert np.isnan(result["hd"]) and np.isnan(result["assd"])
+
+
+@pytest.mark.parametrize("margin", [0, 1, 3])
+def test_cropped_measures_match_full_images(masks, margin):
+    pred, ref = masks
+    measures = ["accuracy", "ba", "cohens_kappa", "ec", "nb", "npv", "specificity", "mcc", "dsc", "hd", "nsd", "avdr"]
+    full = BinaryPairwiseMeasures(pred, ref, measures=measures, dict_args={"nsd": 1}).to_dict_meas()
+
+    ref_cropped, pred_cropped, n_background = crop_to_foreground(ref, pred, margin)
+    cropped = BinaryPairwiseMeasures(
+        pred_cropped, ref_cropped, measures=measures, dict_args={"nsd": 1, "n_background": n_background}
+    ).to_dict_meas()
+
+    assert n_background > 0
+    assert cropped == pytest.approx(full)
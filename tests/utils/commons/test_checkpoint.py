@@ -0,0 +1,77 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+
+import numpy as np
+
+from src.audit.utils.commons.checkpoint import ExtractionCheckpoint
+from src.audit.utils.commons.checkpoint import open_checkpoint
+
+
+def test_checkpoint_resume(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = ExtractionCheckpoint(path, settings={"labels": {"ENH": 1}})
+    assert checkpoint.completed == {}
+
+    checkpoint.append("sub-1", [{"ID": "sub-1", "size": np.int64(3), "mean": np.float32(0.5)}])
+    checkpoint.append("sub-2", [{"ID": "sub-2", "size": np.int64(4), "mean": np.nan}])
+
+    # the records are on disk before the checkpoint is closed
+    resumed = ExtractionCheckpoint(path, settings={"labels": {"ENH": 1}})
+    assert list(resumed.completed) == ["sub-1", "sub-2"]
+    assert resumed.completed["sub-1"] == [{"ID": "sub-1", "size": 3, "mean": 0.5}]
+    assert np.isnan(resumed.completed["sub-2"][0]["mean"])
+    checkpoint.close()
+
+
+def test_checkpoint_truncated_record(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = ExtractionCheckpoint(path, settings={})
+    checkpoint.append("sub-1", [{"ID": "sub-1"}])
+    checkpoint.close()
+    with open(path, "a") as f:
+        f.write('{"key": "sub-2", "rows": [{"ID"')
+
+    resumed = ExtractionCheckpoint(path, settings={})
+    assert list(resumed.completed) == ["sub-1"], "The record being written when the run crashed should be ignored."
+
+    resumed.append("sub-2", [{"ID": "sub-2"}])
+    resumed.close()
+    assert list(ExtractionCheckpoint(path, settings={}).completed) == ["sub-1", "sub-2"]
+
+
+def test_checkpoint_settings_change(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = ExtractionCheckpoint(path, settings={"metrics": {"dice": True}})
+    checkpoint.append("modelA/sub-1", [{"ID": "sub-1"}])
+    checkpoint.close()
+
+    resumed = ExtractionCheckpoint(path, settings={"metrics": {"dice": True, "haus": True}})
+    assert resumed.completed == {}, "Rows computed with other settings should be discarded."
+
+    resumed.append("modelA/sub-2", [{"ID": "sub-2"}])
+    resumed.close()
+    assert list(ExtractionCheckpoint(path, settings={"metrics": {"dice": True, "haus": True}}).completed) == [
+        "modelA/sub-2"
+    ]
+
+
+def test_checkpoint_remove(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = ExtractionCheckpoint(path, settings={})
+    checkpoint.append("sub-1", [{"ID": "sub-1"}])
+    checkpoint.remove()
+
+    assert not os.path.exists(path)
+
+
+def test_open_checkpoint(tmp_path):
+    assert open_checkpoint({}, "features_ds", settings={}) is None, "Without output path there is no default path."
+    assert open_checkpoint({"output_path": str(tmp_path), "checkpoint": False}, "features_ds", settings={}) is None
+
+    checkpoint = open_checkpoint({"output_path": str(tmp_path)}, "features_ds", settings={})
+    assert checkpoint.path == os.path.join(str(tmp_path), ".checkpoint_features_ds.jsonl")
+
+    checkpoint = open_checkpoint({"checkpoint": {"path": str(tmp_path / "c.jsonl")}}, "features_ds", settings={})
+    assert checkpoint.path == str(tmp_path / "c.jsonl")
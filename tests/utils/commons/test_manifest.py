@@ -0,0 +1,105 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+
+import numpy as np
+import pytest
+
+from src.audit.utils.commons.manifest import ExtractionManifest
+from src.audit.utils.commons.manifest import fingerprint_files
+from src.audit.utils.commons.manifest import open_manifest
+
+
+@pytest.fixture
+def subject_files(tmp_path):
+    paths = []
+    for name in ["sub-1_t1.nii.gz", "sub-1_seg.nii.gz"]:
+        path = tmp_path / name
+        path.write_bytes(b"voxels of " + name.encode())
+        paths.append(str(path))
+    return paths
+
+
+def test_fingerprint_files_stat(subject_files):
+    fingerprint = fingerprint_files(subject_files)
+    assert fingerprint == fingerprint_files(list(reversed(subject_files))), "The order of the files should not matter."
+
+    os.utime(subject_files[0], ns=(0, 0))
+    assert fingerprint_files(subject_files) != fingerprint, "A modified file should change the fingerprint."
+
+
+def test_fingerprint_files_content(subject_files):
+    fingerprint = fingerprint_files(subject_files, mode="content")
+
+    os.utime(subject_files[0], ns=(0, 0))
+    assert fingerprint_files(subject_files, mode="content") == fingerprint, "Only the content should matter."
+
+    with open(subject_files[0], "ab") as f:
+        f.write(b"!")
+    assert fingerprint_files(subject_files, mode="content") != fingerprint, "A modified file should be detected."
+
+
+def test_fingerprint_files_missing(subject_files, tmp_path):
+    missing = str(tmp_path / "sub-1_pred.nii.gz")
+    fingerprint = fingerprint_files(subject_files + [missing])
+
+    with open(missing, "wb") as f:
+        f.write(b"prediction")
+    assert fingerprint_files(subject_files + [missing]) != fingerprint, "A new file should change the fingerprint."
+
+
+def test_manifest_round_trip(subject_files, tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = ExtractionManifest(path, settings={"labels": {"ENH": 1}})
+    assert manifest.get("sub-1", subject_files) is None
+
+    manifest.put("sub-1", [{"ID": "sub-1", "size": np.int64(3), "mean": np.float32(0.5), "skewness": np.nan}])
+    manifest.save()
+
+    rows = ExtractionManifest(path, settings={"labels": {"ENH": 1}}).get("sub-1", subject_files)
+    assert rows[0]["ID"] == "sub-1" and rows[0]["size"] == 3 and rows[0]["mean"] == 0.5
+    assert np.isnan(rows[0]["skewness"])
+
+    os.utime(subject_files[1], ns=(0, 0))
+    assert ExtractionManifest(path, settings={"labels": {"ENH": 1}}).get("sub-1", subject_files) is None
+
+
+def test_manifest_settings_change(subject_files, tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = ExtractionManifest(path, settings={"metrics": {"dice": True}})
+    manifest.get("sub-1", subject_files)
+    manifest.put("sub-1", [{"ID": "sub-1"}])
+    manifest.save()
+
+    manifest = ExtractionManifest(path, settings={"metrics": {"dice": True, "haus": True}})
+    assert manifest.entries == {}, "Entries computed with other settings should be discarded."
+
+
+def test_manifest_prune_and_put(subject_files, tmp_path):
+    manifest = ExtractionManifest(str(tmp_path / "manifest.json"), settings={})
+    for key in ["sub-1", "sub-2"]:
+        manifest.get(key, subject_files)
+        manifest.put(key, [{"ID": key}])
+
+    manifest.prune(["sub-2", "sub-3"])
+    assert list(manifest.entries) == ["sub-2"]
+
+    with pytest.raises(KeyError):
+        manifest.put("sub-3", [{"ID": "sub-3"}])
+
+
+def test_open_manifest(tmp_path):
+    assert open_manifest({"output_path": str(tmp_path)}, "features_ds", settings={}) is None
+    assert open_manifest({"output_path": str(tmp_path), "incremental": False}, "features_ds", settings={}) is None
+
+    manifest = open_manifest({"output_path": str(tmp_path), "incremental": True}, "features_ds", settings={})
+    assert manifest.path == os.path.join(str(tmp_path), ".manifest_features_ds.json")
+    assert manifest.fingerprint_mode == "stat"
+
+    config = {"output_path": str(tmp_path), "incremental": {"fingerprint": "content", "path": "m.json"}}
+    manifest = open_manifest(config, "features_ds", settings={})
+    assert manifest.path == "m.json" and manifest.fingerprint_mode == "content"
+
+    with pytest.raises(ValueError):
+        open_manifest({"incremental": {"fingerprint": "md5"}}, "features_ds", settings={})
@@ -0,0 +1,61 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import pandas as pd
+import pytest
+
+from src.audit.utils.internal._csv_helpers import get_file_format
+from src.audit.utils.internal._csv_helpers import read_datasets_from_dict
+from src.audit.utils.internal._csv_helpers import write_dataset
+
+
+@pytest.fixture
+def dataset():
+    return pd.DataFrame(
+        {
+            "ID": ["001", "002", "010"],
+            "lesion_size_whole": [10.5, 0.0, 3.25],
+            "longitudinal_id": ["001", "001", "010"],
+            "time_point": [0, 1, 0],
+        },
+        index=[2, 0, 1],
+    )
+
+
+def test_get_file_format():
+    assert get_file_format("features/dataset_1.csv") == "csv"
+    assert get_file_format("features/dataset_1.PARQUET") == "parquet"
+    assert get_file_format("features/dataset_1.feather") == "feather"
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "feather"])
+def test_write_and_read_columnar_dataset(dataset, tmp_path, output_format):
+    pytest.importorskip("pyarrow")
+    path = write_dataset(dataset, str(tmp_path / "extracted_information_ds"), output_format)
+    assert path.endswith(f".{output_format}")
+
+    data = read_datasets_from_dict({"ds": path})
+    expected = dataset.reset_index(drop=True).assign(set="ds")
+    pd.testing.assert_frame_equal(data.reset_index(drop=True), expected)
+    assert data["ID"].tolist() == ["001", "002", "010"], "IDs should keep their leading zeros."
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet", "feather"])
+def test_read_datasets_from_dict_columns(dataset, tmp_path, output_format):
+    if output_format != "csv":
+        pytest.importorskip("pyarrow")
+    paths = {
+        name: write_dataset(dataset, str(tmp_path / f"extracted_information_{name}"), output_format)
+        for name in ["ds1", "ds2"]
+    }
+
+    data = read_datasets_from_dict(paths, columns=["ID", "time_point", "lesion_size_pred"])
+    assert list(data.columns) == ["ID", "time_point", "set"], "Missing columns should be ignored."
+    assert data["set"].tolist() == ["ds1"] * 3 + ["ds2"] * 3
+
+
+def test_write_dataset_invalid_format(dataset, tmp_path):
+    with pytest.raises(ValueError):
+        write_dataset(dataset, str(tmp_path / "extracted_information_ds"), "xlsx")
@@ -10,10 +10,13 @@ import SimpleITK as sitk
 
 from src.audit.utils.sequences.sequences import build_nifty_image
 from src.audit.utils.sequences.sequences import fit_brain_boundaries
+from src.audit.utils.sequences.sequences import get_brain_bounding_box
 from src.audit.utils.sequences.sequences import get_spacing
 from src.audit.utils.sequences.sequences import label_replacement
 from src.audit.utils.sequences.sequences import load_nii
+from src.audit.utils.sequences.sequences import load_nii_metadata
 from src.audit.utils.sequences.sequences import read_sequences_dict
+from src.audit.utils.sequences.sequences import read_subject_volumes
 
 # Mock NIfTI Image
 mock_nii_image = mock.Mock()
@@ -193,6 +196,71 @@ def test_get_spacing_with_valid_sequence(dummy_sequence_path):
             np.testing.assert_array_equal(spacing, np.array([1.0, 1.0, 1.0]))
 
 
+def test_read_subject_volumes_bundles_array_and_geometry(tmp_path):
+    subject_dir = tmp_path / "subject_1"
+    subject_dir.mkdir()
+    image = sitk.GetImageFromArray(np.arange(24, dtype=np.int16).reshape(2, 3, 4))
+    image.SetSpacing((1.0, 2.0, 3.0))
+    image.SetOrigin((5.0, 6.0, 7.0))
+    sitk.WriteImage(image, str(subject_dir / "subject_1_t1.nii.gz"))
+    sitk.WriteImage(image, str(subject_dir / "subject_1_seg.nii.gz"))
+
+    volumes = read_subject_volumes(str(tmp_path), "subject_1", sequences=["_t1", "_flair"])
+
+    assert set(volumes) == {"t1", "flair", "seg"}
+    assert volumes["flair"] is None
+    np.testing.assert_array_equal(volumes["t1"]["array"], sitk.GetArrayFromImage(image))
+    assert volumes["seg"]["spacing"] == (1.0, 2.0, 3.0)
+    assert volumes["seg"]["origin"] == (5.0, 6.0, 7.0)
+    np.testing.assert_array_equal(get_spacing(volumes["t1"]), np.array([1.0, 2.0, 3.0]))
+
+
+def test_load_nii_metadata_reads_header_only(tmp_path):
+    path = str(tmp_path / "image.nii.gz")
+    image = sitk.GetImageFromArray(np.zeros((2, 3, 4), dtype=np.uint8))
+    image.SetSpacing((0.5, 1.0, 2.0))
+    sitk.WriteImage(image, path)
+
+    with mock.patch("src.audit.utils.sequences.sequences.ReadImage") as mock_read_image:
+        metadata = load_nii_metadata(path)
+        spacing = get_spacing(path)
+
+    mock_read_image.assert_not_called()
+    assert metadata["size"] == (4, 3, 2)
+    assert metadata["spacing"] == (0.5, 1.0, 2.0)
+    np.testing.assert_array_equal(spacing, np.array([0.5, 1.0, 2.0]))
+
+
+def test_load_nii_metadata_invalid_path(fake_sequence_path):
+    with pytest.raises(ValueError, match="does not exist or is not a valid file"):
+        load_nii_metadata(fake_sequence_path)
+
+
+def test_read_subject_volumes_header_only(tmp_path):
+    subject_dir = tmp_path / "subject_1"
+    subject_dir.mkdir()
+    sitk.WriteImage(sitk.GetImageFromArray(np.ones((2, 2, 2))), str(subject_dir / "subject_1_seg.nii.gz"))
+
+    volumes = read_subject_volumes(str(tmp_path), "subject_1", sequences=[], header_only=True)
+
+    assert "array" not in volumes["seg"]
+    assert volumes["seg"]["size"] == (2, 2, 2)
+
+
+def test_read_subject_volumes_seg_header_only(tmp_path):
+    subject_dir = tmp_path / "subject_1"
+    subject_dir.mkdir()
+    for suffix in ["_t1", "_seg"]:
+        sitk.WriteImage(sitk.GetImageFromArray(np.ones((2, 2, 2))), str(subject_dir / f"subject_1{suffix}.nii.gz"))
+
+    volumes = read_subject_volumes(
+        str(tmp_path), "subject_1", sequences=["_t1"], header_only=True, seg_header_only=False
+    )
+
+    assert "array" not in volumes["t1"]
+    assert volumes["seg"]["array"].shape == (2, 2, 2)
+
+
 # Test with valid segmentation array
 def test_build_nifty_image_valid_input():
     segmentation = np.zeros((10, 10, 10), dtype=np.uint8)  # Example valid segmentation array
@@ -324,3 +392,16 @@ def test_fit_brain_boundaries_zero_padding():
     result = fit_brain_boundaries(sequence, padding=0)
 
     assert result.shape == (6, 6, 6), "Shape mismatch after fitting with zero padding."
+
+
+def test_get_brain_bounding_box():
+    # Non-zero values in an asymmetric box
+    sequence = np.zeros((10, 11, 12))
+    sequence[2:5, 3:9, 0:4] = 1
+
+    box = get_brain_bounding_box(sequence != 0, padding=1)
+    assert box == (slice(1, 6), slice(2, 10), slice(0, 5)), f"Unexpected bounding box {box}"
+
+    # An empty mask covers the whole array
+    box = get_brain_bounding_box(np.zeros((3, 4, 5), dtype=bool))
+    assert box == (slice(0, 3), slice(0, 4), slice(0, 5)), f"Unexpected bounding box {box}"
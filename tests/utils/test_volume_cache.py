@@ -0,0 +1,106 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from unittest import mock
+
+import numpy as np
+import pytest
+import SimpleITK as sitk
+
+from src.audit.utils.sequences.sequences import load_nii
+from src.audit.utils.sequences.sequences import load_nii_volume
+from src.audit.utils.sequences.volume_cache import VolumeCache
+from src.audit.utils.sequences.volume_cache import configure_volume_cache
+
+
+@pytest.fixture
+def nifti_path(tmp_path):
+    path = tmp_path / "image.nii.gz"
+    image = sitk.GetImageFromArray(np.arange(60, dtype=np.int16).reshape(3, 4, 5))
+    image.SetSpacing((1.0, 1.5, 2.0))
+    image.SetOrigin((-1.0, 0.0, 1.0))
+    sitk.WriteImage(image, str(path))
+    return str(path)
+
+
+@pytest.fixture
+def enabled_cache(tmp_path):
+    cache = VolumeCache(str(tmp_path / "cache"), max_size_gb=1)
+    with mock.patch("src.audit.utils.sequences.sequences.get_volume_cache", return_value=cache):
+        yield cache
+
+
+def decode(path):
+    image = sitk.ReadImage(path)
+    return sitk.GetArrayFromImage(image), {"spacing": image.GetSpacing(), "size": image.GetSize()}
+
+
+def test_fetch_decodes_once_and_memory_maps(nifti_path, tmp_path):
+    cache = VolumeCache(str(tmp_path / "cache"))
+    decoder = mock.Mock(side_effect=decode)
+
+    first, metadata = cache.fetch(nifti_path, decoder)
+    second, _ = cache.fetch(nifti_path, decoder)
+
+    assert decoder.call_count == 1
+    assert isinstance(second, np.memmap)
+    assert not second.flags.writeable
+    np.testing.assert_array_equal(first, second)
+    assert metadata["spacing"] == (1.0, 1.5, 2.0)
+
+
+def test_modified_file_invalidates_entry(nifti_path, tmp_path):
+    cache = VolumeCache(str(tmp_path / "cache"))
+    cache.fetch(nifti_path, decode)
+
+    sitk.WriteImage(sitk.GetImageFromArray(np.ones((2, 2, 2), dtype=np.int16)), nifti_path)
+    os.utime(nifti_path, ns=(0, os.stat(nifti_path).st_mtime_ns + 10**9))
+
+    assert cache.get(nifti_path) is None
+    array, _ = cache.fetch(nifti_path, decode)
+    assert array.shape == (2, 2, 2)
+
+
+def test_evict_removes_least_recently_used_entries(tmp_path):
+    sources = []
+    for n in range(3):
+        path = tmp_path / f"volume_{n}.nii.gz"
+        sitk.WriteImage(sitk.GetImageFromArray(np.full((10, 10, 10), n, dtype=np.int64)), str(path))
+        sources.append(str(path))
+
+    cache = VolumeCache(str(tmp_path / "cache"), max_size_gb=20000 / 1024**3)
+    for n, path in enumerate(sources):
+        cache.fetch(path, decode)
+        key = cache.get_key(path)
+        for ext in (".npy", ".json"):
+            os.utime(os.path.join(cache.cache_dir, f"{key}{ext}"), (n, n))
+    cache.evict()
+
+    assert cache.get_size() <= cache.max_size
+    assert cache.get(sources[0]) is None
+    assert cache.get(sources[2]) is not None
+
+
+def test_configure_volume_cache_is_opt_in(tmp_path):
+    assert configure_volume_cache(None) is None
+    assert configure_volume_cache({"max_size_gb": 1}) is None
+
+    cache = configure_volume_cache({"path": str(tmp_path / "cache"), "max_size_gb": 2})
+    configure_volume_cache(None)
+
+    assert os.path.isdir(cache.cache_dir)
+    assert cache.max_size == 2 * 1024**3
+
+
+def test_load_nii_uses_enabled_cache(nifti_path, enabled_cache):
+    image = load_nii(nifti_path)
+    array = load_nii(nifti_path, as_array=True)
+    volume = load_nii_volume(nifti_path)
+
+    assert len(os.listdir(enabled_cache.cache_dir)) == 2
+    assert image.GetSpacing() == (1.0, 1.5, 2.0)
+    assert image.GetOrigin() == (-1.0, 0.0, 1.0)
+    np.testing.assert_array_equal(array, sitk.GetArrayFromImage(sitk.ReadImage(nifti_path)))
+    assert volume["spacing"] == (1.0, 1.5, 2.0)
+    assert isinstance(volume["array"], np.memmap)